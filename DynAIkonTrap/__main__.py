@@ -14,20 +14,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from logging import getLogger
-from signal import signal, SIGINT
+from multiprocessing import active_children
+from signal import default_int_handler, signal, SIGTERM
 
 from DynAIkonTrap.camera import Camera  # , MockCamera
 from DynAIkonTrap.filtering import Filter
 from DynAIkonTrap.comms import Sender, Writer
+from DynAIkonTrap.governor import Governor
 from DynAIkonTrap.sensor import SensorLogs
 from DynAIkonTrap.settings import load_settings, OutputMode
+from DynAIkonTrap.supervisor import Stage, Supervisor, ignoring_signals
 
-# Make Ctrl-C quit gracefully
-def handler(signal_num, stack_frame):
-    exit(0)
-
-
-signal(SIGINT, handler)
+# Until the supervisor takes over, SIGTERM from e.g. a service manager stops
+# the program just like Ctrl-C. The stages' processes ignore both signals, so
+# that they keep running while the pipeline is flushed, and are killed instead.
+signal(SIGTERM, default_int_handler)
 
 print(
     """
@@ -42,17 +43,40 @@ print('Welcome to DynAIkon\'s AI camera trap!')
 print('You can halt execution with <Ctrl>+C anytime\n')
 
 
-settings = load_settings()
-getLogger().setLevel(settings.logging.level)
+try:
+    settings = load_settings()
+    getLogger().setLevel(settings.logging.level)
 
-camera = Camera(settings=settings.camera)
-filters = Filter(read_from=camera, settings=settings.filter)
-sensor_logs = SensorLogs(settings=settings.sensor)
+    with ignoring_signals():
+        camera = Camera(
+            settings=settings.camera,
+            sequence_period_s=settings.filter.motion_queue.max_sequence_period_s,
+        )
+        filters = Filter(read_from=camera, settings=settings.filter)
+        sensor_logs = SensorLogs(settings=settings.sensor)
 
-if settings.output.output_mode == OutputMode.SEND:
-    Sender(settings=settings.output, read_from=(filters, sensor_logs))
-else:
-    Writer(settings=settings.output, read_from=(filters, sensor_logs))
+        governor = None
+        if settings.governor.enabled:
+            governor = Governor(camera, filters, settings.governor)
 
-while True:
-    pass
+        if settings.output.output_mode == OutputMode.SEND:
+            output = Sender(settings=settings.output, read_from=(filters, sensor_logs))
+        else:
+            output = Writer(settings=settings.output, read_from=(filters, sensor_logs))
+
+    supervisor = Supervisor(
+        camera,
+        [
+            Stage('filter', filters),
+            Stage('motion queue', filters.motion_queue),
+            Stage('sensor', sensor_logs),
+            Stage('output', output),
+        ],
+        is_idle=lambda: filters.is_idle() and output.is_idle(),
+        governor=governor,
+    )
+except KeyboardInterrupt:
+    for process in active_children():
+        process.kill()
+    exit(0)
+exit(supervisor.run())
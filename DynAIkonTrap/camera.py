@@ -16,30 +16,63 @@
 """
 Provides a simplified interface to the `PiCamera` library class. The `Camera` class gives provides the `Frame`s from the camera's stream via a queue. Initialising the `Camera` takes care of setting up the necessary motion vector and image streams under the hood.
 
-A `Frame` is defined for this system as having the motion vectors, as used in H.264 encoding, a JPEG encode image, and a UNIX-style timestamp when the frame was captured.
+A `Frame` is defined for this system as having the motion vectors, as used in H.264 encoding, a JPEG encode image, and a UNIX-style timestamp when the frame was captured. Motion vectors and images are paired by the encoders' presentation timestamps, see `Synchroniser`.
+
+The camera's output queue is bounded, giving the system a defined memory ceiling when later stages fall behind under sustained motion. What happens to frames arriving at a full queue is set by the `DynAIkonTrap.settings.DropPolicy` and the number of frames dropped so far can be read with `Camera.dropped_frames()`.
+
+Optionally (`DynAIkonTrap.settings.CameraSettings.detector_stream`) a third, unencoded BGR stream is recorded on a spare splitter port, already downscaled by the GPU to the animal detector's input size. Each `Frame` then also carries this `Frame.detector_image`, so the detector can skip decoding and resizing the JPEG, which is then only needed for output.
+
+Where supported (Python 3.8+) the image and motion vectors of each frame are written once into a `DynAIkonTrap.ring_buffer.SharedRingBuffer`. Only small handles then travel through the queues between the stages of the pipeline, with every stage reading the data in place. The last stage to use a frame should call `Frame.release()` to free its slots for reuse. By default the buffers are sized to hold the frames of a whole motion sequence, but take no more than `FRAME_BUFFER_MEMORY_FRACTION` of the memory available. Should a buffer fill up, frames are passed by value and a warning is logged.
 """
-from queue import Empty
+from collections import OrderedDict, deque
+from queue import Empty, Full
 from time import sleep, time
 import numpy as np
-from multiprocessing import Queue
+from multiprocessing import Event, Queue, Value
 from multiprocessing.queues import Queue as QueueType
+from threading import Lock
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from typing import OrderedDict as OrderedDictType
 
 try:
     from picamera import PiCamera
-    from picamera.array import PiMotionAnalysis
+    from picamera.array import PiMotionAnalysis, PiRGBAnalysis
 except OSError:
     # Ignore error that occurs when running pdoc3
     class PiMotionAnalysis:
         pass
 
+    class PiRGBAnalysis:
+        pass
+
 
-from DynAIkonTrap.settings import CameraSettings
+from DynAIkonTrap.ring_buffer import SharedRingBuffer, acquire, release
+from DynAIkonTrap.settings import CameraSettings, DropPolicy, MotionQueueSettings
 from DynAIkonTrap.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Longest plausible delay, in microseconds, between capturing an image and
+# it being read; PTS further than this from the camera clock use another origin
+MAX_CAPTURE_DELAY = 1e6
+
+# Share of the memory available at start-up that automatically sized frame
+# buffers may take
+FRAME_BUFFER_MEMORY_FRACTION = 0.1
+
+
+def _available_memory() -> Optional[int]:
+    """Memory available for new allocations without swapping, in bytes, or `None` if not known"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024  # Given in kB
+    except OSError:
+        pass
+    return None
+
 
 @dataclass
 class Frame:
@@ -48,22 +81,371 @@ class Frame:
     image: bytes
     motion: np.ndarray
     timestamp: float
+    detector_image: Optional[np.ndarray] = None  # Downscaled BGR image, if recorded
+    # Bounding boxes of motion as (x0, y0, x1, y1) fractions of the frame, if found
+    motion_regions: Optional[List[Tuple[float, float, float, float]]] = None
+
+    def release(self):
+        """Release any shared memory held by this frame. To be called by the last stage that uses the frame. This is safe to call on frames that do not use shared memory."""
+        release(self.image, self.motion, self.detector_image)
+
+
+class FrameQueue:
+    """A bounded queue of frames. Rather than blocking the camera, or growing without limit, frames are dropped according to a `DropPolicy` once the queue is full:
+
+    - `DropPolicy.DROP_OLDEST` discards the oldest queued frame to make room for the new one
+    - `DropPolicy.DROP_NEWEST` discards the new frame
+    - `DropPolicy.DECIMATE` keeps only every Nth new frame until the queue has drained to half its size; frames that still do not fit are discarded as for `DropPolicy.DROP_NEWEST`
+    """
+
+    def __init__(self, maxsize: int, policy: DropPolicy, decimation_factor: int = 2):
+        """
+        Args:
+            maxsize (int): Maximum number of frames held in the queue
+            policy (DropPolicy): Policy to apply once the queue is full
+            decimation_factor (int, optional): Keep every Nth frame under `DropPolicy.DECIMATE`. Defaults to 2.
+        """
+        self._queue: QueueType[Frame] = Queue(maxsize)
+        self._maxsize = maxsize
+        self._policy = policy
+        self._decimation_factor = max(decimation_factor, 1)
+        self._decimating = False
+        self._decimation_count = 0
+        self._dropping = False
+        self._dropped = {p: Value('L', 0) for p in DropPolicy}
+
+    def _count_drop(self, policy: DropPolicy):
+        with self._dropped[policy].get_lock():
+            self._dropped[policy].value += 1
+
+        if not self._dropping:
+            self._dropping = True
+            logger.warning(
+                'Camera queue full, dropping frames ({})'.format(self._policy.name)
+            )
+
+    def _decimate(self) -> bool:
+        """Decides if a frame should be discarded to decimate the stream"""
+        if self._decimating and self._queue.qsize() <= self._maxsize // 2:
+            self._decimating = False
+        elif not self._decimating and self._queue.full():
+            self._decimating = True
+            self._decimation_count = 0
+
+        if not self._decimating:
+            return False
+
+        self._decimation_count += 1
+        return self._decimation_count % self._decimation_factor != 0
+
+    def put(self, frame: Frame, block: bool = False):
+        """Add a frame to the queue, dropping frames if necessary. By default this never blocks.
+
+        Args:
+            frame (Frame): Frame to add to the queue
+            block (bool, optional): Wait for space in the queue instead of dropping frames. Defaults to False.
+        """
+        if block:
+            self._queue.put(frame)
+            return
+
+        if self._policy == DropPolicy.DECIMATE and self._decimate():
+            frame.release()
+            self._count_drop(DropPolicy.DECIMATE)
+            return
+
+        try:
+            self._queue.put_nowait(frame)
+            if not self._decimating:
+                self._dropping = False
+            return
+        except Full:
+            pass
+
+        if self._policy == DropPolicy.DROP_OLDEST:
+            try:
+                self._queue.get_nowait().release()
+                self._count_drop(DropPolicy.DROP_OLDEST)
+                self._queue.put_nowait(frame)
+                return
+            except (Empty, Full):
+                pass
+
+        frame.release()
+        self._count_drop(DropPolicy.DROP_NEWEST)
+
+    def get(self, timeout: Optional[float] = None) -> Frame:
+        """Retrieve the next frame
+
+        Args:
+            timeout (Optional[float], optional): Maximum time to wait for a frame, or `None` to wait indefinitely. Defaults to None.
+
+        Raises:
+            Empty: If no frame became available before the timeout
+
+        Returns:
+            Frame: The oldest frame in the queue
+        """
+        return self._queue.get(timeout=timeout)
+
+    def empty(self) -> bool:
+        return self._queue.empty()
+
+    def dropped(self) -> Dict[DropPolicy, int]:
+        """Number of frames dropped so far
+
+        Returns:
+            Dict[DropPolicy, int]: Count of dropped frames by the policy under which they were dropped
+        """
+        return {policy: count.value for policy, count in self._dropped.items()}
 
 
 class Synchroniser:
-    def __init__(self, output: QueueType):
+    """Pairs the motion vectors and JPEG images produced by the camera's two encoders into `Frame`s.
+
+    Where the encoders report presentation timestamps (PTS) the two streams are matched on these, so a motion frame is always paired with the image captured at the same moment. A small reorder buffer of recent images and waiting motion frames absorbs any jitter between the two encoders. The frame's timestamp is then the capture time, rather than the time at which the frame happened to be assembled.
+
+    Without timestamps, each motion frame is simply paired with the most recent image. This is also the case, with a warning, if only the images lack timestamps.
+
+    Images for the animal detector, if provided, are attached to the frames in the same way. A frame for which no detector image arrived in time has none attached.
+    """
+
+    def __init__(
+        self,
+        output: FrameQueue,
+        image_buffer: Optional[SharedRingBuffer] = None,
+        motion_buffer: Optional[SharedRingBuffer] = None,
+        framerate: float = 20,
+        clock: Optional[Callable[[], int]] = None,
+        reorder_depth: int = 3,
+        detector_buffer: Optional[SharedRingBuffer] = None,
+    ):
+        """
+        Args:
+            output (FrameQueue): Queue to place the assembled frames on
+            image_buffer (Optional[SharedRingBuffer], optional): Shared memory for the images. Defaults to None.
+            motion_buffer (Optional[SharedRingBuffer], optional): Shared memory for the motion vectors. Defaults to None.
+            framerate (float, optional): Camera framerate, used to decide which timestamps match. Defaults to 20.
+            clock (Optional[Callable[[], int]], optional): Returns the current time of the clock the PTS are measured with, in microseconds. If the PTS turn out to count from another origin, e.g. the start of recording, the latest image is instead taken to have been captured just now. Defaults to None, meaning the PTS are on the same clock as `time.time()`.
+            reorder_depth (int, optional): Number of frames to wait for a matching image before giving up. Defaults to 3.
+            detector_buffer (Optional[SharedRingBuffer], optional): Shared memory for the animal detector's images. Defaults to None.
+        """
         self._last_image = None
         self._output = output
+        self._image_buffer = image_buffer
+        self._motion_buffer = motion_buffer
+        self._tolerance = 1e6 / framerate / 2
+        self._clock = clock
+        self._clock_offset = 0.0
+        self._clock_mismatch = False
+        # Arrays passed by value since each buffer was last found full
+        self._passed_by_value: Dict[str, int] = {}
+        self._unsynchronised = False
+        self._reorder_depth = reorder_depth
+        self._images: OrderedDictType[int, np.ndarray] = OrderedDict()
+        self._detector_buffer = detector_buffer
+        self._last_detector_image = None
+        self._detector_images: OrderedDictType[int, np.ndarray] = OrderedDict()
+        self._pending: Deque[Tuple[int, np.ndarray]] = deque()
+        self.unmatched_frames = 0
+
+    def set_framerate(self, framerate: float):
+        """Update the framerate used to decide which timestamps match, e.g. after the camera has been reconfigured"""
+        self._tolerance = 1e6 / framerate / 2
+
+    def _share(self, array: np.ndarray, buffer: Optional[SharedRingBuffer]):
+        if buffer is None:
+            return array
+
+        shared = buffer.put(array)
+        if shared is None:
+            if buffer.name not in self._passed_by_value:
+                self._passed_by_value[buffer.name] = 0
+                logger.warning(
+                    'Shared frame buffer of {} slots full, passing frames by value; consider raising `frame_buffer_slots`'.format(
+                        buffer.slots
+                    )
+                )
+            self._passed_by_value[buffer.name] += 1
+            return array
+
+        passed = self._passed_by_value.pop(buffer.name, None)
+        if passed is not None:
+            logger.info(
+                'Shared frame buffer has room again after passing {} arrays by value'.format(
+                    passed
+                )
+            )
+        return shared
+
+    def _emit(
+        self,
+        image: np.ndarray,
+        motion: np.ndarray,
+        timestamp: float,
+        detector_image: Optional[np.ndarray] = None,
+    ):
+        # The same image may be paired with several motion frames; each frame
+        # holds its own reference to the single shared copy
+        acquire(image, detector_image)
+        self._output.put(
+            Frame(
+                image,
+                self._share(motion, self._motion_buffer),
+                timestamp,
+                detector_image,
+            )
+        )
+
+    def _update_clock_offset(self, pts: int):
+        now = self._clock()
+        if abs(now - pts) <= MAX_CAPTURE_DELAY:
+            self._clock_offset = time() - now / 1e6
+            return
+
+        if not self._clock_mismatch:
+            self._clock_mismatch = True
+            logger.warning(
+                'Frame timestamps do not follow the camera clock; timing frames by their arrival instead'
+            )
+        self._clock_offset = time() - pts / 1e6
+
+    def _capture_time(self, pts: int) -> float:
+        return self._clock_offset + pts / 1e6
+
+    def _nearest_image(self, pts: int) -> Tuple[Optional[int], Optional[np.ndarray]]:
+        if len(self._images) == 0:
+            return None, None
+        image_pts = min(self._images, key=lambda t: abs(t - pts))
+        return image_pts, self._images[image_pts]
+
+    def _matching_detector_image(self, pts: int) -> Optional[np.ndarray]:
+        if len(self._detector_images) == 0:
+            return None
+        image_pts = min(self._detector_images, key=lambda t: abs(t - pts))
+        if abs(image_pts - pts) > self._tolerance:
+            return None
+        return self._detector_images[image_pts]
+
+    def _keep(
+        self,
+        images: OrderedDictType[int, np.ndarray],
+        pts: int,
+        image: np.ndarray,
+    ):
+        # The reorder buffer holds its own reference to each image it keeps
+        acquire(image)
+        images[pts] = image
+        while len(images) > self._reorder_depth + 1:
+            _, evicted = images.popitem(last=False)
+            release(evicted)
+
+    def _flush(self):
+        """Emit waiting motion frames, in order, for which a matching image has arrived or can no longer be expected"""
+        while self._pending:
+            pts, motion = self._pending[0]
+            if len(self._images) == 0 and self._last_image is not None:
+                # The images carry no timestamps to match on
+                if not self._unsynchronised:
+                    self._unsynchronised = True
+                    logger.warning(
+                        'Images have no timestamps, pairing motion with the latest image instead'
+                    )
+                self._pending.popleft()
+                self._emit(self._last_image, motion, time(), self._last_detector_image)
+                continue
+
+            image_pts, image = self._nearest_image(pts)
+
+            if image_pts is None or abs(image_pts - pts) > self._tolerance:
+                newest_pts = next(reversed(self._images), None)
+                image_may_follow = newest_pts is None or newest_pts < pts
+                if image_may_follow and len(self._pending) <= self._reorder_depth:
+                    return
+
+                self.unmatched_frames += 1
+                if image is None:
+                    self._pending.popleft()
+                    continue
+
+            self._pending.popleft()
+            self._emit(
+                image,
+                motion,
+                self._capture_time(pts),
+                self._matching_detector_image(pts),
+            )
+
+    def tick_movement_frame(self, motion: np.ndarray, pts: Optional[int] = None):
+        """Provide the motion vectors for a frame
+
+        Args:
+            motion (np.ndarray): Motion vectors for the frame
+            pts (Optional[int], optional): Presentation timestamp of the frame in microseconds. Defaults to None.
+        """
+        if pts is None:
+            if self._last_image is not None:
+                self._emit(self._last_image, motion, time(), self._last_detector_image)
+            return
 
-    def tick_movement_frame(self, motion):
-        if self._last_image is not None:
-            image = np.asarray(bytearray(self._last_image), dtype="uint8")
-        else:
+        self._pending.append((pts, motion))
+        self._flush()
+
+    def tick_image_frame(self, image: bytes, pts: Optional[int] = None):
+        """Provide a new JPEG image. The image is wrapped once, without copying it. If a shared buffer is in use the image is written into it here, exactly once, however many motion frames it is later paired with.
+
+        Args:
+            image (bytes): JPEG-encoded image
+            pts (Optional[int], optional): Presentation timestamp of the image in microseconds. Defaults to None.
+        """
+        previous = self._last_image
+        self._last_image = self._share(
+            np.frombuffer(image, dtype='uint8'), self._image_buffer
+        )
+
+        if pts is None:
+            release(previous)
+            self._flush()
             return
-        self._output.put_nowait(Frame(image, motion, time()))
 
-    def tick_image_frame(self, image):
-        self._last_image = image
+        self._keep(self._images, pts, self._last_image)
+        release(previous)
+        self._unsynchronised = False
+
+        if self._clock is not None:
+            self._update_clock_offset(pts)
+
+        self._flush()
+
+    def tick_detector_frame(self, image: np.ndarray, pts: Optional[int] = None):
+        """Provide a new downscaled image for the animal detector. It is attached to the frame(s) captured at the same moment.
+
+        Args:
+            image (np.ndarray): BGR image at the detector's input resolution
+            pts (Optional[int], optional): Presentation timestamp of the image in microseconds. Defaults to None.
+        """
+        previous = self._last_detector_image
+        self._last_detector_image = self._share(image, self._detector_buffer)
+        if pts is not None:
+            self._keep(self._detector_images, pts, self._last_detector_image)
+        release(previous)
+
+    def reset(self):
+        """Discard all images and motion frames waiting to be paired, e.g. when the camera's timestamps restart"""
+        release(
+            self._last_image,
+            self._last_detector_image,
+            *self._images.values(),
+            *self._detector_images.values()
+        )
+        self._last_image = None
+        self._last_detector_image = None
+        self._images.clear()
+        self._detector_images.clear()
+        self._pending.clear()
+
+    def close(self):
+        self.reset()
 
 
 class MovementAnalyser(PiMotionAnalysis):
@@ -72,40 +454,195 @@ class MovementAnalyser(PiMotionAnalysis):
         self._sync = synchroniser
 
     def analyse(self, motion):
-        self._sync.tick_movement_frame(motion)
+        frame = self.camera.frame
+        self._sync.tick_movement_frame(motion, frame.timestamp)
 
 
 class ImageReader:
-    def __init__(self, synchroniser):
+    def __init__(self, synchroniser, camera, splitter_port):
         self._sync = synchroniser
+        self._camera = camera
+        self._splitter_port = splitter_port
 
     def write(self, buf):
         if buf.startswith(b'\xff\xd8'):
-            self._sync.tick_image_frame(buf)
+            # `PiCamera.frame` only reports on splitter port 1, so read this
+            # encoder's frame information directly
+            frame = self._camera._encoders[self._splitter_port].frame
+            self._sync.tick_image_frame(buf, frame.timestamp)
+
+
+class DetectorReader(PiRGBAnalysis):
+    def __init__(self, synchroniser, camera, splitter_port, size):
+        super().__init__(camera, size)
+        self._sync = synchroniser
+        self._splitter_port = splitter_port
+
+    def analyse(self, array):
+        frame = self.camera._encoders[self._splitter_port].frame
+        self._sync.tick_detector_frame(array, frame.timestamp)
 
 
 class Camera:
     """Acts as a wrapper class to provide a simple interface to a stream of camera frames. Each frame consists of motion vectors and a JPEG image. The frames are stored on an internal queue, ready to be read by any subsequent stage in the system."""
 
-    def __init__(self, settings: CameraSettings):
-        """Takes a `CameraSettings` object to initialise and start the camera hardware."""
+    def __init__(
+        self,
+        settings: CameraSettings,
+        sequence_period_s: float = MotionQueueSettings.max_sequence_period_s,
+    ):
+        """Takes a `CameraSettings` object to initialise and start the camera hardware.
+
+        Args:
+            settings (CameraSettings): Settings for the camera
+            sequence_period_s (float, optional): Longest motion sequence, see `DynAIkonTrap.settings.MotionQueueSettings.max_sequence_period_s`. Unless set otherwise, the shared frame buffers have room for one such sequence and a full output queue. Defaults to that of the default `MotionQueueSettings`.
+        """
 
         self.resolution = settings.resolution
         self.framerate = settings.framerate
         self._camera = PiCamera(resolution=self.resolution, framerate=self.framerate)
+        # Frame timestamps on the same clock as `PiCamera.timestamp`, rather
+        # than counting from the start of each recording
+        self._camera.clock_mode = 'raw'
         sleep(2)  # Camera warmup
 
-        self._output: QueueType[Frame] = Queue()
-        synchroniser = Synchroniser(self._output)
+        self._max_resolution = self.resolution
+        self._detector_stream = settings.detector_stream
+        self._detector_resolution = settings.detector_resolution
+
+        self._image_buffer = None
+        self._motion_buffer = None
+        self._detector_buffer = None
+        slots = settings.frame_buffer_slots
+        if slots < 0:
+            # Frames of a motion sequence hold their slots until it is analysed
+            slots = int(self.framerate * sequence_period_s) + settings.max_queued_frames
+            available = _available_memory()
+            if available is not None:
+                affordable = int(
+                    available * FRAME_BUFFER_MEMORY_FRACTION / sum(self._slot_sizes())
+                )
+                if affordable < slots:
+                    logger.warning(
+                        'Shared frame buffers limited to {} of the {} slots a motion sequence may need by the memory available'.format(
+                            affordable, slots
+                        )
+                    )
+                    slots = affordable
+        if slots > 0:
+            try:
+                (
+                    self._image_buffer,
+                    self._motion_buffer,
+                    self._detector_buffer,
+                ) = self._create_buffers(slots)
+            except RuntimeError as e:
+                logger.warning('{}; frames will be copied between stages'.format(e))
+
+        self._output = FrameQueue(
+            settings.max_queued_frames,
+            settings.drop_policy,
+            settings.decimation_factor,
+        )
+        self._synchroniser = Synchroniser(
+            self._output,
+            self._image_buffer,
+            self._motion_buffer,
+            framerate=self.framerate,
+            clock=lambda: self._camera.timestamp,
+            detector_buffer=self._detector_buffer,
+        )
+        self._stopped = Event()
+        # Reconfiguring from another thread must not overlap with closing
+        self._lock = Lock()
+        self._start_recording()
+        logger.debug('Camera started')
+
+    def _start_recording(self):
         self._camera.start_recording(
             '/dev/null',
             format='h264',
-            motion_output=MovementAnalyser(self._camera, synchroniser),
+            motion_output=MovementAnalyser(self._camera, self._synchroniser),
         )
         self._camera.start_recording(
-            ImageReader(synchroniser), format='mjpeg', splitter_port=2
+            ImageReader(self._synchroniser, self._camera, 2),
+            format='mjpeg',
+            splitter_port=2,
         )
-        logger.debug('Camera started')
+        if self._detector_stream:
+            # Scaled on the GPU, so the detector neither decodes nor resizes
+            self._camera.start_recording(
+                DetectorReader(
+                    self._synchroniser, self._camera, 3, self._detector_resolution
+                ),
+                format='bgr',
+                splitter_port=3,
+                resize=self._detector_resolution,
+            )
+
+    def _stop_recording(self):
+        if self._detector_stream:
+            self._camera.stop_recording(splitter_port=3)
+        self._camera.stop_recording(splitter_port=2)
+        self._camera.stop_recording()
+
+    def reconfigure(self, framerate: int, resolution: Tuple[int, int]):
+        """Change the framerate and resolution at which frames are captured. Recording is briefly stopped to do so, so a few frames are lost.
+
+        The resolution may not exceed the one the camera was started with, as the shared frame buffers are sized for that.
+
+        Args:
+            framerate (int): New camera framerate
+            resolution (Tuple[int, int]): New camera resolution
+
+        Raises:
+            ValueError: If the resolution is larger than the one the camera was started with
+        """
+        width, height = resolution
+        if width * height > self._max_resolution[0] * self._max_resolution[1]:
+            raise ValueError(
+                'Cannot increase resolution beyond {}x{}'.format(*self._max_resolution)
+            )
+
+        with self._lock:
+            if self._stopped.is_set():
+                return
+
+            self._stop_recording()
+            self._synchroniser.reset()
+            self._camera.framerate = framerate
+            self._camera.resolution = resolution
+            self.framerate = framerate
+            self.resolution = resolution
+            self._synchroniser.set_framerate(framerate)
+            self._start_recording()
+        logger.info(
+            'Camera reconfigured to {}FPS @ {}x{}'.format(framerate, width, height)
+        )
+
+    def _slot_sizes(self) -> Tuple[int, int, int]:
+        """Sizes of a slot of the image, motion, and detector image buffers, in bytes; `0` for the detector images if they are not recorded"""
+        width, height = self.resolution
+        # One motion vector (x: i1, y: i1, sad: u2) per macroblock, plus an extra column
+        motion_rows = (height + 15) // 16
+        motion_cols = (width + 15) // 16 + 1
+        detector_size = 0
+        if self._detector_stream:
+            detector_width, detector_height = self._detector_resolution
+            detector_size = detector_width * detector_height * 3
+        # A JPEG frame should comfortably fit within one byte per pixel
+        return width * height, motion_rows * motion_cols * 4, detector_size
+
+    def _create_buffers(
+        self, slots: int
+    ) -> Tuple[SharedRingBuffer, SharedRingBuffer, Optional[SharedRingBuffer]]:
+        image_size, motion_size, detector_size = self._slot_sizes()
+        image_buffer = SharedRingBuffer(slots, image_size)
+        motion_buffer = SharedRingBuffer(slots, motion_size)
+        detector_buffer = None
+        if detector_size > 0:
+            detector_buffer = SharedRingBuffer(slots, detector_size)
+        return image_buffer, motion_buffer, detector_buffer
 
     def get(self) -> Frame:
         """Retrieve the next frame from the camera
@@ -120,7 +657,8 @@ class Camera:
             return self._output.get(1 / self.framerate)
 
         except Empty:
-            logger.error('No frames available from Camera')
+            if not self._stopped.is_set():
+                logger.error('No frames available from Camera')
             self._no_frames = True
             raise Empty
 
@@ -132,5 +670,19 @@ class Camera:
         """
         return self._output.empty()
 
+    def dropped_frames(self) -> Dict[DropPolicy, int]:
+        """Number of frames dropped since the camera started because the output queue was full
+
+        Returns:
+            Dict[DropPolicy, int]: Count of dropped frames by the policy under which they were dropped
+        """
+        return self._output.dropped()
+
     def close(self):
-        self._camera.stop_recording()
+        with self._lock:
+            self._stopped.set()
+            self._stop_recording()
+        self._synchroniser.close()
+        for buffer in (self._image_buffer, self._motion_buffer, self._detector_buffer):
+            if buffer is not None:
+                buffer.close()
@@ -32,7 +32,7 @@ meta = {
         }
 ```
 """
-from multiprocessing import Process
+from multiprocessing import Event, Process
 from typing import Dict, IO, Tuple, List
 from tempfile import NamedTemporaryFile
 from io import StringIO
@@ -157,20 +157,44 @@ class Output:
         self._frame_queue = read_from[0]
         self._sensor_logs = read_from[1]
         self.framerate = self._frame_queue.framerate
+        self._output_format = settings.output_format
+        self._idle = Event()
+        self._start()
 
-        if settings.output_format == OutputFormat.VIDEO:
+    def _start(self):
+        if self._output_format == OutputFormat.VIDEO:
             self._reader = Process(target=self._read_frames_to_video, daemon=True)
         else:
             self._reader = Process(target=self._read_frames, daemon=True)
         self._reader.start()
 
+    @property
+    def process(self) -> Process:
+        """The process outputting frames"""
+        return self._reader
+
+    def is_idle(self) -> bool:
+        """Indicates if the output is waiting for frames, rather than busy outputting one"""
+        return self._idle.is_set()
+
+    def restart(self):
+        """Replace the output process, e.g. after it has crashed. A partly recorded video is lost."""
+        self.close()
+        self._start()
+
     def close(self):
-        self._reader.terminate()
+        self._reader.kill()
         self._reader.join()
 
+    def _get(self):
+        self._idle.set()
+        frame = self._frame_queue.get()
+        self._idle.clear()
+        return frame
+
     def _read_frames(self):
         while True:
-            frame = self._frame_queue.get()
+            frame = self._get()
             if frame is None:
                 continue
 
@@ -186,13 +210,14 @@ class Output:
                     humidity=log.humidity,
                     pressure=log.pressure,
                 )
+            frame.release()
 
     def _read_frames_to_video(self):
         start_new = True
         start_time = 0
         caption_generator = VideoCaption(self._sensor_logs, self.framerate)
         while True:
-            frame = self._frame_queue.get()
+            frame = self._get()
 
             # End of motion sequence
             if frame is None and not start_new:
@@ -221,6 +246,7 @@ class Output:
 
             writer.write(decoded_image)
             frame_timestamps.append(frame.timestamp)
+            frame.release()
 
     def output_still(self, image: bytes, time: float, **kwargs):
         """Output a still image with its sensor data. The sensor data can be provided via the keyword arguments.
@@ -16,16 +16,202 @@
 """
 This module provides a generic interface to an animal detector. The system is fairly agnostic of the specific animal detection mechanism beings used, as the input to the `AnimalFilter` is a JPEG image and the output a confidence in the image containing an animal.
 
-A WCS-trained Tiny YOLOv4 model is used in this implementation, but any other architecture could be substituted in its place easily. Such a substitution would not require any changes to the module interface.
+A WCS-trained Tiny YOLOv4 model is used in this implementation, but any other architecture could be substituted in its place easily. Such a substitution would not require any changes to the module interface. The network can be run by any of the inference libraries in `DynAIkonTrap.filtering.backends`. An `AnimalFilter` only settles on the library when it is created; the network is loaded on first use, or by `AnimalFilter.load()`, in the process that will run it. The filter can therefore be created before forking the processes running it, which each load their own network.
+
+Where the camera records a stream at the detector's input resolution (see `DynAIkonTrap.camera.Frame.detector_image`) this can be passed in alongside the JPEG, so the JPEG need not be decoded and resized.
+
+Optionally (`DynAIkonTrap.settings.AnimalFilterSettings.crop_to_motion`) the detector is run only on crops of the full-resolution image around the regions of motion found by the motion filter (`DynAIkonTrap.camera.Frame.motion_regions`, which requires `DynAIkonTrap.settings.MotionFilterSettings.motion_regions`). A small or distant animal then fills more of the network's input, rather than being shrunk to a few pixels along with the whole frame. Crops of small regions are also fed to the network at a smaller input size, making each inference cheaper. See `crop_boxes()`.
+
+Several frames can be analysed in a single forward pass of the network with `AnimalFilter.run_raw_batch()`, which spreads the fixed cost of each call over the whole batch.
+
+Most frames reaching the animal filter turn out to be empty. With `DynAIkonTrap.settings.AnimalFilterSettings.cascade` each whole frame is first analysed at a reduced input size (`DynAIkonTrap.settings.AnimalFilterSettings.cascade_input_size`), which takes a fraction of the time of a full pass. Only if the confidence from this cheap pass falls in the uncertain band between `DynAIkonTrap.settings.AnimalFilterSettings.cascade_reject_below` and `DynAIkonTrap.settings.AnimalFilterSettings.cascade_accept_above` is the frame analysed again at the full input size. The band should contain the filter's threshold. Backends whose network is fixed to one input size cannot run the cheap pass, so the cascade is disabled for them.
+
+Consecutive frames of a motion sequence are often nearly identical, e.g. while an animal stands still. With `DynAIkonTrap.settings.AnimalFilterSettings.cache_size` above zero, the confidences of recently analysed frames are kept in an `InferenceCache`, keyed on a perceptual hash of each frame (`dhash()`). A frame whose hash differs from a cached one in at most `DynAIkonTrap.settings.AnimalFilterSettings.cache_max_distance` bits is given the cached confidence without running the network. Crops around motion are not cached.
+
+Preparing each frame for the network is kept cheap: the JPEG is decoded at a half, quarter, or eighth of its size where that is still larger than the network's input, resized into a buffer reused for every frame, and scaled into a reused input blob in the same pass that rearranges it. The time spent in each stage is accumulated in `AnimalFilter.timings`.
 """
+from collections import OrderedDict
+from dataclasses import replace
+from time import time
+from typing import List, Optional, Sequence, Tuple
 import cv2
 import numpy as np
 
+from DynAIkonTrap.filtering.backends import Backend, choose_backend, create_backend
+from DynAIkonTrap.logging import get_logger
 from DynAIkonTrap.settings import AnimalFilterSettings
 
+logger = get_logger(__name__)
+
+# Full size of the network's input; inputs must be a multiple of 32
+INPUT_SIZE = 416
+
+# Flags for decoding a JPEG at a fraction of its size, by the reduction
+_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Stages of the animal filter timed in `AnimalFilter.timings`
+STAGES = ('decode', 'resize', 'blob', 'forward')
+
+# Crop as (x0, y0, x1, y1) in pixels, with the network input size to use for it
+Crop = Tuple[int, int, int, int, int]
+
+# Box as (x0, y0, x1, y1) fractions of the frame
+Box = Tuple[float, float, float, float]
+
+# Regions of motion as boxes
+Regions = Sequence[Box]
+
+# Confidence that a frame contains an animal, with the box of the most confident detection
+Detection = Tuple[float, Box]
+
+
+def crop_boxes(
+    regions: Regions,
+    image_shape: Tuple[int, ...],
+    margin: float,
+    max_crops: int,
+    min_input_size: int,
+) -> List[Crop]:
+    """Square crops of an image around the given regions of motion, with a network input size for each. The input size is the first of `min_input_size`, doubled as often as needed and capped at `INPUT_SIZE`, to fit the crop. Small regions are therefore not scaled up to the full input size, while the network only ever sees a few input sizes, each of which some backends, e.g. OpenCV's, prepare for separately.
+
+    Args:
+        regions (Regions): Regions as `(x0, y0, x1, y1)` fractions of the image, largest first
+        image_shape (Tuple[int, ...]): Shape of the image to be cropped
+        margin (float): Context added to each side of a region, as a fraction of its larger side
+        max_crops (int): Maximum number of crops; only the largest regions are used
+        min_input_size (int): Smallest network input size
+
+    Returns:
+        List[Crop]: Crops as `(x0, y0, x1, y1, input_size)`. Empty if the crops would cover most of the image anyway, in which case the whole image should be used.
+    """
+    height, width = image_shape[:2]
+    crops = []
+    for x0, y0, x1, y1 in regions[:max_crops]:
+        side = max((x1 - x0) * width, (y1 - y0) * height) * (1 + 2 * margin)
+        side = int(min(max(side, min_input_size), width, height))
+        centre_x = (x0 + x1) / 2 * width
+        centre_y = (y0 + y1) / 2 * height
+        left = int(min(max(centre_x - side / 2, 0), width - side))
+        top = int(min(max(centre_y - side / 2, 0), height - side))
+        input_size = min_input_size
+        while input_size < min(side, INPUT_SIZE):
+            input_size = min(2 * input_size, INPUT_SIZE)
+        crops.append((left, top, left + side, top + side, input_size))
+
+    covered = sum((c[2] - c[0]) * (c[3] - c[1]) for c in crops)
+    if covered > width * height / 2:
+        return []
+    return crops
+
+
+def dhash(image: np.ndarray) -> int:
+    """Difference hash of an image. The image is shrunk to 9x8 greyscale pixels and each of the 64 bits of the hash is set if a pixel is brighter than its neighbour to the left. Near-identical images give hashes differing in only a few bits.
+
+    Args:
+        image (np.ndarray): BGR image
+
+    Returns:
+        int: The 64-bit hash
+    """
+    grey = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(grey, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class InferenceCache:
+    """Least-recently-used cache of the detector's results for recently analysed frames, keyed on their `dhash()`. Keeps count of its hit rate and the inference time it has saved."""
+
+    def __init__(self, size: int, max_distance: int):
+        """
+        Args:
+            size (int): Number of frames to remember
+            max_distance (int): Largest number of bits in which a frame's hash may differ from a cached frame's to be given its result
+        """
+        self._size = size
+        self._max_distance = max_distance
+        self._entries = OrderedDict()  # Hash: detection, least recently used first
+        self._inferences = 0
+        self._mean_time = 0.0
+        self.lookups = 0
+        self.hits = 0
+        self.time_saved_s = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def get(self, key: int) -> Optional[Detection]:
+        """Result of the cached frame closest to the given hash, if close enough
+
+        Args:
+            key (int): Hash of the frame
+
+        Returns:
+            Optional[Detection]: The cached result, or `None` if no cached frame is within the distance
+        """
+        self.lookups += 1
+        distance, closest = min(
+            ((bin(key ^ cached).count('1'), cached) for cached in self._entries),
+            default=(None, None),
+        )
+        if closest is None or distance > self._max_distance:
+            return None
+
+        self._entries.move_to_end(closest)
+        self.hits += 1
+        self.time_saved_s += self._mean_time
+        return self._entries[closest]
+
+    def put(self, key: int, detection: Detection):
+        """Remember a frame's result, forgetting the least recently used frame if the cache is full
+
+        Args:
+            key (int): Hash of the frame
+            detection (Detection): Result the detector gave for the frame
+        """
+        self._entries[key] = detection
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def record_inference(self, duration: float, images: int):
+        """Record the time taken to analyse frames missing from the cache, to estimate the time saved by each hit
+
+        Args:
+            duration (float): Time taken in seconds
+            images (int): Number of frames analysed in that time
+        """
+        total = self._mean_time * self._inferences + duration
+        self._inferences += images
+        self._mean_time = total / self._inferences
+
+
+def _as_buffer(image: bytes) -> np.ndarray:
+    # Images from the camera are already arrays; wrapping bytes does not copy them
+    if isinstance(image, np.ndarray):
+        return image
+    return np.frombuffer(image, dtype=np.uint8)
+
+
+def _corners(x: float, y: float, w: float, h: float) -> Box:
+    # Darknet YOLO layers give a box's centre and size as fractions of the input
+    return (
+        max(x - w / 2, 0.0),
+        max(y - h / 2, 0.0),
+        min(x + w / 2, 1.0),
+        min(y + h / 2, 1.0),
+    )
+
 
 class AnimalFilter:
-    """Animal filter stage to indicate if a frame contains an animal
+    """Animal filter stage to indicate if a frame contains an animal. The total time spent in each of the `STAGES` so far is kept in the `timings` dictionary, in seconds.
     """
     def __init__(self, settings: AnimalFilterSettings):
         """
@@ -33,45 +219,336 @@ class AnimalFilter:
             settings (AnimalFilterSettings): Settings for the filter
         """
         self.threshold = settings.threshold
+        self._crop_to_motion = settings.crop_to_motion
+        self._crop_margin = settings.crop_margin
+        self._max_crops = settings.max_crops
+        self._min_input_size = settings.min_input_size
+        self._cascade_input_size = settings.cascade_input_size
+        self._cascade_band = (
+            settings.cascade_reject_below,
+            settings.cascade_accept_above,
+        )
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self._reduction = 1  # Learnt from the size of the frames decoded so far
+        self._resized = {}  # Resize buffers by input size and position in the batch
+        self._blobs = {}  # Input blobs by shape
+        self.cache = None
+        if settings.cache_size > 0:
+            self.cache = InferenceCache(settings.cache_size, settings.cache_max_distance)
+
+        # The network itself is only loaded in the process running it
+        self._settings = replace(settings, backend=choose_backend(settings))
+        self._backend = None
+        self._threads = None
+        self._cascade = settings.cascade
+
+    @property
+    def backend(self) -> Backend:
+        """The backend running the network, loaded on first use"""
+        self.load()
+        return self._backend
 
-        self.model = cv2.dnn.readNet(
-            'DynAIkonTrap/filtering/yolo_animal_detector.weights',
-            'DynAIkonTrap/filtering/yolo_animal_detector.cfg',
+    def load(self):
+        """Load the network, if not loaded already, and run it once on a blank image. Inference libraries start thread pools when a network is first loaded or run, which do not survive the process being forked. This should therefore be called in the process that will run the detector, after any processes have been forked from it."""
+        if self._backend is not None:
+            return
+
+        self._backend = create_backend(self._settings)
+        if self._threads is not None:
+            self._backend.set_threads(self._threads)
+        if self._cascade and self._backend.input_size is not None:
+            logger.warning(
+                'The {} detector backend only runs one input size; not using the cascade'.format(
+                    self._backend.name
+                )
+            )
+            self._cascade = False
+        self.warm_up()
+
+    def warm_up(self):
+        """Run the network once on a blank image. Libraries prepare much of a network's memory, such as repacked weights, on its first run, which would otherwise slow down the first frame analysed."""
+        image = np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)
+        self._infer(image)
+        if self._cascade:
+            self._infer(image, self._cascade_input_size)
+        self.timings = dict.fromkeys(STAGES, 0.0)
+
+    def set_threads(self, threads: int):
+        """Limit the number of threads the detector uses in the calling process, e.g. when several processes run detectors at once. May be called before the network is loaded.
+
+        Args:
+            threads (int): Number of threads
+        """
+        self._threads = threads
+        if self._backend is not None:
+            self._backend.set_threads(threads)
+
+    def _decode(self, image: bytes, reduce: bool = True) -> np.ndarray:
+        t_start = time()
+        reduction = self._reduction if reduce else 1
+        decoded = cv2.imdecode(_as_buffer(image), _DECODE_FLAGS[reduction])
+
+        # The largest reduction still leaving the image larger than the input
+        full_size = min(decoded.shape[:2]) * reduction
+        self._reduction = max(
+            r for r in _DECODE_FLAGS if r == 1 or full_size // r >= INPUT_SIZE
         )
-        layer_names = self.model.getLayerNames()
-        self.output_layers = [
-            layer_names[i[0] - 1] for i in self.model.getUnconnectedOutLayers()
+        self.timings['decode'] += time() - t_start
+        return decoded
+
+    def _resize(self, image: np.ndarray, input_size: int, slot: int) -> np.ndarray:
+        t_start = time()
+        buffer = self._resized.get((input_size, slot))
+        if buffer is None:
+            buffer = np.empty((input_size, input_size, 3), dtype=np.uint8)
+            self._resized[(input_size, slot)] = buffer
+        cv2.resize(image, (input_size, input_size), dst=buffer)
+        self.timings['resize'] += time() - t_start
+        return buffer
+
+    def _prepare(
+        self, image: bytes, detector_image: Optional[np.ndarray], slot: int = 0
+    ) -> np.ndarray:
+        if detector_image is None:
+            return self._resize(self._decode(image), INPUT_SIZE, slot)
+        if detector_image.shape[:2] == (INPUT_SIZE, INPUT_SIZE):
+            return detector_image
+        return self._resize(np.asarray(detector_image), INPUT_SIZE, slot)
+
+    def _infer(self, image: np.ndarray, input_size: int = INPUT_SIZE) -> Detection:
+        return self._infer_batch([image], input_size)[0]
+
+    def _infer_batch(
+        self, images: List[np.ndarray], input_size: int = INPUT_SIZE
+    ) -> List[Detection]:
+        # Networks fixed to one input size are also given crops at that size
+        if self.backend.input_size is not None:
+            input_size = self.backend.input_size
+        images = [
+            image
+            if image.shape[:2] == (input_size, input_size)
+            else self._resize(image, input_size, slot)
+            for slot, image in enumerate(images)
         ]
 
-    def run_raw(self, image: bytes) -> float:
-        """Run the animal filter on the image to give a confidence that the image frame contains an animal
+        t_start = time()
+        shape = (len(images), 3, input_size, input_size)
+        blob = self._blobs.get(shape)
+        if blob is None:
+            blob = self._blobs[shape] = np.empty(shape, dtype=np.float32)
+        for image, planes in zip(images, blob):
+            # HWC to CHW, scaled to the range [0, 1] in the same pass
+            np.multiply(image.transpose(2, 0, 1), np.float32(1 / 255), out=planes)
+        t_forward = time()
+        self.timings['blob'] += t_forward - t_start
+
+        output = self.backend.forward(blob)
+        self.timings['forward'] += time() - t_forward
+
+        # Most confident detection of each image, over all output layers
+        detections = np.concatenate(output, axis=1)
+        best = detections[np.arange(len(images)), detections[:, :, 5].argmax(axis=1)]
+        return [
+            (float(confidence), _corners(x, y, w, h))
+            for x, y, w, h, confidence in best[:, [0, 1, 2, 3, 5]].tolist()
+        ]
+
+    def _infer_cascade(self, images: List[np.ndarray]) -> List[Detection]:
+        # Loading may disable the cascade
+        self.load()
+        if not self._cascade:
+            return self._infer_batch(images)
+
+        detections = self._infer_batch(images, self._cascade_input_size)
+        reject_below, accept_above = self._cascade_band
+        uncertain = [
+            i
+            for i, (confidence, _) in enumerate(detections)
+            if reject_below <= confidence < accept_above
+        ]
+        if uncertain:
+            full = self._infer_batch([images[i] for i in uncertain])
+            for i, detection in zip(uncertain, full):
+                detections[i] = detection
+        return detections
+
+    def _infer_cached(self, images: List[np.ndarray]) -> List[Detection]:
+        if self.cache is None:
+            return self._infer_cascade(images)
+
+        keys = [dhash(image) for image in images]
+        detections = [self.cache.get(key) for key in keys]
+        misses = [i for i, detection in enumerate(detections) if detection is None]
+        if misses:
+            t_start = time()
+            results = self._infer_cascade([images[i] for i in misses])
+            self.cache.record_inference(time() - t_start, len(misses))
+            for i, detection in zip(misses, results):
+                detections[i] = detection
+                self.cache.put(keys[i], detection)
+        return detections
+
+    def detect(
+        self,
+        image: bytes,
+        detector_image: Optional[np.ndarray] = None,
+        regions: Optional[Regions] = None,
+    ) -> Detection:
+        """Run the animal filter on the image to give a confidence that the image frame contains an animal, along with where the animal is
 
         Args:
             image (bytes): The image frame to be analysed in JPEG format
+            detector_image (Optional[np.ndarray], optional): The same frame as a decoded BGR image, ideally already at the detector's input resolution. If given, this is used instead of decoding the JPEG. Defaults to None.
+            regions (Optional[Regions], optional): Regions of motion in the frame, see `DynAIkonTrap.camera.Frame.motion_regions`. If cropping to motion is enabled, only crops around these regions are analysed. Defaults to None, meaning the whole frame is analysed.
 
         Returns:
-            float: Confidence in the output containing an animal as a decimal fraction
+            Detection: Confidence in the output containing an animal as a decimal fraction, and the box of the most confident detection
         """
-        decoded_image = cv2.resize(
-            cv2.imdecode(np.asarray(image), cv2.IMREAD_COLOR), (416, 416)
-        )
+        if self._crop_to_motion and regions:
+            decoded_image = self._decode(image, reduce=False)
+            height, width = decoded_image.shape[:2]
+            crops = crop_boxes(
+                regions,
+                decoded_image.shape,
+                self._crop_margin,
+                self._max_crops,
+                self._min_input_size,
+            )
+            if crops:
+                detections = []
+                for x0, y0, x1, y1, input_size in crops:
+                    confidence, (bx0, by0, bx1, by1) = self._infer(
+                        decoded_image[y0:y1, x0:x1], input_size
+                    )
+                    # From fractions of the crop to fractions of the frame
+                    box = (
+                        (x0 + bx0 * (x1 - x0)) / width,
+                        (y0 + by0 * (y1 - y0)) / height,
+                        (x0 + bx1 * (x1 - x0)) / width,
+                        (y0 + by1 * (y1 - y0)) / height,
+                    )
+                    detections.append((confidence, box))
+                return max(detections, key=lambda detection: detection[0])
+            if detector_image is None:
+                # Already decoded; this is resized as the detector's image would be
+                detector_image = decoded_image
+
+        return self._infer_cached([self._prepare(image, detector_image)])[0]
+
+    def run_raw(
+        self,
+        image: bytes,
+        detector_image: Optional[np.ndarray] = None,
+        regions: Optional[Regions] = None,
+    ) -> float:
+        """Run the animal filter on the image to give a confidence that the image frame contains an animal
 
-        blob = cv2.dnn.blobFromImage(decoded_image, 1, (416, 416), (0, 0, 0))
-        blob = blob / 255  # Scale to be a float
-        self.model.setInput(blob)
-        output = self.model.forward(self.output_layers)
+        Args:
+            image (bytes): The image frame to be analysed in JPEG format
+            detector_image (Optional[np.ndarray], optional): The same frame as a decoded BGR image, see `detect()`. Defaults to None.
+            regions (Optional[Regions], optional): Regions of motion in the frame, see `detect()`. Defaults to None, meaning the whole frame is analysed.
 
-        _, _, _, _, _, confidence0 = output[0].max(axis=0)
-        _, _, _, _, _, confidence1 = output[1].max(axis=0)
-        return max(confidence0, confidence1)
+        Returns:
+            float: Confidence in the output containing an animal as a decimal fraction
+        """
+        return self.detect(image, detector_image, regions)[0]
 
-    def run(self, image: bytes) -> bool:
+    def run(
+        self,
+        image: bytes,
+        detector_image: Optional[np.ndarray] = None,
+        regions: Optional[Regions] = None,
+    ) -> bool:
         """The same as `run_raw()`, but with a threshold applied. This function outputs a boolean to indicate if the confidence is at least as large as the threshold
 
         Args:
             image (bytes): The image frame to be analysed in JPEG format
+            detector_image (Optional[np.ndarray], optional): The same frame as a decoded BGR image, see `run_raw()`. Defaults to None.
+            regions (Optional[Regions], optional): Regions of motion in the frame, see `run_raw()`. Defaults to None.
 
         Returns:
             bool: `True` if the confidence in animal presence is at least the threshold, otherwise `False`
         """
-        return self.run_raw(image) >= self.threshold
+        return self.run_raw(image, detector_image, regions) >= self.threshold
+
+    def detect_batch(
+        self,
+        images: Sequence[bytes],
+        detector_images: Optional[Sequence[Optional[np.ndarray]]] = None,
+        regions: Optional[Sequence[Optional[Regions]]] = None,
+    ) -> List[Detection]:
+        """Run the animal filter on several frames in one forward pass of the network. The result is the same as calling `detect()` for each frame in turn. Frames to be analysed as crops around their regions of motion are still run one at a time.
+
+        Args:
+            images (Sequence[bytes]): The image frames to be analysed in JPEG format
+            detector_images (Optional[Sequence[Optional[np.ndarray]]], optional): The same frames as decoded BGR images, see `detect()`. Defaults to None.
+            regions (Optional[Sequence[Optional[Regions]]], optional): Regions of motion in each frame, see `detect()`. Defaults to None.
+
+        Returns:
+            List[Detection]: Confidence in each frame containing an animal as a decimal fraction, and the box of its most confident detection
+        """
+        if detector_images is None:
+            detector_images = [None] * len(images)
+        if regions is None or not self._crop_to_motion:
+            regions = [None] * len(images)
+
+        detections = [None] * len(images)
+        batch = []
+        for i, (image, detector_image, frame_regions) in enumerate(
+            zip(images, detector_images, regions)
+        ):
+            if frame_regions:
+                detections[i] = self.detect(image, detector_image, frame_regions)
+            else:
+                batch.append(i)
+
+        if batch:
+            prepared = [
+                self._prepare(images[i], detector_images[i], slot)
+                for slot, i in enumerate(batch)
+            ]
+            for i, detection in zip(batch, self._infer_cached(prepared)):
+                detections[i] = detection
+        return detections
+
+    def run_raw_batch(
+        self,
+        images: Sequence[bytes],
+        detector_images: Optional[Sequence[Optional[np.ndarray]]] = None,
+        regions: Optional[Sequence[Optional[Regions]]] = None,
+    ) -> List[float]:
+        """Run the animal filter on several frames in one forward pass of the network. The result is the same as calling `run_raw()` for each frame in turn, see `detect_batch()`.
+
+        Args:
+            images (Sequence[bytes]): The image frames to be analysed in JPEG format
+            detector_images (Optional[Sequence[Optional[np.ndarray]]], optional): The same frames as decoded BGR images, see `detect()`. Defaults to None.
+            regions (Optional[Sequence[Optional[Regions]]], optional): Regions of motion in each frame, see `detect()`. Defaults to None.
+
+        Returns:
+            List[float]: Confidence in each frame containing an animal as a decimal fraction
+        """
+        return [
+            confidence
+            for confidence, _ in self.detect_batch(images, detector_images, regions)
+        ]
+
+    def run_batch(
+        self,
+        images: Sequence[bytes],
+        detector_images: Optional[Sequence[Optional[np.ndarray]]] = None,
+        regions: Optional[Sequence[Optional[Regions]]] = None,
+    ) -> List[bool]:
+        """The same as `run_raw_batch()`, but with the threshold applied to each frame's confidence
+
+        Args:
+            images (Sequence[bytes]): The image frames to be analysed in JPEG format
+            detector_images (Optional[Sequence[Optional[np.ndarray]]], optional): The same frames as decoded BGR images, see `run_raw()`. Defaults to None.
+            regions (Optional[Sequence[Optional[Regions]]], optional): Regions of motion in each frame, see `run_raw()`. Defaults to None.
+
+        Returns:
+            List[bool]: For each frame, `True` if the confidence in animal presence is at least the threshold, otherwise `False`
+        """
+        return [
+            confidence >= self.threshold
+            for confidence in self.run_raw_batch(images, detector_images, regions)
+        ]
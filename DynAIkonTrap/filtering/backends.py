@@ -0,0 +1,387 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Inference backends for the `DynAIkonTrap.filtering.animal.AnimalFilter`. Each `Backend` runs the animal detector network on a batch of images and returns the detections of each of the network's YOLO output layers, so the animal filter does not depend on any one inference library. The available backends are:
+
+- `OpenCVBackend`, using OpenCV's DNN module with the Darknet model files. This is the default and needs no additional libraries.
+- `ONNXBackend`, using ONNX Runtime on the CPU, if the `onnxruntime` package is installed
+- `TFLiteBackend`, using the TensorFlow Lite interpreter, if the `tflite_runtime` or `tensorflow` package is installed
+
+Models for the ONNX and TensorFlow Lite backends must be converted from the Darknet model such that their outputs keep the Darknet YOLO layers' layout. Each output then holds one row per candidate detection as `[x, y, w, h, objectness, class confidences...]`.
+
+With `DynAIkonTrap.settings.DetectorBackend.AUTO`, `create_backend()` loads every backend available on the system, times each on a few sample images, and keeps the fastest, see `select_fastest()`. Inference libraries start thread pools the first time a network is loaded or run, and these do not survive the process being forked. A process that forks others, such as the main process, should therefore only settle on a backend with `choose_backend()`, which runs this probe in a short-lived process of its own, and leave the loading to the processes doing the inference.
+
+Quantised models, whose convolutions run in 8-bit integer arithmetic, are considerably faster on the Raspberry Pi's CPU at the cost of some accuracy. These are selected with `DynAIkonTrap.settings.DetectorPrecision.INT8` and loaded from separate model files for the ONNX Runtime and TensorFlow Lite backends. The OpenCV backend only runs the float model. Fully integer TensorFlow Lite models take quantised inputs and give quantised outputs; the `TFLiteBackend` converts these using the scale and zero point stored in the model. The `evaluate/evaluate.py` script's `--compare-precision` option measures the difference in accuracy and speed between the float and quantised models.
+"""
+from multiprocessing import Process, Queue
+from os.path import isfile
+from queue import Empty
+from time import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+
+from DynAIkonTrap.logging import get_logger
+from DynAIkonTrap.settings import (
+    AnimalFilterSettings,
+    DetectorBackend,
+    DetectorPrecision,
+)
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    try:
+        from tensorflow.lite import Interpreter
+    except ImportError:
+        Interpreter = None
+
+logger = get_logger(__name__)
+
+
+class Backend:
+    """Interface to an inference library running the animal detector network"""
+
+    name = ''
+    kind = DetectorBackend.AUTO  # Setting selecting this backend
+    model_file = ''  # File the network was loaded from
+
+    def __init__(
+        self, input_size: Optional[int] = None, max_batch: Optional[int] = None
+    ):
+        """
+        Args:
+            input_size (Optional[int], optional): Input size the network is fixed to, if any. Defaults to None, meaning any multiple of 32 is accepted.
+            max_batch (Optional[int], optional): Number of images the network is fixed to analyse at once, if any. Defaults to None, meaning any number is accepted.
+        """
+        self.input_size = input_size
+        self.max_batch = max_batch
+
+    def _forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        raise NotImplementedError
+
+    def set_threads(self, threads: int):
+        """Limit the number of threads used for inference in this process. Only supported by some backends; others keep the number chosen by their library.
+
+        Args:
+            threads (int): Number of threads
+        """
+
+    def forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        """Run the network on a batch of images, splitting the batch if the network is fixed to a smaller one
+
+        Args:
+            blob (np.ndarray): Images as a float blob in NCHW layout, scaled to the range [0, 1]
+
+        Returns:
+            List[np.ndarray]: Detections of each output layer, with shape `(images, candidates, 5 + classes)`
+        """
+        if self.max_batch is None or len(blob) <= self.max_batch:
+            return self._forward(blob)
+
+        parts = [
+            self._forward(blob[start : start + self.max_batch])
+            for start in range(0, len(blob), self.max_batch)
+        ]
+        return [np.concatenate(layers) for layers in zip(*parts)]
+
+
+class OpenCVBackend(Backend):
+    """Runs the Darknet model with OpenCV's DNN module. OpenCV sets up the network's layers for one input size at a time, taking a good deal longer for the first image after the size changes. A separate network is therefore loaded for each input size used, e.g. for crops and the cascade's first pass, each holding its own copy of the weights."""
+
+    name = 'OpenCV'
+    kind = DetectorBackend.OPENCV
+
+    def __init__(self, weights: str, config: str):
+        """
+        Args:
+            weights (str): Darknet weights file
+            config (str): Darknet configuration file
+        """
+        super().__init__()
+        self.model_file = weights
+        self._config = config
+        self.model = cv2.dnn.readNet(weights, config)
+        self._models: Dict[Tuple[int, ...], cv2.dnn_Net] = {}
+        layer_names = self.model.getLayerNames()
+        # Older versions of OpenCV return each index wrapped in an array
+        self.output_layers = [
+            layer_names[i - 1]
+            for i in np.array(self.model.getUnconnectedOutLayers()).flatten()
+        ]
+
+    def _model_for(self, size: Tuple[int, ...]) -> cv2.dnn_Net:
+        if not self._models:
+            self._models[size] = self.model
+        elif size not in self._models:
+            self._models[size] = cv2.dnn.readNet(self.model_file, self._config)
+        return self._models[size]
+
+    def _forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        model = self._model_for(blob.shape[2:])
+        model.setInput(blob)
+        output = model.forward(self.output_layers)
+        # OpenCV drops the batch dimension for a single image
+        return [layer.reshape(len(blob), -1, layer.shape[-1]) for layer in output]
+
+    def set_threads(self, threads: int):
+        cv2.setNumThreads(threads)
+
+
+class ONNXBackend(Backend):
+    """Runs an ONNX model on the CPU with ONNX Runtime"""
+
+    name = 'ONNX Runtime'
+    kind = DetectorBackend.ONNX
+
+    def __init__(self, model: str):
+        """
+        Args:
+            model (str): ONNX model file
+
+        Raises:
+            ImportError: If ONNX Runtime is not installed
+        """
+        if onnxruntime is None:
+            raise ImportError('onnxruntime is not installed')
+
+        self.model_file = model
+        self._session = onnxruntime.InferenceSession(
+            model, providers=['CPUExecutionProvider']
+        )
+        self._input = self._session.get_inputs()[0]
+        batch, _, height, _ = self._input.shape
+        # Dynamic dimensions are given by name rather than size
+        super().__init__(
+            input_size=height if isinstance(height, int) else None,
+            max_batch=batch if isinstance(batch, int) else None,
+        )
+
+    def _forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        output = self._session.run(
+            None, {self._input.name: blob.astype(np.float32, copy=False)}
+        )
+        return [layer.reshape(len(blob), -1, layer.shape[-1]) for layer in output]
+
+
+class TFLiteBackend(Backend):
+    """Runs a TensorFlow Lite model with the TensorFlow Lite interpreter"""
+
+    name = 'TensorFlow Lite'
+    kind = DetectorBackend.TFLITE
+
+    def __init__(self, model: str):
+        """
+        Args:
+            model (str): TensorFlow Lite model file
+
+        Raises:
+            ImportError: If neither `tflite_runtime` nor `tensorflow` is installed
+        """
+        if Interpreter is None:
+            raise ImportError('tflite_runtime is not installed')
+
+        self.model_file = model
+        self._interpreter = Interpreter(model_path=model)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._outputs = self._interpreter.get_output_details()
+        batch, height, _, _ = self._input['shape']
+        super().__init__(input_size=int(height), max_batch=int(batch))
+
+    @staticmethod
+    def _quantised(details: dict) -> bool:
+        scale, _ = details['quantization']
+        return np.issubdtype(details['dtype'], np.integer) and scale != 0
+
+    def _forward(self, blob: np.ndarray) -> List[np.ndarray]:
+        # TensorFlow Lite models take images in NHWC layout
+        images = blob.transpose(0, 2, 3, 1)
+        if self._quantised(self._input):
+            scale, zero_point = self._input['quantization']
+            limits = np.iinfo(self._input['dtype'])
+            images = np.clip(
+                np.rint(images / scale + zero_point), limits.min, limits.max
+            )
+        self._interpreter.set_tensor(
+            self._input['index'],
+            np.ascontiguousarray(images, dtype=self._input['dtype']),
+        )
+        self._interpreter.invoke()
+
+        output = []
+        for details in self._outputs:
+            layer = self._interpreter.get_tensor(details['index'])
+            if self._quantised(details):
+                scale, zero_point = details['quantization']
+                layer = (layer.astype(np.float32) - zero_point) * scale
+            output.append(layer.reshape(len(blob), -1, details['shape'][-1]))
+        return output
+
+
+def model_file(backend: DetectorBackend, settings: AnimalFilterSettings) -> str:
+    """The file the given backend loads the network from, for the precision chosen in the settings
+
+    Args:
+        backend (DetectorBackend): The backend
+        settings (AnimalFilterSettings): Settings for the animal filter
+
+    Returns:
+        str: Path to the model file
+    """
+    int8 = settings.precision == DetectorPrecision.INT8
+    if backend == DetectorBackend.ONNX:
+        return settings.onnx_int8_model if int8 else settings.onnx_model
+    if backend == DetectorBackend.TFLITE:
+        return settings.tflite_int8_model if int8 else settings.tflite_model
+    return settings.darknet_weights
+
+
+def _check_available(backend: DetectorBackend, settings: AnimalFilterSettings):
+    # Without loading anything, as loading starts the library's thread pools
+    if backend == DetectorBackend.ONNX and onnxruntime is None:
+        raise ImportError('onnxruntime is not installed')
+    if backend == DetectorBackend.TFLITE and Interpreter is None:
+        raise ImportError('tflite_runtime is not installed')
+    if backend != DetectorBackend.OPENCV and not isfile(model_file(backend, settings)):
+        raise FileNotFoundError(model_file(backend, settings))
+
+
+def _load(backend: DetectorBackend, settings: AnimalFilterSettings) -> Backend:
+    _check_available(backend, settings)
+    if backend == DetectorBackend.ONNX:
+        return ONNXBackend(model_file(backend, settings))
+    if backend == DetectorBackend.TFLITE:
+        return TFLiteBackend(model_file(backend, settings))
+
+    if settings.precision == DetectorPrecision.INT8:
+        logger.warning('The OpenCV detector backend only runs the float model')
+    return OpenCVBackend(settings.darknet_weights, settings.darknet_config)
+
+
+def select_fastest(backends: Sequence[Backend], runs: int) -> Backend:
+    """Time each backend on a few sample images and return the fastest
+
+    Args:
+        backends (Sequence[Backend]): Backends to choose from
+        runs (int): Number of images each backend is timed on, after a first run to warm up
+
+    Returns:
+        Backend: The backend taking the least time per image
+    """
+    rng = np.random.default_rng(0)
+    timings = []
+    for backend in backends:
+        input_size = backend.input_size or 416
+        blob = rng.random((1, 3, input_size, input_size), dtype=np.float32)
+        backend.forward(blob)
+
+        t_start = time()
+        for _ in range(runs):
+            backend.forward(blob)
+        timings.append((time() - t_start) / max(runs, 1))
+        logger.info(
+            '{} backend takes {:.0f}ms per image'.format(
+                backend.name, timings[-1] * 1000
+            )
+        )
+
+    return backends[int(np.argmin(timings))]
+
+
+def create_backend(settings: AnimalFilterSettings) -> Backend:
+    """Load the backend chosen in the settings. With `DynAIkonTrap.settings.DetectorBackend.AUTO` the fastest of the available backends is chosen; for quantised models only backends able to run them are considered. If no suitable backend can be loaded, the OpenCV backend is used instead.
+
+    Args:
+        settings (AnimalFilterSettings): Settings for the animal filter
+
+    Returns:
+        Backend: The loaded backend
+    """
+    if settings.backend != DetectorBackend.AUTO:
+        try:
+            return _load(settings.backend, settings)
+        except (ImportError, FileNotFoundError) as e:
+            logger.error(
+                'Could not load {} detector backend ({}); using OpenCV'.format(
+                    settings.backend.name, e
+                )
+            )
+            return _load(DetectorBackend.OPENCV, settings)
+
+    candidates = [DetectorBackend.ONNX, DetectorBackend.TFLITE]
+    if settings.precision == DetectorPrecision.FLOAT32:
+        candidates.insert(0, DetectorBackend.OPENCV)
+
+    backends = []
+    for backend in candidates:
+        try:
+            backends.append(_load(backend, settings))
+        except (ImportError, FileNotFoundError) as e:
+            logger.debug('{} detector backend unavailable ({})'.format(backend.name, e))
+
+    if not backends:
+        logger.error('No detector backend for quantised models; using OpenCV')
+        return _load(DetectorBackend.OPENCV, settings)
+
+    fastest = select_fastest(backends, settings.probe_runs)
+    logger.info('Using the {} detector backend'.format(fastest.name))
+    return fastest
+
+
+def _probe(settings: AnimalFilterSettings, results: Queue):
+    results.put(create_backend(settings).kind)
+
+
+def choose_backend(settings: AnimalFilterSettings) -> DetectorBackend:
+    """Settle on the backend `create_backend()` would load, without loading any network in this process. With `DynAIkonTrap.settings.DetectorBackend.AUTO` the backends are timed in a separate process, which exits once it has chosen. A chosen backend that cannot be loaded is replaced with the OpenCV backend, as in `create_backend()`.
+
+    Args:
+        settings (AnimalFilterSettings): Settings for the animal filter
+
+    Returns:
+        DetectorBackend: The backend to load in the processes running the detector
+    """
+    if settings.backend != DetectorBackend.AUTO:
+        try:
+            _check_available(settings.backend, settings)
+        except (ImportError, FileNotFoundError) as e:
+            logger.error(
+                'Could not load {} detector backend ({}); using OpenCV'.format(
+                    settings.backend.name, e
+                )
+            )
+            return DetectorBackend.OPENCV
+        return settings.backend
+
+    results = Queue()
+    probe = Process(target=_probe, args=(settings, results), daemon=True)
+    probe.start()
+    probe.join()
+    try:
+        return results.get(timeout=1)
+    except Empty:
+        logger.error(
+            'Detector backend probe exited (exit code {}); using OpenCV'.format(
+                probe.exitcode
+            )
+        )
+        return DetectorBackend.OPENCV
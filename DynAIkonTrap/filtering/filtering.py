@@ -16,11 +16,11 @@
 """
 A simple interface to the frame animal filtering pipeline is provided by this module. It encapsulates both motion- and image-based filtering as well as any smoothing of this in time. Viewed from the outside the `Filter` reads from a `DynAIkonTrap.camera.Camera`'s output and in turn outputs only frames containing animals.
 
-Internally frames are first analysed by the `DynAIkonTrap.filtering.motion.MotionFilter` and then, if sufficient motion is detected, placed on the `DynAIkonTrap.filtering.motion_queue.MotionQueue`. Within the queue the `DynAIkonTrap.filtering.animal.AnimalFilter` stage is applied with only the animal frames being returned as the output of this pipeline.
+Internally frames are first analysed by the `DynAIkonTrap.filtering.motion.MotionFilter` and then, if sufficient motion is detected, placed on the `DynAIkonTrap.filtering.motion_queue.MotionQueue`. The last few frames before motion is detected are also added to the start of each motion sequence. Within the queue the `DynAIkonTrap.filtering.animal.AnimalFilter` stage is applied with only the animal frames being returned as the output of this pipeline.
 
 The output is accessible via a queue, which mitigates problems due to the burstiness of this stage's output and also allows the pipeline to be run in a separate process.
 """
-from multiprocessing import Process, Queue
+from multiprocessing import Event, Process, Queue
 from multiprocessing.queues import Queue as QueueType
 from queue import Empty
 
@@ -52,6 +52,8 @@ class Filter:
             settings=settings.motion, framerate=self.framerate
         )
         self._motion_threshold = settings.motion.sotv_threshold
+        self._motion_regions = settings.motion.motion_regions
+        self._suppressed_run = 0
 
         self._animal_filter = AnimalFilter(settings=settings.animal)
         self._motion_queue = MotionQueue(
@@ -60,10 +62,22 @@ class Filter:
             framerate=self.framerate,
         )
 
+        # Set while a frame read from the camera is yet to reach the motion queue
+        self._frame_in_flight = Event()
+
         self._usher = Process(target=self._handle_input, daemon=True)
         self._usher.start()
         logger.debug('Filter started')
 
+    @property
+    def process(self) -> Process:
+        """The process passing frames through the motion filter"""
+        return self._usher
+
+    @property
+    def motion_queue(self) -> MotionQueue:
+        return self._motion_queue
+
     def get(self) -> Frame:
         """Retrieve the next animal `Frame` from the filter pipeline's output
 
@@ -72,27 +86,70 @@ class Filter:
         """
         return self._motion_queue.get()
 
+    def backlog_s(self) -> float:
+        """Estimated time in seconds for the animal filter to work through the frames already waiting for it. See `DynAIkonTrap.filtering.motion_queue.MotionQueue.backlog_s()`."""
+        return self._motion_queue.backlog_s()
+
+    def is_idle(self) -> bool:
+        """Indicates if every frame read from the camera so far has been filtered and read from this pipeline's output
+
+        Returns:
+            bool: `True` if no frames are waiting anywhere in the pipeline, otherwise `False`
+        """
+        return (
+            self._input_queue.empty()
+            and not self._frame_in_flight.is_set()
+            and self._motion_queue.is_idle()
+            and self._motion_queue.empty()
+        )
+
+    def restart(self):
+        """Replace the process passing frames through the motion filter, e.g. after it has crashed. Any motion sequence it was building is lost."""
+        self.close()
+        self._frame_in_flight.clear()
+        self._motion_queue.discard_motion_sequence()
+        self._usher = Process(target=self._handle_input, daemon=True)
+        self._usher.start()
+
     def close(self):
-        self._usher.terminate()
+        self._usher.kill()
         self._usher.join()
 
+    def _log_suppressed(self):
+        if self._motion_filter.suppressed:
+            self._suppressed_run += 1
+        elif self._suppressed_run > 0:
+            logger.info(
+                'Ignored {} frames of background motion, saving up to as many animal filter runs ({} in total)'.format(
+                    self._suppressed_run, self._motion_filter.frames_suppressed
+                )
+            )
+            self._suppressed_run = 0
+
     def _handle_input(self):
         while True:
 
             try:
                 frame = self._input_queue.get()
+                self._frame_in_flight.set()
             except Empty:
                 # An unexpected event; finish processing motion so far
                 self._motion_queue.end_motion_sequence()
+                self._motion_queue.clear_pre_roll()
                 self._motion_filter.reset()
                 continue
 
 
             motion_score = self._motion_filter.run_raw(frame.motion)
             motion_detected = motion_score >= self._motion_threshold
+            self._log_suppressed()
+            if self._motion_regions:
+                frame.motion_regions = self._motion_filter.regions()
 
             if motion_detected:
                 self._motion_queue.put(frame, motion_score)
 
             else:
                 self._motion_queue.end_motion_sequence()
+                self._motion_queue.hold(frame, motion_score)
+            self._frame_in_flight.clear()
@@ -15,74 +15,92 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 The IIR filter architecture provided in this module can be used to filter/smooth "continuous" data signals in time. In particular, it is used in the motion filtering stage of the filtering pipeline.
+
+The `SOSFilter` runs a cascade of second order sections over several channels (e.g. the x and y components of motion) at once. It is implemented in transposed direct form II, exactly as `scipy.signal.sosfilt`, and keeps its memory in the same layout as `sosfilt`'s `zi`. Samples can therefore be filtered one at a time with `SOSFilter.filter()`, or a whole block at once with `SOSFilter.filter_block()`, with identical results. The state can be saved and restored, e.g. to resume filtering a recording part way through.
+
+Example usage:
+```python
+iir = SOSFilter(scipy.signal.cheby2(3, 35, 0.1, output='sos'), channels=2)
+x, y = iir.filter([x_sample, y_sample])
+state = iir.state  # Save...
+iir.state = state  # ...and restore
+```
 """
+from typing import Union
+import numpy as np
+from scipy import signal
 
 
-class IIR2Filter:
-    """Second order IIR filter stage"""
+class SOSFilter:
+    """IIR filter of cascaded second order sections, filtering several channels together"""
 
-    def __init__(self, coeffs: 'numpy.ndarray'):
+    def __init__(self, sos: np.ndarray, channels: int = 1):
         """
         Args:
-            coeffs (numpy.ndarray): SOS coefficients as returned by the utility functions from scipy
+            sos (np.ndarray): SOS coefficients as returned by the utility functions from scipy, with shape `(sections, 6)`
+            channels (int, optional): Number of signals filtered side by side. Defaults to 1.
         """
-        self.b0 = coeffs[0]
-        self.b1 = coeffs[1]
-        self.b2 = coeffs[2]
-        self.a0 = coeffs[3]
-        self.a1 = coeffs[4]
-        self.a2 = coeffs[5]
-        self.tap1 = 0
-        self.tap2 = 0
-
-    def filter(self, x: float) -> float:
+        self.sos = np.asarray(sos, dtype=float)
+        self.channels = channels
+        self._coeffs = [
+            (b0, b1, b2, a1, a2) for b0, b1, b2, _, a1, a2 in self.sos.tolist()
+        ]
+        self._zi = np.zeros((len(self.sos), channels, 2))
+
+    def filter(self, x: Union[float, np.ndarray]) -> np.ndarray:
         """Perform time-based filtering based on the provided data sample
 
         Args:
-            x (float): A data sample
+            x (Union[float, np.ndarray]): One data sample for each channel
 
         Returns:
-            float: The filtered sample
-        """
-
-        output = self.b1 * self.tap1
-        x = x - (self.a1 * self.tap1)
-        output = output + (self.b2 * self.tap2)
-        x = x - (self.a2 * self.tap2)
-        output = output + x * self.b0
-        self.tap2 = self.tap1
-        self.tap1 = x
-        return output
-
-    def reset(self):
-        self.tap1, self.tap2 = 0, 0
-
-
-class IIRFilter(object):
-    """IIR filter constructed from IIR2Filters"""
-
-    def __init__(self, SOS: 'numpy.ndarray'):
+            np.ndarray: The filtered sample for each channel
         """
-        Creates a chain of 2nd order filter instances of IIR2Filter
+        # For a single sample per channel, plain float arithmetic is several
+        # times faster than NumPy operations on such small arrays
+        samples = np.asarray(x, dtype=float).reshape(self.channels).tolist()
+        zi = self._zi.tolist()
+        output = []
+        for channel, x_c in enumerate(samples):
+            for (b0, b1, b2, a1, a2), section in zip(self._coeffs, zi):
+                z = section[channel]
+                y = b0 * x_c + z[0]
+                z[0] = b1 * x_c - a1 * y + z[1]
+                z[1] = b2 * x_c - a2 * y
+                x_c = y
+            output.append(x_c)
+        self._zi[...] = zi
+        return np.array(output)
+
+    def filter_block(self, x: np.ndarray) -> np.ndarray:
+        """Filter consecutive samples in one go. The result is the same as calling `filter()` for each sample in turn, and the filter's state is updated in the same way.
 
         Args:
-            SOS (numpy.ndarray): SOS coefficients as returned by the utility functions from scipy
-        """
-
-        self.iir2filters = [IIR2Filter(coeffs) for coeffs in SOS]
-
-    def filter(self, x: float) -> float:
-        """Perform time-based filtering based on the provided data sample
-
-        Args:
-            x (float): A data sample
+            x (np.ndarray): Data samples with shape `(channels, samples)`
 
         Returns:
-            float: The filtered sample
+            np.ndarray: The filtered samples, with the same shape
         """
-        for filter in self.iir2filters:
-            x = filter.filter(x)
-        return x
+        x = np.asarray(x, dtype=float).reshape(self.channels, -1)
+        output, self._zi = signal.sosfilt(self.sos, x, zi=self._zi)
+        return output
+
+    @property
+    def state(self) -> np.ndarray:
+        """A copy of the filter's memory, in the format of `scipy.signal.sosfilt`'s `zi`, with shape `(sections, channels, 2)`"""
+        return self._zi.copy()
+
+    @state.setter
+    def state(self, state: np.ndarray):
+        state = np.asarray(state, dtype=float)
+        if state.shape != self._zi.shape:
+            raise ValueError(
+                'Expected filter state of shape {}, got {}'.format(
+                    self._zi.shape, state.shape
+                )
+            )
+        self._zi = state.copy()
 
     def reset(self):
-        [f.reset() for f in self.iir2filters]
+        """Reset the filter's memory to zero"""
+        self._zi[...] = 0
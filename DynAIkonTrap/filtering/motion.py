@@ -19,17 +19,130 @@ This module provides a general interface to a motion filtering stage. The motion
 The implementation can be replaced with another one easily as the interface simply takes the motion vectors from a frame, performs a calculation, and returns a value corresponding to the motion. If using the `MotionFilter.run()` method (over `MotionFilter.run_raw()`), the threshold is defined internally and a simple Boolean is provided as an output.
 
 This implementation makes use of the Sum of Thresholded Vectors (SoTV) approach. Under this approach initially a small threshold is applied to all motion vectors. This removes the smallest vectors that are more likely to be due to noise or unimportant movements. Secondly, the vectors are summed together giving a single average motion vector for the frame. This step implicitely checks for coherence in movement vectors, as well as the magnitude and size of the area of motion. Finally, the vector is smoothed in time using a Chebyshev type-2 filter to reduce frame-to-frame oscillations in movement and give an insight to the trend in motion. The magnitude of the single smoothed vector representing motion in the frame can then be thresholded to determine if sufficient movement is declared, or not.
+
+Parts of the scene known to move without animals being present, like vegetation or a road, can be given less weight or excluded entirely by a region of interest (ROI) mask. The mask is given as a greyscale image (`DynAIkonTrap.settings.MotionFilterSettings.roi_mask_file`), where black regions are ignored and white ones count fully, and/or as a list of rectangles to exclude (`DynAIkonTrap.settings.MotionFilterSettings.roi_exclusions`). It is computed once at the resolution of the motion vector grid, see `roi_weights()`, and each vector is weighted by it before summing.
+
+Some parts of a scene move frame after frame without any animal being present, e.g. branches in the wind, rippling water, or flickering shadows. Optionally, a `BackgroundMotionModel` learns which macroblocks behave like this and gives them less weight, in addition to the ROI mask. Frames that would otherwise have been declared as motion, and so analysed by the animal filter, are counted in `MotionFilter.frames_suppressed`.
+
+Besides the single SoTV value, `MotionFilter.regions()` gives bounding boxes of the connected groups of macroblocks that counted towards it. With `DynAIkonTrap.settings.MotionFilterSettings.motion_regions` enabled these are attached to each frame as `DynAIkonTrap.camera.Frame.motion_regions`, so later stages can crop to, or prioritise, the areas of motion.
 """
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 import math
-from scipy import signal
+from scipy import ndimage, signal
+import cv2  # pdoc3 can't handle importing individual OpenCV functions
 
-from DynAIkonTrap.filtering.iir import IIRFilter
+from DynAIkonTrap.filtering.iir import SOSFilter
 from DynAIkonTrap.settings import MotionFilterSettings
 from DynAIkonTrap.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Weights are quantised to integers, so a weighted vector still fits in int16
+ROI_WEIGHT_SCALE = 64
+
+# Bounding box as (x0, y0, x1, y1), given as fractions of the frame's width and height
+Region = Tuple[float, float, float, float]
+
+# Diagonally adjacent macroblocks belong to the same region
+_CONNECTIVITY = np.ones((3, 3), dtype=bool)
+
+
+def roi_weights(
+    grid_shape: Tuple[int, int],
+    mask_file: str = '',
+    exclusions: Sequence[Sequence[float]] = (),
+) -> Optional[np.ndarray]:
+    """Compute the weight of each macroblock in the motion vector grid from a mask image and/or excluded regions. Weights are quantised to integers from zero to `ROI_WEIGHT_SCALE`. The mask and regions cover the frame itself, leaving out the extra column the camera adds beyond its right edge; that column is given no weight.
+
+    Args:
+        grid_shape (Tuple[int, int]): Rows and columns of the motion vector grid, including the camera's extra column
+        mask_file (str, optional): Greyscale image, stretched over the whole grid. Black regions are ignored and white ones count fully. Defaults to '', meaning no mask image.
+        exclusions (Sequence[Sequence[float]], optional): Regions to ignore, each as `[x0, y0, x1, y1]` given as fractions of the frame's width and height. Defaults to ().
+
+    Returns:
+        Optional[np.ndarray]: Weights for each macroblock, or `None` if nothing is masked
+    """
+    rows, cols = grid_shape
+    cols -= 1  # Leave out the camera's extra column
+    weights = np.full((rows, cols), 1.0)
+
+    if mask_file:
+        mask = cv2.imread(mask_file, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            logger.error('Could not read ROI mask `{}`; ignoring it'.format(mask_file))
+        else:
+            weights = cv2.resize(mask, (cols, rows), interpolation=cv2.INTER_AREA) / 255
+
+    for x0, y0, x1, y1 in exclusions:
+        weights[
+            int(math.floor(y0 * rows)) : int(math.ceil(y1 * rows)),
+            int(math.floor(x0 * cols)) : int(math.ceil(x1 * cols)),
+        ] = 0
+
+    weights = np.rint(weights * ROI_WEIGHT_SCALE).astype(np.int16)
+    if np.all(weights == ROI_WEIGHT_SCALE):
+        return None
+    return np.pad(weights, ((0, 0), (0, 1)))
+
+
+class BackgroundMotionModel:
+    """Running statistics of the motion in each macroblock, used to down-weight blocks whose motion is stationary noise.
+
+    For each block an exponential moving average is kept of how often it moves (its activity), of its thresholded motion vector, and of the magnitude of that vector. Motion that keeps recurring in a block without a consistent direction, like a swaying branch, has high activity but a mean vector much smaller than its mean magnitude. Such a block's weight tends to zero:
+
+    `weight = 1 - activity * (1 - |mean vector| / mean magnitude)`
+
+    A block moved through by an animal has low activity, or moves coherently, so retains most of its weight.
+    """
+
+    def __init__(self, time_constant_frames: float):
+        """
+        Args:
+            time_constant_frames (float): Number of frames over which the statistics are averaged
+        """
+        self._alpha = 1 / max(time_constant_frames, 1)
+        self.reset()
+
+    def reset(self):
+        """Forget the statistics learnt so far"""
+        self._activity = None
+        self._mean = None
+        self._magnitude = None
+
+    def weights(self) -> Optional[np.ndarray]:
+        """Weight of each macroblock according to the statistics so far, quantised to integers from zero to `ROI_WEIGHT_SCALE`
+
+        Returns:
+            Optional[np.ndarray]: Weights for each macroblock, or `None` before any motion has been seen
+        """
+        if self._activity is None:
+            return None
+        coherence = np.hypot(self._mean[0], self._mean[1]) / np.maximum(
+            self._magnitude, 1e-6
+        )
+        noise = self._activity * (1 - np.minimum(coherence, 1))
+        return np.rint((1 - noise) * ROI_WEIGHT_SCALE).astype(np.int16)
+
+    def update(self, vectors: np.ndarray, mask: np.ndarray, magnitudes_sq: np.ndarray):
+        """Add a frame's motion to the statistics
+
+        Args:
+            vectors (np.ndarray): The x and y components of the motion vectors, with shape `(2, rows, cols)`
+            mask (np.ndarray): Which of the vectors exceed the small threshold
+            magnitudes_sq (np.ndarray): Squared magnitudes of the vectors
+        """
+        if self._activity is None or self._activity.shape != mask.shape:
+            self._activity = np.zeros(mask.shape, dtype=np.float32)
+            self._mean = np.zeros(vectors.shape, dtype=np.float32)
+            self._magnitude = np.zeros(mask.shape, dtype=np.float32)
+
+        self._activity += self._alpha * (mask - self._activity)
+        self._mean += self._alpha * (vectors * mask - self._mean)
+        self._magnitude += self._alpha * (
+            np.sqrt(magnitudes_sq, dtype=np.float32) * mask - self._magnitude
+        )
+
 
 class MotionFilter:
     """Motion filtering stage employing the Sum of Thresholded Vectors (SoTV) approach. The output of this stage is filtered in time using an IIR filter, to provide a smoothed result."""
@@ -48,6 +161,34 @@ class MotionFilter:
         """
         self.threshold_small: int = settings.small_threshold
         self.threshold_sotv: int = settings.sotv_threshold
+        # Vectors are compared by their squared magnitude, avoiding square roots
+        self._threshold_small_sq = (
+            self.threshold_small ** 2 if self.threshold_small >= 0 else -1
+        )
+
+        self._roi_mask_file = settings.roi_mask_file
+        self._roi_exclusions = settings.roi_exclusions
+        self._roi_weights = None
+        self._roi_grid_shape = None
+
+        if settings.background_model:
+            self.background = BackgroundMotionModel(
+                settings.background_time_constant_s * framerate
+            )
+        else:
+            self.background = None
+        self.frames_suppressed = 0
+        self.suppressed = False
+        self._region_min_blocks = settings.region_min_blocks
+        self._last_weights = None
+
+        # Scratch buffers, allocated for the shape of the motion being processed
+        self._region_mask = None
+        self._weights = None
+        self._vectors = None
+        self._scratch = None
+        self._magnitudes_sq = None
+        self._mask = None
 
         def wn(fc):
             fnq = framerate / 2
@@ -69,45 +210,175 @@ class MotionFilter:
             output='sos',
             btype='lowpass',
         )
-        self.x_iir_filter = IIRFilter(sos)
-        self.y_iir_filter = IIRFilter(sos)
+        # The x and y components are smoothed together
+        self.iir_filter = SOSFilter(sos, channels=2)
+        # Smooths the SoTV without the background model's weighting, to tell
+        # which frames the model kept from being declared as motion
+        self._unsuppressed_filter = SOSFilter(sos, channels=2)
 
     def run_raw(self, motion_frame: np.ndarray) -> float:
         """Run the motion filter using SoTV:
-            1. Apply a small threshold to the motion vectors
-            2. For those that exceed this, sum the vectors
+            1. Apply a small threshold to the motion vectors (compared as squared magnitudes in integer arithmetic)
+            2. For those that exceed this, sum the vectors, weighted by any ROI mask and the background model
             3. Apply time filtering to smooth this output
 
+        If the background model is enabled, `suppressed` indicates whether the frame would have exceeded the SoTV threshold without it.
+
         Args:
             motion_frame (np.ndarray): Motion vectors for a frame
 
         Returns:
             float: SoTV for the given frame
         """
-        magnitudes = np.sqrt(
-            np.square(motion_frame['x'].astype(np.float))
-            + np.square(motion_frame['y'].astype(np.float))
+        if self.background is None:
+            x_sum, y_sum = self.iir_filter.filter(
+                self._thresholded_sums(motion_frame)
+            ).tolist()
+            return math.sqrt(x_sum ** 2 + y_sum ** 2)
+
+        self._threshold(motion_frame)
+        x_sum, y_sum = self._unsuppressed_filter.filter(
+            self._weighted_sums(self._roi_weights)
+        ).tolist()
+        unsuppressed_score = math.sqrt(x_sum ** 2 + y_sum ** 2)
+
+        x_sum, y_sum = self.iir_filter.filter(
+            self._weighted_sums(self._combined_background_weights())
+        ).tolist()
+        score = math.sqrt(x_sum ** 2 + y_sum ** 2)
+        self.background.update(self._vectors, self._mask, self._magnitudes_sq)
+
+        self.suppressed = unsuppressed_score >= self.threshold_sotv > score
+        if self.suppressed:
+            self.frames_suppressed += 1
+        return score
+
+    def run_raw_batch(
+        self, motion_frames: np.ndarray, chunk_size: int = 64
+    ) -> np.ndarray:
+        """Run the motion filter on many consecutive frames in one go, e.g. to score a recording. The result is identical to calling `run_raw()` for each frame in turn, and the filter is left in the same state, so either function may be used next.
+
+        The background model learns from each frame in turn, so if it is enabled the frames are simply passed to `run_raw()` one at a time.
+
+        Args:
+            motion_frames (np.ndarray): Motion vectors for consecutive frames, with shape `(frames, rows, cols)`
+            chunk_size (int, optional): Number of frames processed at a time, which bounds the memory used. Defaults to 64.
+
+        Returns:
+            np.ndarray: SoTV for each of the given frames
+        """
+        if self.background is not None:
+            return np.array([self.run_raw(frame) for frame in motion_frames])
+
+        scores = np.empty(len(motion_frames))
+        for start in range(0, len(motion_frames), chunk_size):
+            stop = min(start + chunk_size, len(motion_frames))
+            x_sums, y_sums = self.iir_filter.filter_block(
+                self._thresholded_sums(motion_frames[start:stop])
+            )
+
+            np.sqrt(np.square(x_sums) + np.square(y_sums), out=scores[start:stop])
+        return scores
+
+    def _thresholded_sums(self, motion: np.ndarray) -> np.ndarray:
+        """Sum the x and y components of all motion vectors above the small threshold, over the last two axes of `motion`. The result has shape `(2, ...)` for the x and y sums."""
+        self._threshold(motion)
+        return self._weighted_sums(self._roi_weights)
+
+    def _threshold(self, motion: np.ndarray):
+        """Fill the scratch buffers with the motion vectors, their squared magnitudes, and the mask of those above the small threshold"""
+        shape = motion.shape
+        if self._roi_grid_shape != shape[-2:]:
+            self._roi_grid_shape = shape[-2:]
+            self._roi_weights = roi_weights(
+                self._roi_grid_shape, self._roi_mask_file, self._roi_exclusions
+            )
+
+        if self._mask is None or self._mask.shape != shape:
+            # Squares of int8 components fit in int16, but their sum needs int32
+            self._vectors = np.empty((2,) + shape, dtype=np.int16)
+            self._scratch = np.empty((2,) + shape, dtype=np.int16)
+            self._magnitudes_sq = np.empty(shape, dtype=np.int32)
+            self._mask = np.empty(shape, dtype=bool)
+            self._weights = np.empty(shape, dtype=np.int16)
+            self._region_mask = np.empty(shape, dtype=bool)
+
+        # Gather the strided x and y fields into one contiguous block, so every
+        # following operation runs over contiguous memory without allocating
+        np.copyto(self._vectors[0], motion['x'])
+        np.copyto(self._vectors[1], motion['y'])
+
+        np.multiply(self._vectors, self._vectors, out=self._scratch)
+        np.add(
+            self._scratch[0], self._scratch[1], out=self._magnitudes_sq, dtype=np.int32
         )
-        filtered = np.where(
-            magnitudes > self.threshold_small,
-            motion_frame,
-            np.array(
-                (0, 0, 0),
-                dtype=[
-                    ('x', 'i1'),
-                    ('y', 'i1'),
-                    ('sad', 'u2'),
-                ],
-            ),
+        np.greater(self._magnitudes_sq, self._threshold_small_sq, out=self._mask)
+
+    def _combined_background_weights(self) -> Optional[np.ndarray]:
+        """The background model's weights combined with any ROI weights, still scaled by `ROI_WEIGHT_SCALE`"""
+        weights = self.background.weights()
+        if weights is None or weights.shape != self._mask.shape:
+            return self._roi_weights
+        if self._roi_weights is None:
+            return weights
+
+        # At most ROI_WEIGHT_SCALE squared, which fits in int16
+        np.multiply(weights, self._roi_weights, out=weights)
+        np.floor_divide(weights, ROI_WEIGHT_SCALE, out=weights)
+        return weights
+
+    def _weighted_sums(self, weights: Optional[np.ndarray]) -> np.ndarray:
+        """Sum the thresholded motion vectors in the scratch buffers, each multiplied by its weight, or unweighted if `weights` is `None`"""
+        shape = self._mask.shape
+        self._last_weights = weights
+        if weights is None:
+            np.multiply(self._vectors, self._mask, out=self._scratch)
+            return self._scratch.reshape((2,) + shape[:-2] + (-1,)).sum(
+                axis=-1, dtype=np.int64
+            )
+
+        np.multiply(self._mask, weights, out=self._weights)
+        np.multiply(self._vectors, self._weights, out=self._scratch)
+        sums = self._scratch.reshape((2,) + shape[:-2] + (-1,)).sum(
+            axis=-1, dtype=np.int64
         )
+        return sums / ROI_WEIGHT_SCALE
+
+    def regions(self) -> List[Region]:
+        """Bounding boxes of the connected groups of macroblocks contributing to the SoTV of the frame last passed to `run_raw()`. A macroblock contributes if its vector exceeds the small threshold and it has at least half its weight after any ROI mask and background model. Groups of fewer than `DynAIkonTrap.settings.MotionFilterSettings.region_min_blocks` macroblocks are ignored.
+
+        Returns:
+            List[Region]: Bounding boxes as `(x0, y0, x1, y1)` fractions of the frame, largest region first
+        """
+        if self._mask is None or self._mask.ndim != 2:
+            return []
 
-        x_sum = sum(sum(filtered['x'].astype(int)))
-        y_sum = sum(sum(filtered['y'].astype(int)))
+        if self._last_weights is None:
+            region_mask = self._mask
+        else:
+            np.greater_equal(
+                self._weights, ROI_WEIGHT_SCALE // 2, out=self._region_mask
+            )
+            region_mask = self._region_mask
 
-        x_sum = self.x_iir_filter.filter(x_sum)
-        y_sum = self.y_iir_filter.filter(y_sum)
+        # The camera adds a column of motion vectors beyond the right edge of
+        # the frame; it is left out so the regions are fractions of the frame
+        labels, count = ndimage.label(region_mask[:, :-1], structure=_CONNECTIVITY)
+        if count == 0:
+            return []
 
-        return math.sqrt(x_sum ** 2 + y_sum ** 2)
+        sizes = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+        slices = ndimage.find_objects(labels)
+        rows, cols = labels.shape
+        regions = []
+        for i in np.argsort(-sizes, kind='stable'):
+            if sizes[i] < self._region_min_blocks:
+                break
+            y, x = slices[i]
+            regions.append(
+                (x.start / cols, y.start / rows, x.stop / cols, y.stop / rows)
+            )
+        return regions
 
     def run(self, motion_frame: np.ndarray) -> bool:
         """Apply a threshold to the output of `run_raw()`
@@ -120,8 +391,17 @@ class MotionFilter:
         """
         return self.run_raw(motion_frame) >= self.threshold_sotv
 
+    @property
+    def state(self) -> np.ndarray:
+        """The memory of the internal IIR filter. This can be saved and later restored to resume filtering a stream of frames part way through. See `DynAIkonTrap.filtering.iir.SOSFilter.state`."""
+        return self.iir_filter.state
+
+    @state.setter
+    def state(self, state: np.ndarray):
+        self.iir_filter.state = state
+
     def reset(self):
-        """Reset the internal IIR filter's memory to zero
+        """Reset the internal IIR filter's memory to zero. Statistics learnt by the background model are kept, as they describe the scene rather than the current stream of frames.
         """
-        self.x_iir_filter.reset()
-        self.y_iir_filter.reset()
+        self.iir_filter.reset()
+        self._unsuppressed_filter.reset()
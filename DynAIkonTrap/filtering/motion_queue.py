@@ -43,26 +43,57 @@ while True:
     else:
         # Safe to call repeatedly; will only end non-empty motion sequence
         mq.end_motion_sequence()
+        # Keep the frame in case motion is declared soon
+        mq.hold(frame, motion_score)
 ```
 
+Smoothing in the motion filter means motion is only declared some frames after it starts. Frames without sufficient motion can therefore be held in a `PreRollBuffer`, and the most recent of these are placed at the start of the next motion sequence. The pre-roll is kept compact, as the JPEG image and compressed motion vectors, and within a memory budget.
+
+With `DynAIkonTrap.settings.MotionQueueSettings.inference_batch_size` above one, the highest-priority frames of a sequence are passed to the animal filter several at a time, see `DynAIkonTrap.filtering.animal.AnimalFilter.run_batch()`. Frames close to one another may then all be analysed, where analysing them in turn would have labelled some by smoothing alone, so this trades a few extra inferences for a lower cost per inference.
+
+Motion sequences can be analysed by several worker processes at once (`DynAIkonTrap.settings.MotionQueueSettings.inference_workers`), to make use of all of the CPU's cores. Each worker labels whole sequences itself. A thread of the process owning the `MotionQueue` hands each sequence to a worker waiting for one, through a queue of that worker's own. Workers flag that they are waiting in shared memory and count themselves on a semaphore, neither of which can be left locked. A worker exiting at any point, e.g. killed when memory runs out, therefore cannot hold up the others. Each worker loads the animal detector itself once it has started (see `DynAIkonTrap.filtering.animal.AnimalFilter.load()`), as the inference libraries' thread pools do not survive being forked from a process that has used them. After its first sequence each worker logs its resident memory and how much of it is private to the worker, i.e. the memory each extra worker costs. Frames put on one queue by several processes may be interleaved, so with more than one worker, each worker hands its output over to a single process which passes the frames on. A sequence's animal frames are always output together, but sequences are output in the order they finish rather than the order they were captured.
+
+Optionally (`DynAIkonTrap.settings.MotionQueueSettings.tracking`) the animal found in a frame is followed through the neighbouring frames along their motion vectors by a `DynAIkonTrap.filtering.tracking.MotionTracker`. The frames it covers are labelled as animal without being analysed, in place of the fixed smoothing window either side of the frame. This needs fewer inferences when an animal stays in view for longer than the window, and labels fewer empty frames as animal when it leaves sooner. Frames without motion vectors or detections without a box are still smoothed by the window.
+
+If the animal filter caches its results for near-duplicate frames (see `DynAIkonTrap.filtering.animal.InferenceCache`), each worker publishes its cache's statistics after every sequence. The hit rate and time saved over all workers are given by `MotionQueue.cache_stats()`.
+
 The modularity here means Different implementations for animal filtering and motion filtering stages can be used.
 """
 
+from collections import deque
+from heapq import nlargest
 from dataclasses import dataclass
-from typing import List
+from typing import Deque, List, Optional, Tuple
 from enum import Enum
-from multiprocessing import Event, Process, Queue, Value
+from multiprocessing import Array, Process, Queue, Semaphore, Value
+from os import cpu_count
 from multiprocessing.queues import Queue as QueueType
+from threading import Event, Lock, Thread
 from time import time
+from zlib import compress, decompress
+import numpy as np
 
 from DynAIkonTrap.camera import Frame
 from DynAIkonTrap.logging import get_logger
+from DynAIkonTrap.ring_buffer import HeldSlots
 from DynAIkonTrap.settings import MotionQueueSettings
-from DynAIkonTrap.filtering.animal import AnimalFilter
+from DynAIkonTrap.filtering.animal import AnimalFilter, Detection
+from DynAIkonTrap.filtering.tracking import MotionTracker
 
 logger = get_logger(__name__)
 
 
+def _memory_mb() -> Tuple[float, float]:
+    """Resident memory of this process, and the part of it not shared with other processes, in MB"""
+    sizes = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            sizes[key] = int(value.split()[0])  # In kB
+    private = sizes['Private_Clean'] + sizes['Private_Dirty']
+    return sizes['Rss'] / 1024, private / 1024
+
+
 class Label(Enum):
     """Categories into which a frame can fall"""
 
@@ -81,16 +112,104 @@ class LabelledFrame:
     label: Label = Label.UNKNOWN
 
 
+@dataclass
+class CompactFrame:
+    """A frame stored compactly, with its motion vectors compressed, for the pre-roll"""
+
+    image: bytes
+    motion: bytes
+    motion_dtype: np.dtype
+    motion_shape: Tuple[int, ...]
+    timestamp: float
+    motion_score: float
+    motion_regions: Optional[List[Tuple[float, float, float, float]]] = None
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.image) + len(self.motion)
+
+
+class PreRollBuffer:
+    """Holds the most recent frames without sufficient motion, so they can be placed ahead of a motion sequence. Frames are evicted, oldest first, once there are more than `max_frames` or their combined size exceeds `max_bytes`."""
+
+    def __init__(self, max_frames: int, max_bytes: int):
+        """
+        Args:
+            max_frames (int): Maximum number of frames to keep
+            max_bytes (int): Maximum combined size of the stored frames in bytes
+        """
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames: Deque[CompactFrame] = deque()
+
+    def put(self, frame: Frame, motion_score: float):
+        """Store a compact copy of the frame. The frame itself is released.
+
+        Args:
+            frame (Frame): Frame to be stored
+            motion_score (float): Output value for this frame from the motion filtering stage
+        """
+        if self.max_frames > 0:
+            motion = np.ascontiguousarray(frame.motion)
+            compact = CompactFrame(
+                image=np.asarray(frame.image).tobytes(),
+                motion=compress(motion.tobytes(), 1),
+                motion_dtype=motion.dtype,
+                motion_shape=motion.shape,
+                timestamp=frame.timestamp,
+                motion_score=motion_score,
+                motion_regions=frame.motion_regions,
+            )
+            self._frames.append(compact)
+            self.nbytes += compact.nbytes
+            while len(self._frames) > self.max_frames or self.nbytes > self.max_bytes:
+                self.nbytes -= self._frames.popleft().nbytes
+        frame.release()
+
+    def pop_all(self) -> List[Tuple[Frame, float]]:
+        """Empty the buffer, restoring the stored frames
+
+        Returns:
+            List[Tuple[Frame, float]]: The frames, oldest first, each with its motion score
+        """
+        frames = [
+            (
+                Frame(
+                    np.frombuffer(compact.image, dtype='uint8'),
+                    np.frombuffer(
+                        decompress(compact.motion), dtype=compact.motion_dtype
+                    ).reshape(compact.motion_shape),
+                    compact.timestamp,
+                    motion_regions=compact.motion_regions,
+                ),
+                compact.motion_score,
+            )
+            for compact in self._frames
+        ]
+        self.clear()
+        return frames
+
+    def clear(self):
+        self._frames.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+
 class MotionSequence:
     """Sequence of consecutive frames with motion deemed sufficient by a previous motion filtering stage. Smoothing is built in to smooth any animal detections over multiple frames. This can be done as the minimum number of frames in which an animal is likely to be present, can be reasoned about."""
 
-    def __init__(self, smoothing_len: int):
+    def __init__(self, smoothing_len: int, tracker: Optional[MotionTracker] = None):
         """
         Args:
             smoothing_len (int): Number of frames by which to smooth animal detections in either direction
+            tracker (Optional[MotionTracker], optional): Tracker following animal detections through neighbouring frames, used in place of smoothing where possible. Defaults to None.
         """
         self._frames: List[LabelledFrame] = []
         self.smoothing_len = smoothing_len
+        self._tracker = tracker
         self.complete = False
         self.labelled = False
         self._next_index = 0
@@ -106,16 +225,44 @@ class MotionSequence:
         else:
             self.labelled = True
 
-    def label_as_animal(self, frame: LabelledFrame):
-        """Label a given frame as containing an animal. Intended to be called based on the output of the animal filter. Frames either side of this one in the current motion sequence will also be labelled as animal according to the `smoothing_len`
+    def label_as_animal(
+        self, frame: LabelledFrame, detection: Optional[Detection] = None
+    ):
+        """Label a given frame as containing an animal. Intended to be called based on the output of the animal filter. Frames either side of this one in the current motion sequence will also be labelled as animal: those the tracker follows the detection into if there is a tracker and the detection is given, otherwise according to the `smoothing_len`
 
         Args:
             frame (LabelledFrame): The frame to be labelled as containing an animal
+            detection (Optional[Detection], optional): The animal filter's detection in this frame. Defaults to None.
         """
         frame_index = frame.index
-        start = max(frame_index - self.smoothing_len, 0)
-        stop = min(frame_index + self.smoothing_len, len(self._frames))
-        self._label(self._frames[start : stop + 1], Label.ANIMAL)
+        if self._tracker is None or detection is None or frame.frame.motion is None:
+            start = max(frame_index - self.smoothing_len, 0)
+            stop = min(frame_index + self.smoothing_len, len(self._frames))
+            self._label(self._frames[start : stop + 1], Label.ANIMAL)
+            return
+
+        confidence, box = detection
+        # Frames already labelled have their own evidence
+        after = []
+        for later in self._frames[frame_index + 1 :]:
+            if later.label is not Label.UNKNOWN:
+                break
+            after.append(later)
+        before = []
+        for earlier in reversed(self._frames[:frame_index]):
+            if earlier.label is not Label.UNKNOWN:
+                break
+            before.append(earlier)
+
+        forwards = self._tracker.track(box, confidence, (f.frame.motion for f in after))
+        # Going backwards, frames are related by the vectors of the frame after
+        backwards = self._tracker.track(
+            box,
+            confidence,
+            (f.frame.motion for f in ([frame] + before)[: len(before)]),
+            backwards=True,
+        )
+        self._label(before[:backwards] + [frame] + after[:forwards], Label.ANIMAL)
 
     def label_as_empty(self, frame: LabelledFrame):
         """Label the given frame as empty. Intended to be called based on the output of the animal filter. Only this frame is labelled as empty; no smoothing is applied.
@@ -166,6 +313,29 @@ class MotionSequence:
             return None
         return highest_priority_frame
 
+    def get_highest_priorities(self, count: int) -> List[LabelledFrame]:
+        """Finds the frames with the highest priorities in the motion sequence, to be passed to the animal filtering stage together
+
+        Args:
+            count (int): Maximum number of frames to return
+
+        Returns:
+            List[LabelledFrame]: Frames still to be analysed, highest priority first
+        """
+        return nlargest(
+            count,
+            filter(lambda frame: frame.priority >= 0, self._frames),
+            key=lambda frame: frame.priority,
+        )
+
+    def get_frames(self) -> List[LabelledFrame]:
+        """Retrieve all frames from the motion sequence, in the order they were captured
+
+        Returns:
+            List[LabelledFrame]: List of all frames in this motion sequence
+        """
+        return list(self._frames)
+
     def get_animal_frames(self) -> List[LabelledFrame]:
         """Retrieve only the animal frames from the motion sequence
 
@@ -174,6 +344,14 @@ class MotionSequence:
         """
         return list(filter(lambda frame: frame.label == Label.ANIMAL, self._frames))
 
+    def get_empty_frames(self) -> List[LabelledFrame]:
+        """Retrieve all frames from the motion sequence that are not labelled as animal frames
+
+        Returns:
+            List[LabelledFrame]: List of non-animal frames from this motion sequence
+        """
+        return list(filter(lambda frame: frame.label != Label.ANIMAL, self._frames))
+
     def __len__(self):
         return len(self._frames)
 
@@ -190,15 +368,26 @@ class MotionQueue:
         """
         Args:
             settings (MotionQueueSettings): Settings for the queue
-            animal_detector (AnimalFilter): An initialised animal filter to apply to frames in the motion sequences
+            animal_detector (AnimalFilter): An animal filter to apply to frames in the motion sequences, loaded by each worker process
             output_callback (Callable[[List[Frame]], Any]): Function to call with filtered frames
             framerate (int): Framerate at which the frames were recorded
         """
         self._smoothing_len = int((settings.smoothing_factor * framerate) / 2)
         self._sequence_len = framerate * settings.max_sequence_period_s
-        self._current_sequence = MotionSequence(self._smoothing_len)
+        self._tracker = None
+        if settings.tracking:
+            self._tracker = MotionTracker(
+                settings.tracking_min_agreement,
+                settings.tracking_min_confidence,
+                settings.tracking_confidence_decay,
+            )
+        self._current_sequence = MotionSequence(self._smoothing_len, self._tracker)
+        self._pre_roll = PreRollBuffer(
+            int(settings.pre_roll_s * framerate), settings.pre_roll_bytes
+        )
         self._queue: QueueType[MotionSequence] = Queue()
         self._animal_detector = animal_detector
+        self._batch_size = max(settings.inference_batch_size, 1)
         self._output_queue: QueueType[Frame] = Queue()
 
         self._mean_time = Value('d')
@@ -209,46 +398,174 @@ class MotionQueue:
         with self._remaining_frames.get_lock():
             self._remaining_frames.value = 0
 
-        self._idle = Event()
-        self._idle.set()
-
-        self._process = Process(target=self._process_queue, daemon=True)
-        self._process.start()
+        # Frames of the motion sequence being built, not yet queued
+        self._open_frames = Value('L', 0)
+
+        self._workers = max(settings.inference_workers, 1)
+        self._inputs: List[QueueType[MotionSequence]] = [
+            self._new_input() for _ in range(self._workers)
+        ]
+        # Flags the workers waiting for a sequence, of which there are as many
+        # as the semaphore's count or fewer, should a waiting worker have exited
+        self._idle = Array('b', self._workers, lock=False)
+        self._idle_workers = Semaphore(0)
+        self._dispatch_lock = Lock()
+        self._closing = Event()
+        # Number of frames in the sequence handed to each worker
+        self._analysing = Array('L', self._workers)
+        # Shared memory held by each worker, released should it crash
+        max_frames = int(self._sequence_len) + 1 + self._pre_roll.max_frames
+        self._held = [HeldSlots(3 * max_frames) for _ in range(self._workers)]
+        # Each worker's cache lookups, hits, and time saved
+        self._cache_stats = Array('d', 3 * self._workers)
+
+        self._forwarder = None
+        if self._workers > 1:
+            # Frames put on a queue by several processes can be interleaved, so
+            # workers hand over whole sequences to one process that outputs them
+            self._sequences_out: QueueType[List[Frame]] = Queue()
+            self._unforwarded = Value('L', 0)
+            self._forwarder = self._start_forwarder()
+
+        self._processes = [self._start_worker(i) for i in range(self._workers)]
+        self._dispatcher = Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    @staticmethod
+    def _new_input() -> QueueType:
+        queue = Queue()
+        # A sequence handed to a worker is of no use once the worker has gone,
+        # so never wait to flush one, e.g. as the program exits
+        queue.cancel_join_thread()
+        return queue
+
+    def _start_worker(self, worker: int) -> Process:
+        process = Process(target=self._process_queue, args=(worker,), daemon=True)
+        process.start()
+        return process
+
+    def _start_forwarder(self) -> Process:
+        process = Process(target=self._forward_output, daemon=True)
+        process.start()
+        return process
+
+    @property
+    def process(self) -> Process:
+        """The first of the processes running the animal filter on queued motion sequences"""
+        return self._processes[0]
+
+    @property
+    def processes(self) -> List[Process]:
+        """All of the processes of the motion queue: the workers running the animal filter on queued motion sequences, and the process passing on their output if there are several"""
+        if self._forwarder is None:
+            return list(self._processes)
+        return self._processes + [self._forwarder]
 
     def put(self, frame: Frame, motion_score: float):
         """Append the given frame to the current motion sequence. If the sequence exceeds the length limit, a new one is automatically started. This prevents excessively long motion sequences.
 
+        Any frames held in the pre-roll are placed ahead of the first frame of a sequence.
+
         Args:
             frame (Frame): A frame of motion and image data to be analysed
             motion_score (float): Output value for this frame from the motion filtering stage
         """
-        self._idle.clear()
+        added = 1
+        if len(self._current_sequence) == 0:
+            for pre_roll_frame, score in self._pre_roll.pop_all():
+                self._current_sequence.put(pre_roll_frame, score)
+                added += 1
         self._current_sequence.put(frame, motion_score)
+        with self._open_frames.get_lock():
+            self._open_frames.value += added
         if len(self._current_sequence) >= self._sequence_len:
             self.end_motion_sequence()
 
+    def hold(self, frame: Frame, motion_score: float):
+        """Keep a frame without sufficient motion in the pre-roll, in case motion is declared shortly after. The frame is stored compactly and released.
+
+        Args:
+            frame (Frame): A frame of motion and image data not deemed to contain motion
+            motion_score (float): Output value for this frame from the motion filtering stage
+        """
+        self._pre_roll.put(frame, motion_score)
+
+    def clear_pre_roll(self):
+        """Discard the frames held in the pre-roll, e.g. after a gap in the camera's frames"""
+        self._pre_roll.clear()
+
     def end_motion_sequence(self):
         """End the current motion sequence and prepare the next one. To be called when there is a gap in motion. It is safe to call this repeatedly for consecutive empty frames. Calling this releases the motion sequence to be processed by the animal filter."""
         current_len = len(self._current_sequence)
         if current_len > 0:
             self._queue.put(self._current_sequence)
-            self._current_sequence = MotionSequence(self._smoothing_len)
+            self._current_sequence = MotionSequence(self._smoothing_len, self._tracker)
 
             with self._remaining_frames.get_lock():
                 self._remaining_frames.value += current_len
+            with self._open_frames.get_lock():
+                self._open_frames.value -= current_len
 
             logger.info(
                 'End of motion ({} frames will take <=~{:.0f}s; {:.0f}s cumulative)'.format(
                     current_len,
                     current_len * self._mean_time.value,
-                    self._remaining_frames.value * self._mean_time.value,
+                    self.backlog_s(),
+                )
+            )
+
+    def discard_motion_sequence(self):
+        """Forget the motion sequence being built, e.g. after the process building it has exited. Its frames are not analysed."""
+        self._current_sequence = MotionSequence(self._smoothing_len, self._tracker)
+        with self._open_frames.get_lock():
+            self._open_frames.value = 0
+
+    def _run_animal_detector(
+        self, frames: List[LabelledFrame]
+    ) -> List[Tuple[bool, Optional[Detection]]]:
+        if self._tracker is not None:
+            detections = self._animal_detector.detect_batch(
+                [f.frame.image for f in frames],
+                detector_images=[f.frame.detector_image for f in frames],
+                regions=[f.frame.motion_regions for f in frames],
+            )
+            return [
+                (detection[0] >= self._animal_detector.threshold, detection)
+                for detection in detections
+            ]
+
+        return [(is_animal, None) for is_animal in self._run_classifier(frames)]
+
+    def _run_classifier(self, frames: List[LabelledFrame]) -> List[bool]:
+        if len(frames) == 1:
+            frame = frames[0].frame
+            return [
+                self._animal_detector.run(
+                    frame.image,
+                    detector_image=frame.detector_image,
+                    regions=frame.motion_regions,
                 )
+            ]
+
+        return self._animal_detector.run_batch(
+            [f.frame.image for f in frames],
+            detector_images=[f.frame.detector_image for f in frames],
+            regions=[f.frame.motion_regions for f in frames],
+        )
+
+    def _process_queue(self, worker: int = 0):
+        if self._workers > 1:
+            # Share the cores between the workers rather than oversubscribing
+            self._animal_detector.set_threads(
+                max((cpu_count() or 1) // self._workers, 1)
             )
+        self._animal_detector.load()
 
-    def _process_queue(self):
+        memory_logged = False
         while True:
-            sequence = self._queue.get()
-            self._idle.clear()
+            self._idle[worker] = True
+            self._idle_workers.release()
+            sequence = self._inputs[worker].get()
 
             # Timing full sequence
             t_start = time()
@@ -258,20 +575,24 @@ class MotionQueue:
             inference_count = 0
             t_temp = time()
 
-            frame = sequence.get_highest_priority()
-            while frame:
-                is_animal = self._animal_detector.run(frame.frame.image)
+            frames = sequence.get_highest_priorities(self._batch_size)
+            while frames:
+                results = self._run_animal_detector(frames)
 
                 _t = time()
                 t_actual_framerate += _t - t_temp
                 t_temp = _t
-                inference_count += 1
-
-                if is_animal:
-                    sequence.label_as_animal(frame)
-                else:
-                    sequence.label_as_empty(frame)
-                frame = sequence.get_highest_priority()
+                inference_count += len(frames)
+
+                # Empty labels first, so the smoothing of animal detections
+                # takes precedence as if the frames had been analysed in turn
+                for frame, (is_animal, _) in zip(frames, results):
+                    if not is_animal:
+                        sequence.label_as_empty(frame)
+                for frame, (is_animal, detection) in zip(frames, results):
+                    if is_animal:
+                        sequence.label_as_animal(frame, detection)
+                frames = sequence.get_highest_priorities(self._batch_size)
 
             sequence.close_gaps()
             t_stop = time()
@@ -291,18 +612,130 @@ class MotionQueue:
                     len(sequence) / t,
                 )
             )
+            # Only animal frames are passed on; free the memory of the rest
+            self._held[worker].clear()
+            for frame in sequence.get_empty_frames():
+                frame.frame.release()
+
             output = list(map(lambda frame: frame.frame, sequence.get_animal_frames()))
             output += [None] if len(output) > 0 else []
-            [self._output_queue.put(f) for f in output]
-            self._idle.set()
+            if self._forwarder is None:
+                [self._output_queue.put(f) for f in output]
+            elif output:
+                with self._unforwarded.get_lock():
+                    self._unforwarded.value += 1
+                self._sequences_out.put(output)
+
+            cache = getattr(self._animal_detector, 'cache', None)
+            if cache is not None:
+                self._cache_stats[3 * worker : 3 * worker + 3] = [
+                    cache.lookups,
+                    cache.hits,
+                    cache.time_saved_s,
+                ]
+                logger.debug(
+                    'Inference cache hit rate {:.0%}, saving {:.1f}s so far'.format(
+                        cache.hit_rate, cache.time_saved_s
+                    )
+                )
+
+            if not memory_logged:
+                memory_logged = True
+                try:
+                    logger.info(
+                        'Animal filter worker {} uses {:.0f}MB ({:.0f}MB private)'.format(
+                            worker, *_memory_mb()
+                        )
+                    )
+                except (OSError, KeyError):
+                    pass  # Not available on this system
 
             # Update count of frames
             with self._remaining_frames.get_lock():
                 self._remaining_frames.value -= len(sequence)
+                self._analysing[worker] = 0
+
+    def _dispatch(self):
+        try:
+            while True:
+                sequence = self._queue.get()
+                if sequence is None or not self._hand_over(sequence):
+                    return
+        except (EOFError, OSError):
+            pass  # The queues were closed as the process exits
+
+    def _hand_over(self, sequence: MotionSequence) -> bool:
+        while True:
+            self._idle_workers.acquire()
+            if self._closing.is_set():
+                return False
+            with self._dispatch_lock:
+                idle = [
+                    worker
+                    for worker, process in enumerate(self._processes)
+                    if self._idle[worker] and process.is_alive()
+                ]
+                # None if the worker counted has since exited
+                if not idle:
+                    continue
+                worker = idle[0]
+                self._idle[worker] = False
+                self._analysing[worker] = len(sequence)
+                self._held[worker].record(
+                    *(
+                        array
+                        for labelled in sequence.get_frames()
+                        for array in (
+                            labelled.frame.image,
+                            labelled.frame.motion,
+                            labelled.frame.detector_image,
+                        )
+                    )
+                )
+                self._inputs[worker].put(sequence)
+            return True
+
+    def _forward_output(self):
+        while True:
+            output = self._sequences_out.get()
+            [self._output_queue.put(f) for f in output]
+            with self._unforwarded.get_lock():
+                self._unforwarded.value -= 1
+
+    def backlog_s(self) -> float:
+        """Estimated time to analyse all motion sequences waiting in the queue, based on the mean inference time so far and the number of workers
+
+        Returns:
+            float: Estimated time in seconds until the queue is drained
+        """
+        return self._remaining_frames.value * self._mean_time.value / self._workers
+
+    def cache_stats(self) -> Tuple[float, float]:
+        """Statistics of the animal filter's inference cache over all workers, up to each worker's last finished sequence
+
+        Returns:
+            Tuple[float, float]: Fraction of frames answered from the cache, and the inference time this saved in seconds
+        """
+        stats = np.array(self._cache_stats[:]).reshape(-1, 3)
+        lookups, hits, time_saved = stats.sum(axis=0)
+        return (hits / lookups if lookups else 0.0), time_saved
 
     def is_idle(self) -> bool:
-        """Allows checking if the motion queue is currently waiting for new frames to arrive. May be removed in future."""
-        return (self._queue.qsize() == 0) and self._idle.is_set()
+        """Allows checking if the motion queue is currently waiting for new frames to arrive, with every frame put on it analysed and output. This is not the case while a motion sequence is still open. May be removed in future."""
+        forwarded = self._forwarder is None or self._unforwarded.value == 0
+        return (
+            self._open_frames.value == 0
+            and self._remaining_frames.value == 0
+            and forwarded
+        )
+
+    def empty(self) -> bool:
+        """Indicates if the output queue of animal frames is empty
+
+        Returns:
+            bool: `True` if there are no animal frames waiting to be read, otherwise `False`
+        """
+        return self._output_queue.empty()
 
     def get(self) -> Frame:
         """Retrieve the next animal `Frame` from the motion queue's output
@@ -312,6 +745,36 @@ class MotionQueue:
         """
         return self._output_queue.get()
 
+    def restart(self):
+        """Replace any worker processes that have exited, e.g. after crashing. The sequences handed to them are lost, but queued sequences are kept. Each replacement is given a new queue, as the worker may have exited while holding its queue's lock."""
+        for worker, process in enumerate(self._processes):
+            if not process.is_alive():
+                process.join()
+                with self._dispatch_lock:
+                    self._idle[worker] = False
+                    abandoned = self._inputs[worker]
+                    self._inputs[worker] = self._new_input()
+                    # The sequence handed to it is not coming back
+                    self._held[worker].release_all()
+                    with self._remaining_frames.get_lock():
+                        self._remaining_frames.value -= self._analysing[worker]
+                        self._analysing[worker] = 0
+                abandoned.close()
+                self._processes[worker] = self._start_worker(worker)
+        if self._forwarder is not None and not self._forwarder.is_alive():
+            self._forwarder.join()
+            self._forwarder = self._start_forwarder()
+
     def close(self):
-        self._process.terminate()
-        self._process.join()
+        for process in self.processes:
+            process.kill()
+        for process in self.processes:
+            process.join()
+        # Stops the dispatcher, whether waiting for a sequence or a worker. It
+        # is not waited for, as a process writing to the queue may have been
+        # killed while holding the queue's lock.
+        self._closing.set()
+        self._idle_workers.release()
+        self._queue.put(None)
+        # Any sequences still queued are not going to be read
+        self._queue.cancel_join_thread()
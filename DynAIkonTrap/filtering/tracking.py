@@ -0,0 +1,117 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Follows an animal found by the animal detector through the neighbouring frames of a motion sequence using the camera's motion vectors, so these frames can be labelled without running the detector on them.
+
+Starting from the box of the detection, the `MotionTracker` looks at the macroblocks of the next frame's motion vectors that moved. The fraction of these falling inside the box is its agreement with the detection: if the animal is the only thing moving, all of the motion is within its box. The box is then moved by the mean vector of the moving macroblocks inside it. Tracking stops at the first frame whose agreement is too low, e.g. because nothing moves inside the box any more. The detection's confidence falls by a fixed amount with each frame it is carried, so even a detection only just above the animal filter's threshold covers a good run of frames, and tracking also stops once it falls too low.
+
+The encoder gives each macroblock's vector pointing to where its content came from in the previous frame, so the content itself moved by the opposite of the vector. Tracking backwards in time moves the box along the vectors instead.
+"""
+import math
+from typing import Iterable, Optional, Tuple
+import numpy as np
+
+from DynAIkonTrap.filtering.animal import Box
+
+# Macroblocks are 16 pixels square
+BLOCK_SIZE = 16
+
+# Smallest vector, in pixels, for a macroblock to count as moving
+MIN_VECTOR = 2
+
+
+class MotionTracker:
+    """Propagates a detection's box and confidence along the motion vectors of neighbouring frames"""
+
+    def __init__(
+        self, min_agreement: float, min_confidence: float, confidence_decay: float
+    ):
+        """
+        Args:
+            min_agreement (float): Smallest fraction of a frame's moving macroblocks that must lie within the tracked box for it to be followed
+            min_confidence (float): Smallest propagated confidence for a frame to be covered by the detection
+            confidence_decay (float): Fall in the propagated confidence with each frame the detection is carried
+        """
+        self.min_agreement = min_agreement
+        self.min_confidence = min_confidence
+        self.confidence_decay = confidence_decay
+
+    def step(
+        self, box: Box, motion: np.ndarray, backwards: bool = False
+    ) -> Tuple[Box, float]:
+        """Move a box by one frame's motion
+
+        Args:
+            box (Box): The box in the frame before
+            motion (np.ndarray): Motion vectors of the later of the two frames, as given by the camera
+            backwards (bool, optional): Move the box from the later frame to the earlier one instead. Defaults to False.
+
+        Returns:
+            Tuple[Box, float]: The moved box, and the fraction of the moving macroblocks that were inside it
+        """
+        # Leave out the column the camera adds beyond the right edge of the frame
+        motion = motion[:, :-1]
+        rows, cols = motion.shape
+        x0, y0, x1, y1 = box
+        c0 = min(int(x0 * cols), cols - 1)
+        r0 = min(int(y0 * rows), rows - 1)
+        c1 = max(math.ceil(x1 * cols), c0 + 1)
+        r1 = max(math.ceil(y1 * rows), r0 + 1)
+
+        x = motion['x'].astype(np.float32)
+        y = motion['y'].astype(np.float32)
+        moving = np.square(x) + np.square(y) >= MIN_VECTOR ** 2
+        inside = moving[r0:r1, c0:c1]
+        moved = int(inside.sum())
+        if moved == 0:
+            return box, 0.0
+
+        sign = 1 if backwards else -1
+        dx = sign * x[r0:r1, c0:c1][inside].mean() / (cols * BLOCK_SIZE)
+        dy = sign * y[r0:r1, c0:c1][inside].mean() / (rows * BLOCK_SIZE)
+        # Kept within the frame, as the animal cannot be tracked beyond it
+        dx = min(max(dx, -x0), 1 - x1)
+        dy = min(max(dy, -y0), 1 - y1)
+        return (x0 + dx, y0 + dy, x1 + dx, y1 + dy), moved / float(moving.sum())
+
+    def track(
+        self,
+        box: Box,
+        confidence: float,
+        motions: Iterable[Optional[np.ndarray]],
+        backwards: bool = False,
+    ) -> int:
+        """Follow a detection through consecutive frames
+
+        Args:
+            box (Box): Box of the detection
+            confidence (float): Confidence of the detection
+            motions (Iterable[Optional[np.ndarray]]): For each frame to be covered in turn, the motion vectors relating it to the frame before it: its own vectors going forwards, or those of the frame after it going backwards. Tracking stops at missing vectors.
+            backwards (bool, optional): Track backwards in time. Defaults to False.
+
+        Returns:
+            int: Number of consecutive frames covered by the detection
+        """
+        covered = 0
+        for motion in motions:
+            if motion is None:
+                break
+            box, agreement = self.step(box, motion, backwards)
+            confidence -= self.confidence_decay
+            if agreement < self.min_agreement or confidence < self.min_confidence:
+                break
+            covered += 1
+        return covered
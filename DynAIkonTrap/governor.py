@@ -0,0 +1,152 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Keeps the animal filter's backlog in check during long bursts of activity. The `DynAIkonTrap.filtering.motion_queue.MotionQueue` estimates how long it will take to work through the motion sequences waiting for it. If this estimate exceeds a budget (`DynAIkonTrap.settings.GovernorSettings.budget_s`) and is still growing, the `Governor` steps the camera's framerate and resolution down a level. Fewer, smaller frames then reach the queue and the backlog can drain. Once the estimate has fallen below a fraction of the budget the camera is stepped back up a level.
+
+The levels are spaced geometrically between the camera's configured framerate and resolution and the configured minimum, see `capture_levels()`.
+
+Note that the later stages of the pipeline keep working with the framerate the camera was started with. At a reduced framerate the motion filter's smoothing therefore spans proportionally more time and output videos play back faster than real time.
+
+Likewise, the motion filter's `DynAIkonTrap.settings.MotionFilterSettings.sotv_threshold` is not rescaled between levels. At a reduced resolution the same movement covers fewer macroblocks with shorter vectors, so its SoTV falls roughly with the cube of the linear scale; at a reduced framerate each frame's vectors are longer instead. Smaller or more distant animals may therefore not be declared as motion at the lowest levels, which should be kept in mind when choosing `DynAIkonTrap.settings.GovernorSettings.min_resolution`.
+
+Example usage:
+```python
+camera = Camera(settings=settings.camera)
+filters = Filter(read_from=camera, settings=settings.filter)
+governor = Governor(camera, filters, settings.governor)
+...
+governor.close()  # Before closing the camera
+camera.close()
+```
+"""
+from threading import Event, Thread
+from typing import List, Tuple
+
+from DynAIkonTrap.camera import Camera
+from DynAIkonTrap.filtering import Filter
+from DynAIkonTrap.logging import get_logger
+from DynAIkonTrap.settings import GovernorSettings
+
+logger = get_logger(__name__)
+
+CaptureLevel = Tuple[int, Tuple[int, int]]
+
+
+def capture_levels(
+    framerate: int,
+    resolution: Tuple[int, int],
+    min_framerate: int,
+    min_resolution: Tuple[int, int],
+    steps: int,
+) -> List[CaptureLevel]:
+    """Framerates and resolutions the camera is stepped through, from the highest to the lowest. Widths are rounded to a multiple of 32 and heights to a multiple of 16, as required by the camera's encoders.
+
+    Args:
+        framerate (int): Highest framerate
+        resolution (Tuple[int, int]): Highest resolution
+        min_framerate (int): Lowest framerate
+        min_resolution (Tuple[int, int]): Lowest resolution
+        steps (int): Number of steps down from the highest level
+
+    Returns:
+        List[CaptureLevel]: `(framerate, (width, height))` for each level, starting with the highest
+    """
+
+    def interpolate(high, low, fraction):
+        return high * (min(low, high) / high) ** fraction
+
+    def round_to(value, multiple):
+        return max(int(round(value / multiple)) * multiple, multiple)
+
+    levels = [(framerate, tuple(resolution))]
+    for step in range(1, steps + 1):
+        fraction = step / steps
+        level = (
+            max(int(round(interpolate(framerate, min_framerate, fraction))), 1),
+            (
+                round_to(interpolate(resolution[0], min_resolution[0], fraction), 32),
+                round_to(interpolate(resolution[1], min_resolution[1], fraction), 16),
+            ),
+        )
+        if level != levels[-1]:
+            levels.append(level)
+    return levels
+
+
+class Governor:
+    """Steps the camera's framerate and resolution down while the animal filter has more work waiting than the configured budget, and back up once it has caught up"""
+
+    def __init__(self, camera: Camera, read_from: Filter, settings: GovernorSettings):
+        """
+        Args:
+            camera (Camera): The camera to be governed
+            read_from (Filter): The filter pipeline whose backlog is monitored
+            settings (GovernorSettings): Settings for the governor
+        """
+        self._camera = camera
+        self._filter = read_from
+        self._budget = settings.budget_s
+        self._resume_below = settings.budget_s * settings.resume_fraction
+        self._interval = settings.interval_s
+        self._levels = capture_levels(
+            camera.framerate,
+            camera.resolution,
+            settings.min_framerate,
+            settings.min_resolution,
+            settings.steps,
+        )
+        self.level = 0
+        self._last_backlog = 0.0
+
+        # The camera hardware can only be reconfigured from the process owning
+        # it, so this runs as a thread rather than a separate process
+        self._stop = Event()
+        self._thread = Thread(target=self._govern, daemon=True)
+        self._thread.start()
+        logger.debug('Governor started ({} levels)'.format(len(self._levels)))
+
+    def _next_level(self, backlog: float) -> int:
+        growing = backlog >= self._last_backlog
+        self._last_backlog = backlog
+
+        if backlog > self._budget and growing:
+            return min(self.level + 1, len(self._levels) - 1)
+        if backlog < self._resume_below:
+            return max(self.level - 1, 0)
+        return self.level
+
+    def _govern(self):
+        while not self._stop.wait(self._interval):
+            backlog = self._filter.backlog_s()
+            level = self._next_level(backlog)
+            if level == self.level:
+                continue
+
+            framerate, resolution = self._levels[level]
+            logger.info(
+                'Animal filter backlog ~{:.0f}s; stepping capture {} to level {}'.format(
+                    backlog, 'down' if level > self.level else 'up', level
+                )
+            )
+            try:
+                self._camera.reconfigure(framerate, resolution)
+                self.level = level
+            except Exception as e:
+                logger.error('Could not reconfigure camera: {}'.format(e))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,239 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Recording of camera frames to disk and replaying them through the pipeline. The `ReplayCamera` offers the same interface as `DynAIkonTrap.camera.Camera` (`get()`, `empty()`, `framerate`), so it can be passed to a `DynAIkonTrap.filtering.Filter` in its place. This allows the whole pipeline to be run and measured offline, without a Pi camera.
+
+Frames are streamed lazily from disk by a separate process. Two modes of replay are supported:
+
+- `ReplayMode.REALTIME` paces frames at the recorded framerate. Frames are queued exactly as the real camera would queue them, including dropping frames once the queue is full, so the backlog behaviour of the pipeline can be observed.
+- `ReplayMode.FAST` replays frames as fast as the pipeline consumes them, without dropping any. This measures the sustainable throughput of the pipeline.
+
+Recordings are written with a `RecordingWriter` as a header followed by one pickled record per frame, which means neither recording nor replaying needs to hold the whole recording in memory. Older recordings, a single pickled dictionary of all frames, can still be replayed.
+
+Example usage:
+```python
+camera = ReplayCamera('data.pk', mode=ReplayMode.FAST)
+filters = Filter(read_from=camera, settings=settings.filter)
+```
+"""
+from enum import Enum
+from multiprocessing import Event, Process, Value
+from pickle import HIGHEST_PROTOCOL, dump, load
+from queue import Empty
+from time import sleep, time
+from typing import Any, Dict, Iterator, Tuple
+import numpy as np
+
+from DynAIkonTrap.camera import Frame, FrameQueue
+from DynAIkonTrap.logging import get_logger
+from DynAIkonTrap.settings import CameraSettings, DropPolicy
+
+logger = get_logger(__name__)
+
+RECORDING_VERSION = 1
+
+
+class ReplayMode(Enum):
+    """Speed at which a recording is replayed"""
+
+    REALTIME = 0
+    FAST = 1
+
+
+class RecordingWriter:
+    """Writes frames to disk one at a time, in the format read by `read_recording()`"""
+
+    def __init__(self, filename: str, framerate: int, resolution: Tuple[int, int]):
+        """
+        Args:
+            filename (str): File to write the recording to
+            framerate (int): Framerate at which the frames are recorded
+            resolution (Tuple[int, int]): Resolution of the recorded images
+        """
+        self._file = open(filename, 'wb')
+        dump(
+            {
+                'version': RECORDING_VERSION,
+                'framerate': framerate,
+                'resolution': resolution,
+            },
+            self._file,
+            HIGHEST_PROTOCOL,
+        )
+        self.frames_written = 0
+
+    def write(self, frame: Frame):
+        """Append a frame to the recording. The frame's data is copied, so it may be released afterwards.
+
+        Args:
+            frame (Frame): The frame to be written
+        """
+        record = {
+            'image': np.array(frame.image),
+            'motion': np.array(frame.motion),
+            'timestamp': frame.timestamp,
+        }
+        if frame.detector_image is not None:
+            record['detector_image'] = np.array(frame.detector_image)
+        dump(record, self._file, HIGHEST_PROTOCOL)
+        self.frames_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_recording(filename: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Open a recording for reading. The frames are read from disk only as the returned iterator is advanced.
+
+    Args:
+        filename (str): Recording to be read
+
+    Returns:
+        Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]: The recording's header (`framerate` and `resolution`) and an iterator over its frames. Each frame is a dictionary with `image`, `motion`, and optionally `timestamp` and `detector_image`.
+    """
+    with open(filename, 'rb') as f:
+        header = load(f)
+
+    if 'frames' in header:
+        # Legacy format; everything was pickled in one go
+        return header, iter(header.pop('frames'))
+
+    def frames():
+        with open(filename, 'rb') as f:
+            load(f)  # Skip the header
+            while True:
+                try:
+                    yield load(f)
+                except EOFError:
+                    return
+
+    return header, frames()
+
+
+class ReplayCamera:
+    """Replays a recording from disk through the same interface as a `DynAIkonTrap.camera.Camera`"""
+
+    def __init__(
+        self,
+        filename: str,
+        mode: ReplayMode = ReplayMode.REALTIME,
+        settings: CameraSettings = CameraSettings(),
+        recorded_timestamps: bool = False,
+    ):
+        """
+        Args:
+            filename (str): Recording to replay
+            mode (ReplayMode, optional): Speed at which to replay the recording. Defaults to ReplayMode.REALTIME.
+            settings (CameraSettings, optional): Queue settings for the replayed frames. The framerate and resolution are taken from the recording. Defaults to CameraSettings().
+            recorded_timestamps (bool, optional): Stamp frames with the time they were recorded, where available. By default frames are stamped with their index in the recording, so outputs can be matched to the recording's frames. Defaults to False.
+        """
+        header, _ = read_recording(filename)
+        self.framerate = header['framerate']
+        self.resolution = header['resolution']
+
+        self._filename = filename
+        self._mode = mode
+        self._recorded_timestamps = recorded_timestamps
+        self._output = FrameQueue(
+            settings.max_queued_frames,
+            settings.drop_policy,
+            settings.decimation_factor,
+        )
+
+        self._finished = Event()
+        self._frames_read = Value('L', 0)
+        self._reader = Process(target=self._read_frames, daemon=True)
+        self._reader.start()
+        logger.debug('Replay of `{}` started ({})'.format(filename, mode.name))
+
+    def _read_frames(self):
+        _, frames = read_recording(self._filename)
+        t_start = time()
+
+        try:
+            for i, data in enumerate(frames):
+                if self._recorded_timestamps and 'timestamp' in data:
+                    timestamp = data['timestamp']
+                else:
+                    timestamp = i
+                frame = Frame(
+                    data['image'],
+                    data['motion'],
+                    timestamp,
+                    data.get('detector_image'),
+                )
+
+                if self._mode == ReplayMode.REALTIME:
+                    sleep(max(t_start + i / self.framerate - time(), 0))
+                    self._output.put(frame)
+                else:
+                    self._output.put(frame, block=True)
+
+                with self._frames_read.get_lock():
+                    self._frames_read.value += 1
+        finally:
+            # Also signal the end of the replay if the recording is truncated
+            self._finished.set()
+
+    def get(self) -> Frame:
+        """Retrieve the next frame from the recording
+
+        Raises:
+            Empty: If no frame is available within one frame period
+
+        Returns:
+            Frame: A frame from the recording
+        """
+        try:
+            return self._output.get(1 / self.framerate)
+
+        except Empty:
+            if not self._finished.is_set():
+                logger.error('No frames available from replay')
+            raise Empty
+
+    def empty(self) -> bool:
+        """Indicates if the queue of buffered frames is empty
+
+        Returns:
+            bool: `True` if there are no more frames, otherwise `False`
+        """
+        return self._output.empty()
+
+    def finished(self) -> bool:
+        """Indicates if the whole recording has been read from disk. Some frames may still be queued.
+
+        Returns:
+            bool: `True` once every frame has been read, otherwise `False`
+        """
+        return self._finished.is_set()
+
+    @property
+    def frames_read(self) -> int:
+        """Number of frames read from the recording so far"""
+        return self._frames_read.value
+
+    def dropped_frames(self) -> Dict[DropPolicy, int]:
+        """Number of frames dropped because the pipeline did not keep up. Frames are only ever dropped in `ReplayMode.REALTIME`.
+
+        Returns:
+            Dict[DropPolicy, int]: Count of dropped frames by the policy under which they were dropped
+        """
+        return self._output.dropped()
+
+    def close(self):
+        self._reader.terminate()
+        self._reader.join()
@@ -0,0 +1,265 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+A fixed-size ring buffer in shared memory for passing large frame payloads (JPEG images, motion vectors) between the processes of the pipeline. Without it every `DynAIkonTrap.camera.Frame` is pickled and copied at each `multiprocessing.Queue` hop.
+
+Arrays placed in a `SharedRingBuffer` are handed back as `SharedArray`s. These behave like normal read-only NumPy arrays, but when pickled (e.g. when put on a queue) only a small `SlotHandle` is transferred. The receiving process maps the same slot and reads the data in place.
+
+Each slot carries a reference count. Writing a slot sets its count to one and whoever holds the resulting array owns that reference; putting the array on a queue passes the reference on with it. The last stage to use the data should call `release()`, which frees the slot for reuse. If the buffer is full, `SharedRingBuffer.put()` returns `None` and the caller can fall back to passing the data by value.
+
+Example usage:
+```python
+buffer = SharedRingBuffer(slots=100, slot_size=640 * 480)
+
+image = buffer.put(jpeg_array)  # `None` if no slot was free
+queue.put(image)  # Only the handle is pickled
+
+# ... in another process
+image = queue.get()
+do_something_with(image)
+release(image)
+```
+
+The buffers rely on the pipeline's processes being forked (the default on Linux) after the buffer is created, so that every stage inherits the shared memory mapping and the reference counts.
+
+A process that exits without releasing its arrays, e.g. after crashing, would leave their slots in use for good. A process may therefore note the arrays it holds in a `HeldSlots` record, so that another process can release them on its behalf.
+"""
+from dataclasses import dataclass
+from multiprocessing import Array, Value
+from os import getpid
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:
+    # Python < 3.8
+    SharedMemory = None
+
+from DynAIkonTrap.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Buffers created in this process (or inherited from its parent), by name
+_buffers: Dict[str, 'SharedRingBuffer'] = {}
+
+
+@dataclass(frozen=True)
+class SlotHandle:
+    """Reference to an array stored in a slot of a `SharedRingBuffer`"""
+
+    buffer: str
+    slot: int
+    dtype: np.dtype
+    shape: Tuple[int, ...]
+
+
+class SharedArray(np.ndarray):
+    """A read-only NumPy array backed by a slot of a `SharedRingBuffer`. Pickling one of these only transfers its `SlotHandle`; arrays derived from it (views, arithmetic results) are ordinary data and are pickled by value."""
+
+    handle: Optional[SlotHandle] = None
+
+    def __array_finalize__(self, obj):
+        self.handle = None
+
+    def __reduce_ex__(self, protocol):
+        if self.handle is None:
+            return np.asarray(self).__reduce_ex__(protocol)
+        return (_attach, (self.handle,))
+
+
+def _attach_buffer(handle: SlotHandle) -> 'SharedRingBuffer':
+    buffer = _buffers.get(handle.buffer)
+    if buffer is None:
+        raise RuntimeError(
+            'Shared buffer `{}` is not mapped in this process; was it created before the process was forked?'.format(
+                handle.buffer
+            )
+        )
+    return buffer
+
+
+def _attach(handle: SlotHandle) -> SharedArray:
+    return _attach_buffer(handle).view(handle)
+
+
+class SharedRingBuffer:
+    """Ring of equally sized, reference counted slots in shared memory"""
+
+    def __init__(self, slots: int, slot_size: int):
+        """
+        Args:
+            slots (int): Number of slots in the ring
+            slot_size (int): Size of each slot in bytes. Arrays larger than this cannot be stored.
+
+        Raises:
+            RuntimeError: If shared memory is not supported by this Python version (< 3.8)
+        """
+        if SharedMemory is None:
+            raise RuntimeError('Shared memory buffers require Python 3.8 or newer')
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._memory = SharedMemory(create=True, size=slots * slot_size)
+        self.name = self._memory.name
+        self._refcounts = Array('i', slots)
+        self._next_slot = 0
+        self._owner = getpid()
+        _buffers[self.name] = self
+
+    def _claim(self) -> Optional[int]:
+        with self._refcounts.get_lock():
+            refcounts = self._refcounts.get_obj()
+            for i in range(self.slots):
+                slot = (self._next_slot + i) % self.slots
+                if refcounts[slot] == 0:
+                    refcounts[slot] = 1
+                    self._next_slot = (slot + 1) % self.slots
+                    return slot
+        return None
+
+    def put(self, array: np.ndarray) -> Optional[SharedArray]:
+        """Copy an array into a free slot. The caller owns the single reference to the returned array.
+
+        Args:
+            array (np.ndarray): Data to be stored
+
+        Returns:
+            Optional[SharedArray]: Read-only view of the stored data, or `None` if no slot was free or the array does not fit into a slot
+        """
+        if array.nbytes > self.slot_size:
+            return None
+
+        slot = self._claim()
+        if slot is None:
+            return None
+
+        destination = np.ndarray(
+            array.shape,
+            array.dtype,
+            buffer=self._memory.buf,
+            offset=slot * self.slot_size,
+        )
+        destination[...] = array
+        return self.view(SlotHandle(self.name, slot, array.dtype, array.shape))
+
+    def view(self, handle: SlotHandle) -> SharedArray:
+        """Map the data referred to by a handle without copying it
+
+        Args:
+            handle (SlotHandle): Handle to a slot in this buffer
+
+        Returns:
+            SharedArray: Read-only view of the slot's data
+        """
+        array = np.ndarray(
+            handle.shape,
+            handle.dtype,
+            buffer=self._memory.buf,
+            offset=handle.slot * self.slot_size,
+        ).view(SharedArray)
+        array.flags.writeable = False
+        array.handle = handle
+        return array
+
+    def acquire(self, handle: SlotHandle):
+        """Take an additional reference to a slot"""
+        with self._refcounts.get_lock():
+            self._refcounts.get_obj()[handle.slot] += 1
+
+    def release(self, handle: SlotHandle):
+        """Drop a reference to a slot. The slot is reused once all references are released."""
+        self._release(handle.slot)
+
+    def _release(self, slot: int):
+        with self._refcounts.get_lock():
+            refcounts = self._refcounts.get_obj()
+            if refcounts[slot] <= 0:
+                logger.error('Slot {} released more often than acquired'.format(slot))
+                return
+            refcounts[slot] -= 1
+
+    def in_use(self) -> int:
+        """Number of slots currently holding data"""
+        with self._refcounts.get_lock():
+            return sum(1 for count in self._refcounts.get_obj() if count > 0)
+
+    def close(self):
+        """Unmap the buffer and, if called by the process that created it, free the shared memory"""
+        _buffers.pop(self.name, None)
+        try:
+            self._memory.close()
+        except BufferError:
+            # Views of the memory are still alive in this process
+            pass
+        if getpid() == self._owner:
+            self._memory.unlink()
+
+
+def acquire(*arrays):
+    """Take an additional reference to each shared array given. Anything that is not a `SharedArray` is ignored."""
+    for array in arrays:
+        if isinstance(array, SharedArray) and array.handle is not None:
+            _attach_buffer(array.handle).acquire(array.handle)
+
+
+def release(*arrays):
+    """Release a reference to each shared array given. Anything that is not a `SharedArray` is ignored, so this can safely be called on any frame payload."""
+    for array in arrays:
+        if isinstance(array, SharedArray) and array.handle is not None:
+            _attach_buffer(array.handle).release(array.handle)
+
+
+class HeldSlots:
+    """Record, in shared memory, of the slots one process holds references to. Should the process exit without releasing them, another can do so with `release_all()`. Only buffers existing when the record is created are tracked, as only these are mapped by processes forked afterwards."""
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity (int): Largest number of references recorded at once
+        """
+        self._names: List[str] = list(_buffers)
+        # Pairs of buffer index and slot
+        self._entries = Array('i', 2 * capacity)
+        self._count = Value('i', 0)
+
+    def record(self, *arrays):
+        """Replace the record with the references held by the given arrays. Anything that is not a `SharedArray` of a tracked buffer is ignored, as are arrays beyond the capacity."""
+        entries = []
+        for array in arrays:
+            if isinstance(array, SharedArray) and array.handle is not None:
+                if array.handle.buffer in self._names:
+                    buffer_index = self._names.index(array.handle.buffer)
+                    entries += [buffer_index, array.handle.slot]
+        entries = entries[: len(self._entries)]
+        with self._count.get_lock():
+            self._entries[: len(entries)] = entries
+            self._count.value = len(entries) // 2
+
+    def clear(self):
+        """Empty the record, e.g. once the process has released or passed on its arrays"""
+        with self._count.get_lock():
+            self._count.value = 0
+
+    def release_all(self):
+        """Release every recorded reference and empty the record"""
+        with self._count.get_lock():
+            entries = self._entries[: 2 * self._count.value]
+            self._count.value = 0
+        for index, slot in zip(entries[::2], entries[1::2]):
+            buffer = _buffers.get(self._names[index])
+            if buffer is not None:
+                buffer._release(slot)
@@ -130,6 +130,11 @@ class SensorLogs:
         self._logger.start()
         logger.debug('SensorLogs started')
 
+    @property
+    def process(self) -> Process:
+        """The process taking and looking up sensor logs"""
+        return self._logger
+
     @property
     def read_interval(self):
         return self._read_interval
@@ -220,6 +225,12 @@ class SensorLogs:
         self._query_queue.put(timestamp)
         return self._results_queue.get()
 
+    def restart(self):
+        """Replace the sensor logging process, e.g. after it has crashed. Logs taken so far are lost."""
+        self.close()
+        self._logger = Process(target=self._log, daemon=True)
+        self._logger.start()
+
     def close(self):
-        self._logger.terminate()
+        self._logger.kill()
         self._logger.join()
@@ -30,7 +30,13 @@ The JSON file should be structured as follows (of course the values can be chang
 {
     "camera": {
         "framerate": 20,
-        "resolution": [640, 480]
+        "resolution": [640, 480],
+        "frame_buffer_slots": -1,
+        "max_queued_frames": 100,
+        "drop_policy": 0,
+        "decimation_factor": 2,
+        "detector_stream": false,
+        "detector_resolution": [416, 416]
     },
     "filter": {
         "motion": {
@@ -38,14 +44,47 @@ The JSON file should be structured as follows (of course the values can be chang
             "sotv_threshold": 300,
             "iir_cutoff_hz": 1,
             "iir_order": 8,
-            "iir_attenuation": 20
+            "iir_attenuation": 20,
+            "roi_mask_file": "",
+            "roi_exclusions": [[0.0, 0.0, 1.0, 0.1]],
+            "background_model": true,
+            "background_time_constant_s": 30,
+            "motion_regions": true,
+            "region_min_blocks": 2
         },
         "animal": {
-            "threshold": 0.1
+            "threshold": 0.1,
+            "crop_to_motion": true,
+            "crop_margin": 0.25,
+            "max_crops": 2,
+            "min_input_size": 160,
+            "backend": 3,
+            "darknet_weights": "DynAIkonTrap/filtering/yolo_animal_detector.weights",
+            "darknet_config": "DynAIkonTrap/filtering/yolo_animal_detector.cfg",
+            "onnx_model": "DynAIkonTrap/filtering/yolo_animal_detector.onnx",
+            "tflite_model": "DynAIkonTrap/filtering/yolo_animal_detector.tflite",
+            "probe_runs": 3,
+            "precision": 1,
+            "onnx_int8_model": "DynAIkonTrap/filtering/yolo_animal_detector.int8.onnx",
+            "tflite_int8_model": "DynAIkonTrap/filtering/yolo_animal_detector.int8.tflite",
+            "cascade": true,
+            "cascade_input_size": 224,
+            "cascade_reject_below": 0.05,
+            "cascade_accept_above": 0.6,
+            "cache_size": 16,
+            "cache_max_distance": 4
         },
         "motion_queue": {
             "smoothing_factor": 1,
-            "max_sequence_period_s": 10.0
+            "max_sequence_period_s": 10.0,
+            "pre_roll_s": 1.0,
+            "pre_roll_bytes": 2000000,
+            "inference_batch_size": 1,
+            "inference_workers": 1,
+            "tracking": true,
+            "tracking_min_agreement": 0.6,
+            "tracking_min_confidence": 0.05,
+            "tracking_confidence_decay": 0.005
         }
     },
     "sensor": {
@@ -61,10 +100,21 @@ The JSON file should be structured as follows (of course the values can be chang
     },
     "logging": {
         "level": "INFO"
+    },
+    "governor": {
+        "enabled": false,
+        "budget_s": 600.0,
+        "resume_fraction": 0.5,
+        "interval_s": 10.0,
+        "min_framerate": 5,
+        "min_resolution": [320, 240],
+        "steps": 3
     }
 }
 ```
 
+The `governor` section is optional.
+
 """
 from json import load, JSONDecodeError
 from dataclasses import dataclass
@@ -76,12 +126,26 @@ from DynAIkonTrap.logging import get_logger
 logger = get_logger(__name__)
 
 
+class DropPolicy(Enum):
+    """What the camera does with new frames once its output queue is full"""
+
+    DROP_OLDEST = 0
+    DROP_NEWEST = 1
+    DECIMATE = 2
+
+
 @dataclass
 class CameraSettings:
     """Settings for a `DynAIkonTrap.camera.Camera`"""
 
     framerate: int = 20
     resolution: Tuple[int, int] = (640, 480)
+    frame_buffer_slots: int = -1  # Shared memory slots; -1 for auto, 0 to disable
+    max_queued_frames: int = 100
+    drop_policy: DropPolicy = DropPolicy.DROP_OLDEST
+    decimation_factor: int = 2
+    detector_stream: bool = False  # Record a raw stream for the animal detector
+    detector_resolution: Tuple[int, int] = (416, 416)
 
 
 @dataclass
@@ -93,6 +157,28 @@ class MotionFilterSettings:
     iir_cutoff_hz: float = 2.0
     iir_order: int = 3
     iir_attenuation: int = 35
+    roi_mask_file: str = ''  # Greyscale image weighting motion; black is ignored
+    roi_exclusions: Tuple = ()  # Ignored regions as [x0, y0, x1, y1] fractions of the frame
+    background_model: bool = False
+    background_time_constant_s: float = 30.0
+    motion_regions: bool = False  # Attach bounding boxes of motion to each frame
+    region_min_blocks: int = 2
+
+
+class DetectorBackend(Enum):
+    """Inference library used to run the animal detector, see `DynAIkonTrap.filtering.backends`"""
+
+    OPENCV = 0
+    ONNX = 1
+    TFLITE = 2
+    AUTO = 3  # Fastest of those available
+
+
+class DetectorPrecision(Enum):
+    """Numerical precision of the animal detector model"""
+
+    FLOAT32 = 0
+    INT8 = 1  # Quantised model, see `DynAIkonTrap.filtering.backends`
 
 
 @dataclass
@@ -100,6 +186,25 @@ class AnimalFilterSettings:
     """Settings for a `DynAIkonTrap.filtering.animal.AnimalFilter`"""
 
     threshold: float = 0.2
+    crop_to_motion: bool = False  # Only analyse crops around motion regions
+    crop_margin: float = 0.25
+    max_crops: int = 2
+    min_input_size: int = 160
+    backend: DetectorBackend = DetectorBackend.OPENCV
+    darknet_weights: str = 'DynAIkonTrap/filtering/yolo_animal_detector.weights'
+    darknet_config: str = 'DynAIkonTrap/filtering/yolo_animal_detector.cfg'
+    onnx_model: str = 'DynAIkonTrap/filtering/yolo_animal_detector.onnx'
+    tflite_model: str = 'DynAIkonTrap/filtering/yolo_animal_detector.tflite'
+    probe_runs: int = 3  # Images each backend is timed on with DetectorBackend.AUTO
+    precision: DetectorPrecision = DetectorPrecision.FLOAT32
+    onnx_int8_model: str = 'DynAIkonTrap/filtering/yolo_animal_detector.int8.onnx'
+    tflite_int8_model: str = 'DynAIkonTrap/filtering/yolo_animal_detector.int8.tflite'
+    cascade: bool = False  # Cheap low-resolution pass before the full pass
+    cascade_input_size: int = 224
+    cascade_reject_below: float = 0.05  # Cheap pass says no animal below this
+    cascade_accept_above: float = 0.6  # Cheap pass says animal at or above this
+    cache_size: int = 0  # Recent frames whose confidences are reused; 0 disables
+    cache_max_distance: int = 4  # Bits in which near-duplicate frames' hashes differ
 
 
 @dataclass
@@ -108,6 +213,14 @@ class MotionQueueSettings:
 
     smoothing_factor: float = 0.5
     max_sequence_period_s: float = 10.0
+    pre_roll_s: float = 1.0  # Frames kept from before motion is declared
+    pre_roll_bytes: int = 2000000  # Memory budget for the pre-roll frames
+    inference_batch_size: int = 1  # Frames passed to the animal filter at once
+    inference_workers: int = 1  # Processes analysing motion sequences in parallel
+    tracking: bool = False  # Follow detections along motion vectors, not smoothing
+    tracking_min_agreement: float = 0.6  # Share of the motion within the tracked box
+    tracking_min_confidence: float = 0.05
+    tracking_confidence_decay: float = 0.005  # Per frame a detection is carried
 
 
 @dataclass
@@ -172,6 +285,19 @@ class LoggerSettings:
     # `Literal` is not supported in Python from RPi packages, hence no proper type hint
 
 
+@dataclass
+class GovernorSettings:
+    """Settings for a `DynAIkonTrap.governor.Governor`"""
+
+    enabled: bool = False
+    budget_s: float = 600.0  # Acceptable animal filter backlog
+    resume_fraction: float = 0.5  # Step back up below this fraction of the budget
+    interval_s: float = 10.0
+    min_framerate: int = 5
+    min_resolution: Tuple[int, int] = (320, 240)
+    steps: int = 3
+
+
 @dataclass
 class Settings:
     """Settings for the camera trap system. A class of nested classes and variables to represent all tunable parameters in the system."""
@@ -181,6 +307,7 @@ class Settings:
     sensor: SensorSettings = SensorSettings()
     output: Union[SenderSettings, WriterSettings] = WriterSettings()
     logging: LoggerSettings = LoggerSettings()
+    governor: GovernorSettings = GovernorSettings()
 
 
 def load_settings() -> Settings:
@@ -223,16 +350,23 @@ def load_settings() -> Settings:
                         path=settings_json['output']['path'],
                     )
 
+                camera = CameraSettings(**settings_json['camera'])
+                camera.drop_policy = DropPolicy(camera.drop_policy)
+                animal = AnimalFilterSettings(**settings_json['filter']['animal'])
+                animal.backend = DetectorBackend(animal.backend)
+                animal.precision = DetectorPrecision(animal.precision)
+
                 return Settings(
-                    CameraSettings(**settings_json['camera']),
+                    camera,
                     FilterSettings(
                         MotionFilterSettings(**settings_json['filter']['motion']),
-                        AnimalFilterSettings(**settings_json['filter']['animal']),
+                        animal,
                         MotionQueueSettings(**settings_json['filter']['motion_queue']),
                     ),
                     SensorSettings(**settings_json['sensor']),
                     output,
                     LoggerSettings(**settings_json['logging']),
+                    GovernorSettings(**settings_json.get('governor', {})),
                 )
 
             except KeyError as e:
@@ -0,0 +1,199 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Supervision of the pipeline's processes from the main process. The `Supervisor` sleeps until either a signal arrives or one of the supervised processes exits, so the main process uses next to no CPU while the camera trap runs.
+
+Each stage of the pipeline running in its own process (e.g. the `DynAIkonTrap.filtering.Filter`, `DynAIkonTrap.filtering.motion_queue.MotionQueue`, `DynAIkonTrap.sensor.SensorLogs`, and the output) is registered as a `Stage`. The stage's component must provide its `process`, or `processes` if it runs several, and a `restart()` method. If a stage's process exits unexpectedly it is restarted, up to a limit after which the whole system is shut down.
+
+On SIGINT or SIGTERM anything controlling the camera, such as the `DynAIkonTrap.governor.Governor`, is stopped first, followed by the camera. The remaining stages are then given some time to finish processing the frames already captured, before they are closed. The camera itself runs in the main process and is not restarted. The stages' processes ignore both signals, which may be sent to the whole process group, and leave it to the supervisor to stop them; stages are therefore closed with SIGKILL. To this end the stages are set up, and restarted, within `ignoring_signals()`.
+
+Example usage:
+```python
+supervisor = Supervisor(
+    camera,
+    [Stage('filter', filters), Stage('motion queue', filters.motion_queue)],
+    is_idle=filters.is_idle,
+)
+exit(supervisor.run())
+```
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import Process
+from multiprocessing.connection import wait
+from os import close, pipe, read, set_blocking
+from signal import (
+    SIG_BLOCK,
+    SIG_SETMASK,
+    SIGINT,
+    SIGTERM,
+    Signals,
+    pthread_sigmask,
+    set_wakeup_fd,
+    signal,
+)
+from time import sleep, time
+from typing import Any, Callable, Dict, List, Optional
+
+from DynAIkonTrap.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@contextmanager
+def ignoring_signals():
+    """Processes started within this context, from the calling thread, have SIGINT and SIGTERM blocked for good. They therefore never act on the signals, nor on any handling of them they inherit, such as the supervisor's handlers and wakeup fd. The calling thread's own signals are only held back until the end of the context."""
+    mask = pthread_sigmask(SIG_BLOCK, (SIGINT, SIGTERM))
+    try:
+        yield
+    finally:
+        pthread_sigmask(SIG_SETMASK, mask)
+
+
+@dataclass
+class Stage:
+    """A component of the pipeline running in its own process. The component must have a `process` attribute, the `multiprocessing.Process` doing its work, and `restart()` and `close()` methods. A component running several processes lists them all in a `processes` attribute."""
+
+    name: str
+    component: Any
+
+    @property
+    def processes(self) -> List[Process]:
+        return getattr(self.component, 'processes', [self.component.process])
+
+
+class Supervisor:
+    """Blocks the main process on signals and the exit of any supervised process, restarting stages that crash and shutting the pipeline down cleanly"""
+
+    def __init__(
+        self,
+        camera: Any,
+        stages: List[Stage],
+        is_idle: Optional[Callable[[], bool]] = None,
+        flush_timeout_s: float = 30.0,
+        max_restarts: int = 5,
+        governor: Optional[Any] = None,
+    ):
+        """
+        Args:
+            camera (Any): The frame source, closed first on shutdown
+            stages (List[Stage]): Stages to supervise, in pipeline order. They are closed in this order on shutdown.
+            is_idle (Optional[Callable[[], bool]], optional): Indicates that all captured frames have been processed. Used to flush the pipeline on shutdown. Defaults to None, meaning there is nothing to wait for.
+            flush_timeout_s (float, optional): Longest time to wait for the pipeline to flush on shutdown. Defaults to 30.0.
+            max_restarts (int, optional): Restarts allowed per stage before giving up and shutting down. Defaults to 5.
+            governor (Optional[Any], optional): Controls the camera, e.g. a `DynAIkonTrap.governor.Governor`, and is closed before it on shutdown. Defaults to None.
+        """
+        self._camera = camera
+        self._governor = governor
+        self._stages = stages
+        self._is_idle = is_idle
+        self._flush_timeout = flush_timeout_s
+        self._max_restarts = max_restarts
+        self.restarts: Dict[str, int] = {stage.name: 0 for stage in stages}
+
+        # Signals are written to this pipe, waking the supervisor
+        self._signal_r, self._signal_w = pipe()
+        set_blocking(self._signal_w, False)
+        self._previous_wakeup_fd = set_wakeup_fd(self._signal_w)
+        self._previous_handlers = {
+            signal_num: signal(signal_num, lambda signal_num, stack_frame: None)
+            for signal_num in (SIGINT, SIGTERM)
+        }
+
+    def _restart(self, stage: Stage, processes: List[Process]) -> bool:
+        self.restarts[stage.name] += 1
+        if self.restarts[stage.name] > self._max_restarts:
+            logger.error(
+                '{} stage exited {} times; giving up'.format(
+                    stage.name, self.restarts[stage.name]
+                )
+            )
+            return False
+
+        logger.error(
+            '{} stage exited unexpectedly (exit code {}); restarting'.format(
+                stage.name, ', '.join(str(process.exitcode) for process in processes)
+            )
+        )
+        with ignoring_signals():
+            stage.component.restart()
+        return True
+
+    def run(self) -> int:
+        """Supervise the pipeline until a signal to stop is received or a stage keeps failing
+
+        Returns:
+            int: Exit code for the program; `0` following a signal to stop
+        """
+        exit_code = 0
+        while True:
+            sentinels = {
+                process.sentinel: (stage, process)
+                for stage in self._stages
+                for process in stage.processes
+            }
+            ready = wait(list(sentinels) + [self._signal_r])
+
+            if self._signal_r in ready:
+                signal_num = read(self._signal_r, 1)[0]
+                logger.info('Received {}'.format(Signals(signal_num).name))
+                break
+
+            # A stage replaces all of its exited processes in one restart
+            exited = [
+                (stage, [sentinels[s][1] for s in ready if sentinels[s][0] is stage])
+                for stage in self._stages
+            ]
+            if not all(
+                self._restart(stage, processes)
+                for stage, processes in exited
+                if processes
+            ):
+                exit_code = 1
+                break
+
+        self.shutdown()
+        return exit_code
+
+    def _alive(self) -> bool:
+        return all(
+            process.is_alive() for stage in self._stages for process in stage.processes
+        )
+
+    def shutdown(self):
+        """Stop capturing, give the pipeline time to finish processing the frames already captured, and close all stages"""
+        logger.info('Shutting down')
+        if self._governor is not None:
+            self._governor.close()
+        self._camera.close()
+
+        if self._is_idle is not None:
+            t_stop = time() + self._flush_timeout
+            # Polling, but only for a bounded time during shutdown
+            while self._alive() and not self._is_idle() and time() < t_stop:
+                sleep(0.1)
+            if not self._is_idle():
+                logger.warning('Pipeline not flushed; some frames may be lost')
+
+        for stage in self._stages:
+            stage.component.close()
+
+        for signal_num, handler in self._previous_handlers.items():
+            signal(signal_num, handler)
+        set_wakeup_fd(self._previous_wakeup_fd)
+        close(self._signal_r)
+        close(self._signal_w)
+        logger.info('Shut down')
@@ -0,0 +1,103 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from argparse import ArgumentParser
+from sys import path
+from time import time
+import cv2
+import numpy as np
+
+path.append('./')
+from DynAIkonTrap.filtering.animal import STAGES, AnimalFilter
+from DynAIkonTrap.settings import AnimalFilterSettings
+
+
+def random_jpegs(resolution, n):
+    rng = np.random.default_rng(0)
+    width, height = resolution
+    # Smooth noise compresses more like a real scene than white noise
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    images = []
+    for _ in range(n):
+        image = cv2.resize(np.roll(small, 1, axis=1), (width, height))
+        images.append(cv2.imencode('.jpg', image)[1])
+    return images
+
+
+parser = ArgumentParser(
+    description='Measure the animal filter\'s throughput for different inference batch sizes, with and without the cascade'
+)
+parser.add_argument(
+    '--batch-sizes',
+    type=int,
+    nargs='+',
+    default=[1, 2, 4, 8],
+    help='Batch sizes to measure (default: 1 2 4 8)',
+)
+parser.add_argument(
+    '--frames', type=int, default=32, help='Frames per timing run (default: 32)'
+)
+parser.add_argument(
+    '--threads', type=int, default=4, help='Threads used by OpenCV (default: 4)'
+)
+parser.add_argument(
+    '--resolution',
+    type=int,
+    nargs=2,
+    default=[640, 480],
+    help='Resolution of the JPEG frames (default: 640 480)',
+)
+args = parser.parse_args()
+
+# The noise frames hold no animals, so the cheap pass alone settles each of them.
+# With an empty band every frame is uncertain, giving the cascade's worst case.
+cascades = {
+    'Off': AnimalFilterSettings(),
+    'On': AnimalFilterSettings(cascade=True),
+    'Worst': AnimalFilterSettings(
+        cascade=True, cascade_reject_below=0.0, cascade_accept_above=2.0
+    ),
+}
+
+cv2.setNumThreads(args.threads)
+images = random_jpegs(args.resolution, args.frames)
+
+# Time per frame spent in each stage of the animal filter is given in ms
+print(
+    ('{:>8}  {:>10}  {:>8}' + '  {:>8}' * len(STAGES)).format(
+        'Cascade', 'Batch size', 'FPS', *STAGES
+    )
+)
+for cascade, settings in cascades.items():
+    animal_filter = AnimalFilter(settings)
+    animal_filter.load()  # Exclude loading and warming up from timings
+    for batch_size in args.batch_sizes:
+        animal_filter.timings = dict.fromkeys(STAGES, 0.0)
+        t_start = time()
+        for start in range(0, len(images), batch_size):
+            batch = images[start : start + batch_size]
+            if batch_size == 1:
+                animal_filter.run_raw(batch[0])
+            else:
+                animal_filter.run_raw_batch(batch)
+        fps = len(images) / (time() - t_start)
+        stage_ms = [
+            animal_filter.timings[stage] / len(images) * 1000 for stage in STAGES
+        ]
+        print(
+            ('{:>8}  {:>10}  {:>8.2f}' + '  {:>8.1f}' * len(STAGES)).format(
+                cascade, batch_size, fps, *stage_ms
+            )
+        )
@@ -0,0 +1,109 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from argparse import ArgumentParser
+from sys import path
+from timeit import repeat
+import numpy as np
+
+path.append('./')
+from DynAIkonTrap.filtering.motion import MotionFilter
+from DynAIkonTrap.settings import MotionFilterSettings
+
+MOTION_DTYPE = [('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+
+# Motion vector grids (rows x cols) produced by the camera at these resolutions
+GRIDS = {
+    '640x480': (30, 41),
+    '1920x1080': (68, 121),
+}
+
+
+def legacy_sotv(motion_frame, threshold_small):
+    """The SoTV as previously computed, for comparison"""
+    magnitudes = np.sqrt(
+        np.square(motion_frame['x'].astype(float))
+        + np.square(motion_frame['y'].astype(float))
+    )
+    filtered = np.where(
+        magnitudes > threshold_small,
+        motion_frame,
+        np.array((0, 0, 0), dtype=MOTION_DTYPE),
+    )
+    x_sum = sum(sum(filtered['x'].astype(int)))
+    y_sum = sum(sum(filtered['y'].astype(int)))
+    return x_sum, y_sum
+
+
+def random_frames(grid, n):
+    rng = np.random.default_rng(0)
+    frames = np.zeros((n,) + grid, dtype=MOTION_DTYPE)
+    frames['x'] = rng.integers(-20, 21, frames.shape)
+    frames['y'] = rng.integers(-20, 21, frames.shape)
+    return frames
+
+
+def per_frame_us(function, frames, repeats):
+    def run():
+        for frame in frames:
+            function(frame)
+
+    return min(repeat(run, number=1, repeat=repeats)) / len(frames) * 1e6
+
+
+parser = ArgumentParser(
+    description='Measure the per-frame cost of the motion filter for typical motion vector grids'
+)
+parser.add_argument(
+    '--frames', type=int, default=200, help='Frames per timing run (default: 200)'
+)
+parser.add_argument(
+    '--repeats',
+    type=int,
+    default=5,
+    help='Timing runs; the fastest is reported (default: 5)',
+)
+args = parser.parse_args()
+
+settings = MotionFilterSettings()
+print(
+    '{:>10}  {:>10}  {:>10}  {:>8}  {:>10}'.format(
+        'Resolution', 'Legacy/us', 'run_raw/us', 'Speedup', 'batch/us'
+    )
+)
+for name, grid in GRIDS.items():
+    frames = random_frames(grid, args.frames)
+    motion_filter = MotionFilter(settings, 20)
+
+    legacy = per_frame_us(
+        lambda f: legacy_sotv(f, settings.small_threshold), frames, args.repeats
+    )
+    current = per_frame_us(motion_filter.run_raw, frames, args.repeats)
+    batch = (
+        min(
+            repeat(
+                lambda: motion_filter.run_raw_batch(frames),
+                number=1,
+                repeat=args.repeats,
+            )
+        )
+        / len(frames)
+        * 1e6
+    )
+    print(
+        '{:>10}  {:>10.1f}  {:>10.1f}  {:>7.1f}x  {:>10.1f}'.format(
+            name, legacy, current, legacy / current, batch
+        )
+    )
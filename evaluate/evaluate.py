@@ -15,36 +15,34 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import argparse
 from logging import getLogger
-from multiprocessing import Queue
 from queue import Empty
 from time import sleep, time
 import sys
 from pickle import load
 
 sys.path.append('./')
-from DynAIkonTrap.camera import Frame
+from DynAIkonTrap.replay import ReplayCamera, ReplayMode
+from DynAIkonTrap.settings import DetectorBackend, DetectorPrecision, load_settings
 
-
-class MockCamera:
-    def __init__(self, settings, data):
-        self.framerate = settings.framerate
-        self._data = data
-        self._queue = Queue()
-
-        for i, d in enumerate(self._data):
-            self._queue.put(Frame(d['image'], d['motion'], i))
-
-    def get(self):
-        return self._queue.get_nowait()
+ALPHAS = [
+    ('alpha = 0 (TPR)', 0),
+    ('alpha = 0,1', 0.1),
+    ('alpha = 0,5', 0.5),
+    ('alpha = 0,9', 0.9),
+    ('alpha = 1 (TNR)', 1),
+]
 
 
 class Tester:
-    def __init__(self, data, truth):
+    def __init__(self, data_filename, truth, mode=ReplayMode.FAST, settings=None):
         self.tpr = None
         self.tnr = None
         self.precision = None
-        self._data = data
+        self.fps = None
+        self._data_filename = data_filename
         self._truth = truth
+        self._mode = mode
+        self._settings = settings
 
     def test(self):
 
@@ -52,7 +50,6 @@ class Tester:
         from signal import signal, SIGINT
 
         from DynAIkonTrap.filtering import Filter
-        from DynAIkonTrap.settings import load_settings
 
         # Make Ctrl-C quit gracefully
         def handler(signal_num, stack_frame):
@@ -60,13 +57,10 @@ class Tester:
 
         signal(SIGINT, handler)
 
-        settings = load_settings()
+        settings = self._settings if self._settings is not None else load_settings()
         getLogger().setLevel('ERROR')
-        
-        settings.camera.framerate = self._data['framerate']
-        settings.camera.resolution = self._data['resolution']
 
-        camera = MockCamera(settings.camera, self._data['frames'])
+        camera = ReplayCamera(self._data_filename, self._mode, settings.camera)
 
         t_start = time()
         filters = Filter(read_from=camera, settings=settings.filter)
@@ -74,9 +68,14 @@ class Tester:
         ## Wait until processing is complete
         while True:
             sleep(0.1)
-            if filters._motion_queue.is_idle() and camera._queue.qsize() == 0:
+            if (
+                filters._motion_queue.is_idle()
+                and camera.finished()
+                and camera.empty()
+            ):
                 break
         t_stop = time() - 0.1
+        camera.close()
 
         ## Retrieve the detected animal frames
         frames = []
@@ -111,14 +110,14 @@ class Tester:
 
         print(
             '{} of {} frames deemed to contain an animal'.format(
-                sum(results), len(self._data['frames'])
-            )
-        )
-        print(
-            'Processed @ (average) {:.2f}FPS'.format(
-                len(self._data['frames']) / (t_stop - t_start)
+                sum(results), camera.frames_read
             )
         )
+        self.fps = camera.frames_read / (t_stop - t_start)
+        print('Processed @ (average) {:.2f}FPS'.format(self.fps))
+        dropped = sum(camera.dropped_frames().values())
+        if dropped > 0:
+            print('{} frames dropped by the camera queue'.format(dropped))
 
     def score(self, alpha: float) -> float:
         """Weighted harmonic mean of true-negative rate (TNR)
@@ -159,6 +158,28 @@ class Tester:
         return 1 / (tnr_part + tpr_part)
 
 
+def pin_backend(settings):
+    """Settle on the detector backend the settings choose and fix the settings to it, so every inference worker runs the same backend and model. A quantised model is never run by the OpenCV backend, which would quietly run the float model instead; the script exits if no other backend can load it."""
+    from DynAIkonTrap.filtering.backends import choose_backend, model_file
+
+    animal_settings = settings.filter.animal
+    int8 = animal_settings.precision == DetectorPrecision.INT8
+    if int8 and animal_settings.backend == DetectorBackend.OPENCV:
+        animal_settings.backend = DetectorBackend.AUTO
+
+    backend = choose_backend(animal_settings)
+    if int8 and backend == DetectorBackend.OPENCV:
+        sys.exit(
+            'No detector backend could load the INT8 model; check that onnxruntime or tflite_runtime is installed and the INT8 model files exist'
+        )
+    animal_settings.backend = backend
+    print(
+        'Using the {} backend with {}'.format(
+            backend.name, model_file(backend, animal_settings)
+        )
+    )
+
+
 def load_pickle(filename):
     with open(filename, 'rb') as f:
         data = load(f)
@@ -177,17 +198,60 @@ if __name__ == '__main__':
         metavar='TRUTH_FILENAME',
         help='Name of input file with the user-generated truth e.g. `data.truth.pk`',
     )
+    parser.add_argument(
+        '--realtime',
+        action='store_true',
+        help='Replay the recording at its recorded framerate, dropping frames the pipeline cannot keep up with, instead of as fast as possible',
+    )
+    parser.add_argument(
+        '--compare-precision',
+        action='store_true',
+        help='Evaluate both the float and the quantised (INT8) animal detector models and report the difference. The INT8 model is run by the ONNX Runtime or TensorFlow Lite backend; the script exits if neither can load it',
+    )
     args = parser.parse_args()
 
-    tester = Tester(load_pickle(args.data), load_pickle(args.truth))
-
-    tester.test()
+    mode = ReplayMode.REALTIME if args.realtime else ReplayMode.FAST
+    truth = load_pickle(args.truth)
+
+    if not args.compare_precision:
+        tester = Tester(args.data, truth, mode)
+        tester.test()
+
+        print('| Metric            | Score / % |')
+        print('|-------------------|-----------|')
+        for name, alpha in ALPHAS:
+            print('| {:<17} | {: 9.2f} |'.format(name, tester.score(alpha) * 100))
+        print('| Precision         | {: 9.2f} |'.format(tester.precision * 100))
+
+    else:
+        testers = []
+        for precision in (DetectorPrecision.FLOAT32, DetectorPrecision.INT8):
+            settings = load_settings()
+            settings.filter.animal.precision = precision
+            print('{} model:'.format(precision.name))
+            pin_backend(settings)
+            testers.append(Tester(args.data, truth, mode, settings))
+            testers[-1].test()
+        float_tester, int8_tester = testers
+
+        def row(name, float_value, int8_value):
+            print(
+                '| {:<17} | {: 9.2f} | {: 9.2f} | {:+9.2f} |'.format(
+                    name, float_value, int8_value, int8_value - float_value
+                )
+            )
 
-    print('| Metric            | Score / % |')
-    print('|-------------------|-----------|')
-    print('| alpha = 0 (TPR)   | {: 9.2f} |'.format(tester.score(0) * 100))
-    print('| alpha = 0,1       | {: 9.2f} |'.format(tester.score(0.1) * 100))
-    print('| alpha = 0,5       | {: 9.2f} |'.format(tester.score(0.5) * 100))
-    print('| alpha = 0,9       | {: 9.2f} |'.format(tester.score(0.9) * 100))
-    print('| alpha = 1 (TNR)   | {: 9.2f} |'.format(tester.score(1) * 100))
-    print('| Precision         | {: 9.2f} |'.format(tester.precision * 100))
+        print('| Metric            | FLOAT32 % |    INT8 % |   Delta   |')
+        print('|-------------------|-----------|-----------|-----------|')
+        for name, alpha in ALPHAS:
+            row(
+                name,
+                float_tester.score(alpha) * 100,
+                int8_tester.score(alpha) * 100,
+            )
+        row(
+            'Precision',
+            float_tester.precision * 100,
+            int8_tester.precision * 100,
+        )
+        row('Throughput / FPS', float_tester.fps, int8_tester.fps)
@@ -14,12 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from queue import Empty
-from typing import List
-from pickle import dump
 from sys import path
 
 path.append('./')
-from DynAIkonTrap.camera import Camera, Frame
+from DynAIkonTrap.camera import Camera
+from DynAIkonTrap.replay import RecordingWriter
 from DynAIkonTrap.settings import load_settings
 
 
@@ -28,37 +27,27 @@ print('You can halt execution with <Ctrl>+C anytime\n')
 
 settings = load_settings()
 camera = Camera(settings.camera)
+recording = RecordingWriter(
+    'data.pk', settings.camera.framerate, settings.camera.resolution
+)
 print('Recording started')
 
+
 ## Record the data
+# Frames are streamed to disk as they arrive; the camera's queue is bounded and
+# would start dropping frames if they were left in it
 try:
     while True:
-        pass
+        try:
+            frame = camera.get()
+        except Empty:
+            continue
+        recording.write(frame)
+        frame.release()
 except KeyboardInterrupt:
-    print('Stopping recording and saving data')
-    camera.close()
-
-
-## Convert the recorded frames to dictionary fromat
-frames: List[Frame] = []
-try:
-    while True:
-        frames.append(camera._output.get_nowait())
-except Empty:
-    pass
-
-frames = list(map(lambda f: {'image': f.image, 'motion': f.motion}, frames))
-
+    print('Stopping recording')
 
-## Save the results to disk
-with open('data.pk', 'wb') as f:
-    dump(
-        {
-            'frames': frames,
-            'framerate': settings.camera.framerate,
-            'resolution': settings.camera.resolution,
-        },
-        f,
-    )
+camera.close()
+recording.close()
 
-print('The data has been pickled and saved to `data.pk`')
+print('{} frames saved to `data.pk`'.format(recording.frames_written))
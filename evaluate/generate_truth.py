@@ -14,11 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from argparse import ArgumentParser
-from pickle import load, dump
-from typing import List
+from pickle import dump
+from sys import path
 import numpy as np
 import cv2
 
+path.append('./')
+from DynAIkonTrap.replay import read_recording
+
 
 def generate_truth(frames, i=0):
     global truth
@@ -73,10 +76,8 @@ parser.add_argument(
 args = parser.parse_args()
 
 
-with open(args.filename, 'rb') as f:
-    data = load(f)
-
-frames = data['frames']
+_, frames = read_recording(args.filename)
+frames = list(frames)
 truth = [False for i in frames]
 
 generate_truth(frames)
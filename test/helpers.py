@@ -0,0 +1,57 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from time import sleep
+from unittest.mock import patch
+import numpy as np
+
+from DynAIkonTrap.filtering.animal import AnimalFilter
+from DynAIkonTrap.filtering.backends import Backend
+from DynAIkonTrap.settings import AnimalFilterSettings
+
+
+class StubBackend(Backend):
+    """Stands in for the detector network, recording each blob it is given. Every image gets one detection, in the middle half of the image, with the confidence given by `confidence`."""
+
+    def __init__(
+        self,
+        name='Stub',
+        confidence=lambda blob: 0.0,
+        input_size=None,
+        max_batch=None,
+        delay=0.0,
+    ):
+        super().__init__(input_size=input_size, max_batch=max_batch)
+        self.name = name
+        self.confidence = confidence
+        self.delay = delay
+        self.blobs = []
+
+    def _forward(self, blob):
+        sleep(self.delay)
+        self.blobs.append(blob.copy())
+        detections = np.zeros((len(blob), 1, 6), dtype=np.float32)
+        detections[:, 0, :5] = [0.5, 0.5, 0.5, 0.5, 1]
+        detections[:, 0, 5] = self.confidence(blob)
+        return [detections]
+
+
+def loaded_filter(backend, settings=None):
+    """An `AnimalFilter` running the given backend, already loaded and with the blobs from warming up forgotten"""
+    with patch('DynAIkonTrap.filtering.animal.create_backend', lambda _: backend):
+        animal_filter = AnimalFilter(settings or AnimalFilterSettings())
+        animal_filter.load()
+    backend.blobs.clear()
+    return animal_filter
@@ -14,11 +14,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from unittest import TestCase
+from unittest.mock import patch
 import cv2
 import numpy as np
 
-from DynAIkonTrap.filtering.animal import AnimalFilter
+from DynAIkonTrap.filtering.animal import (
+    AnimalFilter,
+    InferenceCache,
+    crop_boxes,
+    dhash,
+)
 from DynAIkonTrap.settings import AnimalFilterSettings
+from test.helpers import StubBackend, loaded_filter
 
 
 class NoAnimalTestCase(TestCase):
@@ -35,3 +42,270 @@ class NoAnimalTestCase(TestCase):
 
     def test_no_animal_gives_run_false(self):
         self.assertEqual(self._run, False)
+
+
+class CropBoxesTestCase(TestCase):
+    def test_small_region_gets_small_input(self):
+        crops = crop_boxes([(0.5, 0.5, 0.55, 0.55)], (1080, 1920, 3), 0.25, 2, 160)
+        self.assertEqual(len(crops), 1)
+        x0, y0, x1, y1, input_size = crops[0]
+        self.assertEqual((x1 - x0, y1 - y0), (160, 160))
+        self.assertEqual(input_size, 160)
+        self.assertLessEqual(x0, 0.5 * 1920)
+        self.assertGreaterEqual(x1, 0.55 * 1920)
+
+    def test_input_size_capped(self):
+        crops = crop_boxes([(0.1, 0.1, 0.4, 0.6)], (1080, 1920, 3), 0.0, 2, 160)
+        x0, y0, x1, y1, input_size = crops[0]
+        self.assertEqual(y1 - y0, 576)
+        self.assertEqual(input_size, 416)
+
+    def test_input_size_doubled_to_fit(self):
+        crops = crop_boxes([(0.5, 0.5, 0.6, 0.6)], (1080, 1920, 3), 0.0, 2, 160)
+        x0, y0, x1, y1, input_size = crops[0]
+        self.assertGreater(x1 - x0, 160)
+        self.assertEqual(input_size, 320)
+
+    def test_crop_kept_inside_image(self):
+        crops = crop_boxes([(0.95, 0.0, 1.0, 0.05)], (480, 640, 3), 0.25, 2, 160)
+        x0, y0, x1, y1, _ = crops[0]
+        self.assertEqual((x1, y0), (640, 0))
+
+    def test_only_largest_regions_used(self):
+        regions = [(0.1, 0.1, 0.2, 0.2), (0.5, 0.5, 0.6, 0.6), (0.8, 0.8, 0.9, 0.9)]
+        self.assertEqual(len(crop_boxes(regions, (1080, 1920, 3), 0.25, 2, 160)), 2)
+
+    def test_large_region_uses_whole_image(self):
+        self.assertEqual(
+            crop_boxes([(0.0, 0.0, 0.9, 0.9)], (480, 640, 3), 0.25, 2, 160), []
+        )
+
+
+def brightness_below_full_size(blob):
+    """The cheap pass gives the image's brightness as its confidence"""
+    if blob.shape[-1] < 416:
+        return blob.mean(axis=(1, 2, 3))
+    return 0.9
+
+
+def input_sizes(backend):
+    return [blob.shape[-1] for blob in backend.blobs]
+
+
+class CascadeTestCase(TestCase):
+    def animal_filter(self, backend):
+        settings = AnimalFilterSettings(
+            cascade=True,
+            cascade_input_size=224,
+            cascade_reject_below=0.1,
+            cascade_accept_above=0.6,
+        )
+        return loaded_filter(backend, settings)
+
+    def image(self, brightness):
+        return np.full((416, 416, 3), brightness * 255, dtype=np.uint8)
+
+    def test_confident_passes_settled_cheaply(self):
+        backend = StubBackend(confidence=brightness_below_full_size)
+        animal_filter = self.animal_filter(backend)
+        confidences = animal_filter.run_raw_batch(
+            [None, None], [self.image(0.0), self.image(0.8)]
+        )
+        self.assertEqual(input_sizes(backend), [224])
+        self.assertAlmostEqual(confidences[0], 0.0)
+        self.assertAlmostEqual(confidences[1], 0.8, places=2)
+
+    def test_uncertain_frames_run_at_full_size(self):
+        backend = StubBackend(confidence=brightness_below_full_size)
+        animal_filter = self.animal_filter(backend)
+        confidences = animal_filter.run_raw_batch(
+            [None, None, None],
+            [self.image(0.0), self.image(0.3), self.image(0.4)],
+        )
+        self.assertEqual(input_sizes(backend), [224, 416])
+        self.assertAlmostEqual(confidences[0], 0.0)
+        self.assertAlmostEqual(confidences[1], 0.9)
+        self.assertAlmostEqual(confidences[2], 0.9)
+
+    def test_disabled_for_fixed_input_size(self):
+        backend = StubBackend(confidence=brightness_below_full_size, input_size=416)
+        animal_filter = self.animal_filter(backend)
+        animal_filter.run_raw(None, self.image(0.0))
+        self.assertEqual(input_sizes(backend), [416])
+
+
+class DHashTestCase(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        small = rng.integers(0, 256, (26, 26, 3), dtype=np.uint8)
+        self._image = cv2.resize(small, (416, 416))
+
+    def test_noise_changes_few_bits(self):
+        noise = np.random.default_rng(1).integers(-3, 4, self._image.shape)
+        noisy = np.clip(self._image + noise, 0, 255).astype(np.uint8)
+        self.assertLessEqual(bin(dhash(self._image) ^ dhash(noisy)).count('1'), 4)
+
+    def test_different_images_differ(self):
+        flipped = self._image[:, ::-1].copy()
+        self.assertGreater(bin(dhash(self._image) ^ dhash(flipped)).count('1'), 16)
+
+
+class InferenceCacheTestCase(TestCase):
+    def setUp(self):
+        self._empty = (0.1, (0.0, 0.0, 0.2, 0.2))
+        self._animal = (0.9, (0.4, 0.3, 0.7, 0.8))
+        self._cache = InferenceCache(size=2, max_distance=2)
+        self._cache.put(0b0000, self._empty)
+        self._cache.put(0b1111, self._animal)
+
+    def test_near_hash_hits(self):
+        self.assertEqual(self._cache.get(0b0001), self._empty)
+        self.assertEqual(self._cache.get(0b0111), self._animal)
+        self.assertEqual(self._cache.hit_rate, 1)
+
+    def test_distant_hash_misses(self):
+        self.assertIsNone(self._cache.get(0b11110000))
+        self.assertEqual(self._cache.hit_rate, 0)
+
+    def test_least_recently_used_forgotten(self):
+        self._cache.get(0b0000)
+        self._cache.put(0b11110000, (0.5, (0.1, 0.1, 0.3, 0.3)))
+        self.assertIsNone(self._cache.get(0b1111))
+        self.assertEqual(self._cache.get(0b0000), self._empty)
+
+    def test_time_saved(self):
+        self._cache.record_inference(0.4, 2)
+        self._cache.get(0b0000)
+        self._cache.get(0b1111)
+        self.assertAlmostEqual(self._cache.time_saved_s, 0.4)
+
+
+class CachedAnimalFilterTestCase(TestCase):
+    def setUp(self):
+        self._backend = StubBackend(confidence=brightness_below_full_size)
+        settings = AnimalFilterSettings(cache_size=4, cache_max_distance=4)
+        self._animal_filter = loaded_filter(self._backend, settings)
+
+        rng = np.random.default_rng(0)
+        small = rng.integers(0, 256, (26, 26, 3), dtype=np.uint8)
+        self._image = cv2.resize(small, (416, 416))
+
+    def test_repeated_frame_not_analysed_again(self):
+        first = self._animal_filter.run_raw(None, self._image)
+        second = self._animal_filter.run_raw(None, self._image.copy())
+        self.assertEqual(first, second)
+        self.assertEqual(len(self._backend.blobs), 1)
+        self.assertEqual(self._animal_filter.cache.hit_rate, 0.5)
+
+    def test_new_frame_analysed(self):
+        self._animal_filter.run_raw(None, self._image)
+        self._animal_filter.run_raw(None, self._image[:, ::-1].copy())
+        self.assertEqual(len(self._backend.blobs), 2)
+
+
+class PreprocessingTestCase(TestCase):
+    def setUp(self):
+        self._backend = StubBackend()
+        self._animal_filter = loaded_filter(self._backend)
+
+        rng = np.random.default_rng(0)
+        small = rng.integers(0, 256, (27, 48, 3), dtype=np.uint8)
+        self._image = cv2.resize(small, (1920, 1080))
+        self._jpeg = cv2.imencode('.jpg', self._image)[1].tobytes()
+
+    def test_blob_as_made_by_opencv(self):
+        images = [self._image[:416, :416], self._image[500:916, 1000:1416]]
+        self._animal_filter.run_raw_batch([None, None], images)
+        expected = cv2.dnn.blobFromImages(images, 1 / 255, (416, 416), (0, 0, 0))
+        np.testing.assert_allclose(self._backend.blobs[0], expected, atol=1e-6)
+
+    def test_large_frames_decoded_reduced(self):
+        self._animal_filter.run_raw(self._jpeg)
+        self._animal_filter.run_raw(self._jpeg)
+        self.assertEqual(self._animal_filter._reduction, 2)
+        full, reduced = self._backend.blobs
+        # Decoding at half size barely changes the network's input
+        self.assertLess(np.abs(full - reduced).mean(), 0.01)
+
+    def test_small_frames_decoded_whole(self):
+        jpeg = cv2.imencode('.jpg', cv2.resize(self._image, (640, 480)))[1].tobytes()
+        self._animal_filter.run_raw(jpeg)
+        self.assertEqual(self._animal_filter._reduction, 1)
+
+    def test_stages_timed(self):
+        self._animal_filter.run_raw(self._jpeg)
+        for stage, seconds in self._animal_filter.timings.items():
+            self.assertGreater(seconds, 0, stage)
+
+
+class CropToMotionTestCase(TestCase):
+    def setUp(self):
+        self._backend = StubBackend(confidence=lambda blob: 0.8)
+        settings = AnimalFilterSettings(
+            crop_to_motion=True, crop_margin=0.25, max_crops=2, min_input_size=160
+        )
+        self._animal_filter = loaded_filter(self._backend, settings)
+
+        # White where the crop around the small region below falls
+        image = np.zeros((1080, 1920, 3), dtype=np.uint8)
+        image[487:647, 928:1088] = 255
+        self._jpeg = cv2.imencode('.jpg', image)[1].tobytes()
+
+    def shapes(self):
+        return [blob.shape for blob in self._backend.blobs]
+
+    def test_crops_analysed_at_fitting_input_sizes(self):
+        regions = [(0.1, 0.1, 0.25, 0.3), (0.5, 0.5, 0.55, 0.55)]
+        self._animal_filter.detect(self._jpeg, regions=regions)
+        # 432 pixels square, capped at the full input size, then 160 pixels
+        self.assertEqual(self.shapes(), [(1, 3, 416, 416), (1, 3, 160, 160)])
+
+    def test_crop_taken_around_region(self):
+        self._animal_filter.detect(self._jpeg, regions=[(0.5, 0.5, 0.55, 0.55)])
+        self.assertGreater(self._backend.blobs[0].mean(), 0.95)
+
+    def test_box_mapped_back_to_frame(self):
+        confidence, box = self._animal_filter.detect(
+            self._jpeg, regions=[(0.5, 0.5, 0.55, 0.55)]
+        )
+        self.assertAlmostEqual(confidence, 0.8)
+        # The 160 pixel crop spans x 928-1088 and y 487-647
+        np.testing.assert_allclose(
+            box, (968 / 1920, 527 / 1080, 1048 / 1920, 607 / 1080)
+        )
+
+    def test_whole_frame_without_regions(self):
+        confidence, box = self._animal_filter.detect(self._jpeg, regions=[])
+        self.assertEqual(self.shapes(), [(1, 3, 416, 416)])
+        self.assertAlmostEqual(confidence, 0.8)
+        np.testing.assert_allclose(box, (0.25, 0.25, 0.75, 0.75))
+
+    def test_whole_frame_for_large_regions(self):
+        self._animal_filter.detect(self._jpeg, regions=[(0.0, 0.0, 0.9, 0.9)])
+        self.assertEqual(self.shapes(), [(1, 3, 416, 416)])
+
+
+class DetectorImageTestCase(TestCase):
+    def setUp(self):
+        self._backend = StubBackend()
+        self._animal_filter = loaded_filter(self._backend)
+
+        rng = np.random.default_rng(0)
+        self._image = rng.integers(0, 256, (416, 416, 3), dtype=np.uint8)
+        self._jpeg = cv2.imencode('.jpg', self._image)[1].tobytes()
+
+    def test_jpeg_not_decoded(self):
+        with patch('cv2.imdecode', wraps=cv2.imdecode) as imdecode:
+            self._animal_filter.run_raw(self._jpeg, self._image)
+        imdecode.assert_not_called()
+
+    def test_passed_to_backend_unchanged(self):
+        self._animal_filter.run_raw(self._jpeg, self._image)
+        expected = self._image.transpose(2, 0, 1)[np.newaxis] / 255
+        np.testing.assert_allclose(self._backend.blobs[0], expected, atol=1e-6)
+
+    def test_jpeg_decoded_without_detector_image(self):
+        with patch('cv2.imdecode', wraps=cv2.imdecode) as imdecode:
+            self._animal_filter.run_raw(self._jpeg)
+        imdecode.assert_called_once()
+        self.assertEqual(self._backend.blobs[0].shape, (1, 3, 416, 416))
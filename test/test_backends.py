@@ -0,0 +1,197 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from unittest.mock import patch
+import numpy as np
+
+from DynAIkonTrap.filtering.backends import (
+    Backend,
+    OpenCVBackend,
+    TFLiteBackend,
+    choose_backend,
+    select_fastest,
+)
+from DynAIkonTrap.settings import AnimalFilterSettings, DetectorBackend
+from test.helpers import StubBackend
+
+
+def fake_backend(name, delay, max_batch=None):
+    # Each image's mean is given as its confidence
+    return StubBackend(
+        name,
+        lambda blob: blob.mean(axis=(1, 2, 3)),
+        input_size=32,
+        max_batch=max_batch,
+        delay=delay,
+    )
+
+
+class BatchSplittingTestCase(TestCase):
+    def setUp(self):
+        self._blob = np.arange(5, dtype=np.float32).reshape(5, 1, 1, 1)
+
+    def test_split_to_fixed_batch(self):
+        backend = fake_backend('fixed', 0, max_batch=2)
+        output = backend.forward(self._blob)
+        self.assertEqual([len(blob) for blob in backend.blobs], [2, 2, 1])
+        self.assertEqual(output[0][:, 0, 5].tolist(), [0, 1, 2, 3, 4])
+
+    def test_not_split_without_limit(self):
+        backend = fake_backend('dynamic', 0)
+        backend.forward(self._blob)
+        self.assertEqual([len(blob) for blob in backend.blobs], [5])
+
+
+class SelectFastestTestCase(TestCase):
+    def test_fastest_chosen(self):
+        backends = [
+            fake_backend('slow', 0.02),
+            fake_backend('fast', 0.001),
+            fake_backend('slower', 0.04),
+        ]
+        self.assertEqual(select_fastest(backends, 2).name, 'fast')
+
+    def test_each_backend_warmed_up_and_timed(self):
+        backend = fake_backend('only', 0)
+        select_fastest([backend], 3)
+        self.assertEqual(len(backend.blobs), 4)
+
+
+class ChooseBackendTestCase(TestCase):
+    delays = {
+        DetectorBackend.OPENCV: 0.02,
+        DetectorBackend.ONNX: 0.01,
+        DetectorBackend.TFLITE: 0.001,
+    }
+
+    def setUp(self):
+        self._loaded = []
+
+    def load(self, backend, settings):
+        self._loaded.append(backend)
+        fake = fake_backend(backend.name, self.delays[backend])
+        fake.kind = backend
+        return fake
+
+    def test_fastest_chosen_in_another_process(self):
+        settings = AnimalFilterSettings(backend=DetectorBackend.AUTO)
+        with patch('DynAIkonTrap.filtering.backends._load', self.load):
+            self.assertEqual(choose_backend(settings), DetectorBackend.TFLITE)
+        self.assertEqual(self._loaded, [])
+
+    def test_chosen_backend_not_loaded(self):
+        settings = AnimalFilterSettings(backend=DetectorBackend.OPENCV)
+        with patch('DynAIkonTrap.filtering.backends._load', self.load):
+            self.assertEqual(choose_backend(settings), DetectorBackend.OPENCV)
+        self.assertEqual(self._loaded, [])
+
+    def test_missing_model_replaced_with_opencv(self):
+        settings = AnimalFilterSettings(
+            backend=DetectorBackend.TFLITE, tflite_model='missing.tflite'
+        )
+        self.assertEqual(choose_backend(settings), DetectorBackend.OPENCV)
+
+
+class FakeInterpreter:
+    """Stands in for a fully integer TensorFlow Lite model passing its input straight through"""
+
+    def __init__(self):
+        self.tensor = None
+
+    def set_tensor(self, index, tensor):
+        self.tensor = tensor
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        return self.tensor
+
+
+class FakeNet:
+    """Stands in for an OpenCV network giving one detection per image, recording the input sizes it is set up for"""
+
+    def __init__(self):
+        self.input_sizes = []
+
+    def getLayerNames(self):
+        return ['yolo']
+
+    def getUnconnectedOutLayers(self):
+        return [1]
+
+    def setInput(self, blob):
+        if blob.shape[2:] not in self.input_sizes:
+            self.input_sizes.append(blob.shape[2:])
+        self.blob = blob
+
+    def forward(self, layers):
+        return [np.zeros((len(self.blob), 6), dtype=np.float32)]
+
+
+class OpenCVNetworkPerSizeTestCase(TestCase):
+    def setUp(self):
+        self.nets = []
+
+        def read_net(weights, config):
+            self.nets.append(FakeNet())
+            return self.nets[-1]
+
+        with patch('DynAIkonTrap.filtering.backends.cv2.dnn.readNet', read_net):
+            backend = OpenCVBackend('weights', 'config')
+            for size in (160, 416, 160, 416):
+                backend.forward(np.zeros((1, 3, size, size), dtype=np.float32))
+
+    def test_network_per_input_size(self):
+        self.assertEqual(len(self.nets), 2)
+
+    def test_each_network_kept_to_one_size(self):
+        self.assertEqual(
+            [net.input_sizes for net in self.nets], [[(160, 160)], [(416, 416)]]
+        )
+
+
+class QuantisedTFLiteTestCase(TestCase):
+    def setUp(self):
+        self._backend = TFLiteBackend.__new__(TFLiteBackend)
+        Backend.__init__(self._backend, input_size=2, max_batch=1)
+        self._backend._interpreter = FakeInterpreter()
+        self._backend._input = {
+            'index': 0,
+            'dtype': np.int8,
+            'quantization': (1 / 255, -128),
+        }
+        self._backend._outputs = [
+            {
+                'index': 0,
+                'dtype': np.int8,
+                'quantization': (1 / 255, -128),
+                'shape': np.array([1, 2, 2, 3]),
+            }
+        ]
+
+    def test_input_quantised(self):
+        blob = np.array([0, 0.2, 1], dtype=np.float32).reshape(1, 3, 1, 1)
+        self._backend.forward(blob)
+        tensor = self._backend._interpreter.tensor
+        self.assertEqual(tensor.dtype, np.int8)
+        self.assertEqual(tensor.flatten().tolist(), [-128, -77, 127])
+
+    def test_output_dequantised(self):
+        blob = np.array([0, 0.2, 1], dtype=np.float32).reshape(1, 3, 1, 1)
+        output = self._backend.forward(blob)
+        self.assertEqual(output[0].dtype, np.float32)
+        np.testing.assert_allclose(output[0].flatten(), [0, 0.2, 1], atol=1e-6)
@@ -0,0 +1,325 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from time import sleep, time
+import numpy as np
+
+from DynAIkonTrap.camera import (
+    Frame,
+    FrameQueue,
+    Synchroniser,
+    _available_memory,
+    logger,
+)
+from DynAIkonTrap.ring_buffer import SharedRingBuffer
+from DynAIkonTrap.settings import DropPolicy
+
+
+def fill(queue, timestamps):
+    for t in timestamps:
+        queue.put(Frame(None, None, t))
+        sleep(0.01)  # Let the queue's feeder thread catch up
+
+
+def drain(queue):
+    timestamps = []
+    while not queue.empty():
+        timestamps.append(queue.get(1).timestamp)
+    return timestamps
+
+
+class DropOldestTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(3, DropPolicy.DROP_OLDEST)
+        fill(self._queue, range(5))
+
+    def test_newest_frames_kept(self):
+        self.assertEqual(drain(self._queue), [2, 3, 4])
+
+    def test_drops_counted(self):
+        self.assertEqual(self._queue.dropped()[DropPolicy.DROP_OLDEST], 2)
+        self.assertEqual(self._queue.dropped()[DropPolicy.DROP_NEWEST], 0)
+
+
+class DropNewestTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(3, DropPolicy.DROP_NEWEST)
+        fill(self._queue, range(5))
+
+    def test_oldest_frames_kept(self):
+        self.assertEqual(drain(self._queue), [0, 1, 2])
+
+    def test_drops_counted(self):
+        self.assertEqual(self._queue.dropped()[DropPolicy.DROP_NEWEST], 2)
+        self.assertEqual(self._queue.dropped()[DropPolicy.DROP_OLDEST], 0)
+
+
+class DecimateTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(4, DropPolicy.DECIMATE, decimation_factor=2)
+        fill(self._queue, range(4))  # Fills the queue
+
+    def test_every_nth_frame_kept_while_draining(self):
+        fill(self._queue, [4])  # Decimated
+        self._queue.get(1)
+        fill(self._queue, [5, 6])  # 6 is decimated
+        self._queue.get(1)
+        fill(self._queue, [7])
+        self.assertEqual(drain(self._queue), [2, 3, 5, 7])
+        self.assertEqual(self._queue.dropped()[DropPolicy.DECIMATE], 2)
+
+    def test_full_stream_resumes_after_draining(self):
+        fill(self._queue, [4])  # Decimated
+        self._queue.get(1)
+        self._queue.get(1)
+        self._queue.get(1)
+        fill(self._queue, [5, 6])
+        self.assertEqual(drain(self._queue), [3, 5, 6])
+
+
+class NoDropsTestCase(TestCase):
+    def test_no_drops_below_limit(self):
+        queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        fill(queue, range(5))
+        self.assertEqual(drain(queue), [0, 1, 2, 3, 4])
+        self.assertEqual(sum(queue.dropped().values()), 0)
+
+
+class SynchroniserReusesImageTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._image = b'\xff\xd8' + bytes(range(100))
+
+        self._sync = Synchroniser(self._queue)
+        self._sync.tick_image_frame(self._image)
+        self._sync.tick_movement_frame(np.zeros(1))
+        self._sync.tick_movement_frame(np.zeros(1))
+        self._frames = [self._queue.get(1), self._queue.get(1)]
+
+    def test_image_not_copied(self):
+        self.assertIs(self._sync._last_image.base, self._image)
+
+    def test_image_is_read_only(self):
+        self.assertFalse(self._sync._last_image.flags.writeable)
+
+    def test_frames_carry_image(self):
+        for frame in self._frames:
+            self.assertEqual(frame.image.tobytes(), self._image)
+
+
+class SynchroniserSharedImageTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._buffer = SharedRingBuffer(slots=4, slot_size=128)
+        self._sync = Synchroniser(self._queue, image_buffer=self._buffer)
+
+        self._sync.tick_image_frame(b'\xff\xd8' + bytes(10))
+        self._sync.tick_movement_frame(np.zeros(1))
+        self._sync.tick_movement_frame(np.zeros(1))
+        self._frames = [self._queue.get(1), self._queue.get(1)]
+
+    def test_image_written_once(self):
+        self.assertEqual(self._buffer.in_use(), 1)
+        self.assertEqual(self._frames[0].image.handle, self._frames[1].image.handle)
+
+    def test_slot_freed_once_frames_and_synchroniser_release(self):
+        self._sync.tick_image_frame(b'\xff\xd8' + bytes(20))
+        self.assertEqual(self._buffer.in_use(), 2)
+        for frame in self._frames:
+            frame.release()
+        self.assertEqual(self._buffer.in_use(), 1)
+
+    def tearDown(self):
+        self._sync.close()
+        self._buffer.close()
+
+
+class SynchroniserFullBufferTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._buffer = SharedRingBuffer(slots=1, slot_size=128)
+        self._sync = Synchroniser(self._queue, image_buffer=self._buffer)
+
+    def test_fallback_logged_once(self):
+        with self.assertLogs(logger, 'WARNING') as logs:
+            for i in range(4):
+                self._sync.tick_image_frame(b'\xff\xd8' + bytes([i]))
+                self._sync.tick_movement_frame(np.zeros(1))
+        frames = [self._queue.get(1) for _ in range(4)]
+        self.assertEqual([f.image[-1] for f in frames], [0, 1, 2, 3])
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('1 slots', logs.output[0])
+
+    def test_recovery_logged(self):
+        self._sync.tick_image_frame(b'\xff\xd8' + bytes([0]))
+        self._sync.tick_image_frame(b'\xff\xd8' + bytes([1]))
+        self._sync.tick_movement_frame(np.zeros(1))
+        self._queue.get(1).release()
+        with self.assertLogs(logger, 'INFO') as logs:
+            self._sync.tick_image_frame(b'\xff\xd8' + bytes([2]))
+        self.assertIn('after passing 1 arrays by value', logs.output[-1])
+
+    def tearDown(self):
+        self._sync.close()
+        self._buffer.close()
+
+
+class AvailableMemoryTestCase(TestCase):
+    def test_available_memory_read(self):
+        self.assertGreater(_available_memory(), 0)
+
+
+def image(i):
+    return b'\xff\xd8' + bytes([i])
+
+
+def drain_frames(queue):
+    frames = []
+    while not queue.empty():
+        frames.append(queue.get(1))
+    return frames
+
+
+class SynchroniserPairsByTimestampTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._sync = Synchroniser(self._queue, framerate=20)
+
+        # Period is 50000us; the image stream lags the motion stream
+        self._sync.tick_image_frame(image(0), 0)
+        self._sync.tick_movement_frame(np.full(1, 0), 0)
+        self._sync.tick_movement_frame(np.full(1, 1), 50000)
+        self._sync.tick_movement_frame(np.full(1, 2), 100000)
+        self._sync.tick_image_frame(image(1), 50010)
+        self._sync.tick_image_frame(image(2), 99990)
+        sleep(0.05)
+        self._frames = drain_frames(self._queue)
+
+    def test_all_frames_emitted_in_order(self):
+        self.assertEqual([f.motion[0] for f in self._frames], [0, 1, 2])
+
+    def test_images_match_motion(self):
+        for frame in self._frames:
+            self.assertEqual(frame.image[-1], frame.motion[0])
+
+    def test_timestamps_from_capture_time(self):
+        self.assertEqual([f.timestamp for f in self._frames], [0, 0.05, 0.1])
+
+    def test_no_unmatched_frames(self):
+        self.assertEqual(self._sync.unmatched_frames, 0)
+
+
+class SynchroniserClockTestCase(TestCase):
+    def _timestamps(self, clock):
+        queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        sync = Synchroniser(queue, framerate=20, clock=clock)
+        sync.tick_image_frame(image(0), 0)
+        sync.tick_movement_frame(np.full(1, 0), 0)
+        sync.tick_image_frame(image(1), 50000)
+        sync.tick_movement_frame(np.full(1, 1), 50000)
+        now = time()
+        sleep(0.05)
+        return [f.timestamp - now for f in drain_frames(queue)]
+
+    def test_same_origin(self):
+        # The latest image was captured 30ms before it was read
+        timestamps = self._timestamps(lambda: 80000)
+        self.assertAlmostEqual(timestamps[0], -0.08, delta=0.01)
+        self.assertAlmostEqual(timestamps[1], -0.03, delta=0.01)
+
+    def test_different_origin(self):
+        # Camera clock counting from boot, PTS from the start of recording;
+        # each image is taken to have been captured as it arrived
+        for timestamp in self._timestamps(lambda: 1e12):
+            self.assertAlmostEqual(timestamp, 0, delta=0.01)
+
+
+class SynchroniserMissingImageTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._sync = Synchroniser(self._queue, framerate=20, reorder_depth=2)
+
+        self._sync.tick_image_frame(image(0), 0)
+        self._sync.tick_movement_frame(np.full(1, 0), 0)
+        # The image for the next frame never arrives
+        self._sync.tick_movement_frame(np.full(1, 1), 50000)
+        self._sync.tick_movement_frame(np.full(1, 2), 100000)
+        self._sync.tick_movement_frame(np.full(1, 3), 150000)
+        sleep(0.05)
+        self._frames = drain_frames(self._queue)
+
+    def test_waits_no_longer_than_reorder_depth(self):
+        self.assertEqual([f.motion[0] for f in self._frames], [0, 1])
+
+    def test_paired_with_nearest_image(self):
+        self.assertEqual(self._frames[1].image[-1], 0)
+        self.assertEqual(self._sync.unmatched_frames, 1)
+
+
+class SynchroniserImagesWithoutTimestampsTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._sync = Synchroniser(self._queue, framerate=20)
+
+    def test_paired_with_latest_image(self):
+        with self.assertLogs(logger, 'WARNING') as logs:
+            self._sync.tick_movement_frame(np.full(1, 0), 0)
+            self._sync.tick_image_frame(image(0))
+            self._sync.tick_movement_frame(np.full(1, 1), 50000)
+            self._sync.tick_image_frame(image(1))
+            self._sync.tick_movement_frame(np.full(1, 2), 100000)
+        sleep(0.05)
+        frames = drain_frames(self._queue)
+        self.assertEqual([f.motion[0] for f in frames], [0, 1, 2])
+        self.assertEqual([f.image[-1] for f in frames], [0, 0, 1])
+        self.assertEqual(len(logs.records), 1)
+
+
+class SynchroniserDetectorImageTestCase(TestCase):
+    def setUp(self):
+        self._queue = FrameQueue(10, DropPolicy.DROP_OLDEST)
+        self._buffer = SharedRingBuffer(5, 4 * 4 * 3)
+        self._sync = Synchroniser(
+            self._queue, framerate=20, detector_buffer=self._buffer
+        )
+
+        self._sync.tick_detector_frame(np.full((4, 4, 3), 0, dtype='uint8'), 10)
+        self._sync.tick_image_frame(image(0), 0)
+        self._sync.tick_movement_frame(np.full(1, 0), 0)
+        # No detector image for this frame
+        self._sync.tick_image_frame(image(1), 50000)
+        self._sync.tick_movement_frame(np.full(1, 1), 50000)
+        sleep(0.05)
+        self._frames = drain_frames(self._queue)
+
+    def test_detector_image_attached_by_timestamp(self):
+        self.assertEqual(self._frames[0].detector_image.shape, (4, 4, 3))
+        self.assertEqual(
+            self._frames[0].detector_image.handle.buffer, self._buffer.name
+        )
+
+    def test_no_detector_image_if_none_matches(self):
+        self.assertIsNone(self._frames[1].detector_image)
+
+    def test_detector_image_released_with_frame(self):
+        for frame in self._frames:
+            frame.release()
+        self._sync.close()
+        self.assertEqual(self._buffer.in_use(), 0)
+
+    def tearDown(self):
+        self._sync.close()
+        self._buffer.close()
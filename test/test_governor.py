@@ -0,0 +1,104 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from time import sleep
+
+from DynAIkonTrap.governor import Governor, capture_levels
+from DynAIkonTrap.settings import GovernorSettings
+
+
+class MockCamera:
+    def __init__(self):
+        self.framerate = 20
+        self.resolution = (640, 480)
+        self.calls = []
+
+    def reconfigure(self, framerate, resolution):
+        self.calls.append((framerate, resolution))
+
+
+class MockFilter:
+    def __init__(self):
+        self.backlog = 0.0
+
+    def backlog_s(self):
+        return self.backlog
+
+
+class CaptureLevelsTestCase(TestCase):
+    def setUp(self):
+        self._levels = capture_levels(20, (640, 480), 5, (320, 240), 2)
+
+    def test_starts_at_configured_level(self):
+        self.assertEqual(self._levels[0], (20, (640, 480)))
+
+    def test_ends_at_minimum(self):
+        self.assertEqual(self._levels[-1], (5, (320, 240)))
+
+    def test_resolutions_suit_encoder(self):
+        for _, (width, height) in self._levels:
+            self.assertEqual(width % 32, 0)
+            self.assertEqual(height % 16, 0)
+
+    def test_minimum_above_configured_gives_one_level(self):
+        self.assertEqual(
+            capture_levels(20, (640, 480), 30, (1280, 960), 3), [(20, (640, 480))]
+        )
+
+
+class GovernorTestCase(TestCase):
+    def setUp(self):
+        self._camera = MockCamera()
+        self._filter = MockFilter()
+        self._governor = Governor(
+            self._camera,
+            self._filter,
+            GovernorSettings(
+                budget_s=100, resume_fraction=0.5, interval_s=0.02, steps=2
+            ),
+        )
+
+    def test_no_change_within_budget(self):
+        self._filter.backlog = 80
+        sleep(0.1)
+        self.assertEqual(self._camera.calls, [])
+
+    def test_steps_down_to_lowest_level(self):
+        self._filter.backlog = 200
+        sleep(0.2)
+        self.assertEqual(self._governor.level, 2)
+        self.assertEqual(self._camera.calls[-1], (5, (320, 240)))
+
+    def test_holds_level_while_backlog_shrinks(self):
+        governor = Governor(
+            self._camera, self._filter, GovernorSettings(budget_s=100, interval_s=60)
+        )
+        self.assertEqual(governor._next_level(200), 1)
+        governor.level = 1
+        self.assertEqual(governor._next_level(150), 1)
+        self.assertEqual(governor._next_level(160), 2)
+        governor.close()
+
+    def test_steps_back_up_once_drained(self):
+        self._filter.backlog = 200
+        sleep(0.2)
+        self._filter.backlog = 10
+        sleep(0.2)
+        self.assertEqual(self._governor.level, 0)
+        self.assertEqual(self._camera.calls[-1], (20, (640, 480)))
+
+    def tearDown(self):
+        self._governor.close()
@@ -0,0 +1,77 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+import numpy as np
+from scipy import signal
+
+from DynAIkonTrap.filtering.iir import SOSFilter
+
+
+class SOSFilterMatchesScipyTestCase(TestCase):
+    def setUp(self):
+        self._sos = signal.cheby2(4, 35, 0.1, output='sos')
+        rng = np.random.default_rng(0)
+        self._x = rng.integers(-5000, 5000, (3, 200)).astype(float)
+        self._expected = signal.sosfilt(self._sos, self._x)
+
+    def test_per_sample_identical_to_sosfilt(self):
+        iir = SOSFilter(self._sos, channels=3)
+        output = np.array([iir.filter(sample) for sample in self._x.T]).T
+        self.assertTrue(np.array_equal(output, self._expected))
+
+    def test_blocks_identical_to_sosfilt(self):
+        iir = SOSFilter(self._sos, channels=3)
+        output = np.concatenate(
+            [iir.filter_block(self._x[:, :70]), iir.filter_block(self._x[:, 70:])],
+            axis=1,
+        )
+        self.assertTrue(np.array_equal(output, self._expected))
+
+    def test_single_channel_scalar(self):
+        iir = SOSFilter(self._sos)
+        output = [iir.filter(x)[0] for x in self._x[0]]
+        self.assertTrue(np.array_equal(output, self._expected[0]))
+
+
+class SOSFilterStateTestCase(TestCase):
+    def setUp(self):
+        self._sos = signal.cheby2(3, 35, 0.2, output='sos')
+        self._iir = SOSFilter(self._sos, channels=2)
+        for _ in range(10):
+            self._iir.filter([100, -50])
+
+    def test_state_in_sosfilt_layout(self):
+        self.assertEqual(self._iir.state.shape, (len(self._sos), 2, 2))
+
+    def test_restored_state_resumes(self):
+        restored = SOSFilter(self._sos, channels=2)
+        restored.state = self._iir.state
+        self.assertTrue(
+            np.array_equal(restored.filter([7, 8]), self._iir.filter([7, 8]))
+        )
+
+    def test_state_is_a_copy(self):
+        state = self._iir.state
+        state[...] = 0
+        self.assertNotEqual(np.count_nonzero(self._iir.state), 0)
+
+    def test_wrong_state_shape_rejected(self):
+        with self.assertRaises(ValueError):
+            self._iir.state = np.zeros((1, 2, 2))
+
+    def test_reset(self):
+        self._iir.reset()
+        self.assertEqual(np.count_nonzero(self._iir.state), 0)
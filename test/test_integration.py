@@ -14,13 +14,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from time import time
-from pickle import load
-from multiprocessing import Queue, Value
+from multiprocessing import Value
 from unittest import TestCase
 
-from DynAIkonTrap.camera import Frame
 from DynAIkonTrap.filtering import Filter
 from DynAIkonTrap.comms import Sender
+from DynAIkonTrap.replay import ReplayCamera, ReplayMode
 from DynAIkonTrap.sensor import SensorLogs
 from DynAIkonTrap.settings import (
     OutputMode,
@@ -30,24 +29,6 @@ from DynAIkonTrap.settings import (
 )
 
 
-def load_pickle(filename):
-    with open(filename, 'rb') as f:
-        data = load(f)
-    return data
-
-
-class MockCamera:
-    def __init__(self, settings, data):
-        self.framerate = settings.framerate
-        self._data = data
-        self._queue = Queue()
-        for i, d in enumerate(self._data):
-            self._queue.put(Frame(d['image'], d['motion'], i))
-
-    def get(self):
-        return self._queue.get(1)
-
-
 class SenderMock(Sender):
     def __init__(self, settings, read_from):
         self.call_count = Value('i', 0)
@@ -61,14 +42,10 @@ class SenderMock(Sender):
 class IntegrationSendStillsOutTestCase(TestCase):
     def test_integration_at_least_one_animal_frame(self):
 
-        data = load_pickle('test/data/data.pk')
-
         settings = load_settings()
-        settings.camera.framerate = data['framerate']
-        settings.camera.resolution = data['resolution']
         settings.output = SenderSettings(0, OutputFormat.STILL, OutputMode.SEND, '', '')
 
-        self.camera = MockCamera(settings.camera, data['frames'])
+        self.camera = ReplayCamera('test/data/data.pk', ReplayMode.FAST, settings.camera)
         self.filters = Filter(read_from=self.camera, settings=settings.filter)
         self.sensor_logs = SensorLogs(settings=settings.sensor)
         self.sender = SenderMock(
@@ -90,3 +67,4 @@ class IntegrationSendStillsOutTestCase(TestCase):
         self.sender.close()
         self.sensor_logs.close()
         self.filters.close()
+        self.camera.close()
@@ -13,10 +13,20 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from os import path
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 from numpy import array, full
+import numpy as np
+import cv2
 
-from DynAIkonTrap.filtering.motion import MotionFilter, logger
+from DynAIkonTrap.filtering.motion import (
+    ROI_WEIGHT_SCALE,
+    BackgroundMotionModel,
+    MotionFilter,
+    logger,
+    roi_weights,
+)
 from DynAIkonTrap.settings import MotionFilterSettings
 
 
@@ -88,3 +98,218 @@ class InvalidFrequencyTestCase(TestCase):
     def test_cutoff_at_zero_fails(self):
         with self.assertLogs(logger, 'ERROR'):
             MotionFilter(MotionFilterSettings(iir_cutoff_hz=0), framerate=20)
+
+
+def reference_sotv(motion_frame, threshold_small):
+    magnitudes = np.sqrt(
+        np.square(motion_frame['x'].astype(float))
+        + np.square(motion_frame['y'].astype(float))
+    )
+    mask = magnitudes > threshold_small
+    return (
+        int(motion_frame['x'][mask].astype(int).sum()),
+        int(motion_frame['y'][mask].astype(int).sum()),
+    )
+
+
+class MatchesReferenceSoTVTestCase(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self._frames = np.zeros(
+            (10, 31, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+        )
+        self._frames['x'] = rng.integers(-128, 128, self._frames.shape)
+        self._frames['y'] = rng.integers(-128, 128, self._frames.shape)
+
+    def test_sums_match_reference(self):
+        for threshold in (-1, 0, 10, 90.5, 200):
+            settings = MotionFilterSettings(small_threshold=threshold)
+            motion_filter = MotionFilter(settings, 20)
+
+            for frame in self._frames:
+                sums = motion_filter._thresholded_sums(frame)
+                self.assertEqual(tuple(sums), reference_sotv(frame, threshold))
+
+    def test_changing_grid_size(self):
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        motion_filter.run_raw(self._frames[0])
+        self.assertIsInstance(motion_filter.run_raw(self._frames[0, :16, :21]), float)
+
+
+class BatchMatchesStreamingTestCase(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self._frames = np.zeros(
+            (50, 31, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+        )
+        self._frames['x'] = rng.integers(-30, 31, self._frames.shape)
+        self._frames['y'] = rng.integers(-30, 31, self._frames.shape)
+
+        streaming_filter = MotionFilter(MotionFilterSettings(), 20)
+        self._streamed = [streaming_filter.run_raw(f) for f in self._frames]
+
+    def test_identical_scores(self):
+        batch_filter = MotionFilter(MotionFilterSettings(), 20)
+        scores = batch_filter.run_raw_batch(self._frames, chunk_size=16)
+        self.assertEqual(scores.tolist(), self._streamed)
+
+    def test_state_carried_between_batch_and_streaming(self):
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        scores = motion_filter.run_raw_batch(self._frames[:20]).tolist()
+        scores += [motion_filter.run_raw(f) for f in self._frames[20:30]]
+        scores += motion_filter.run_raw_batch(self._frames[30:]).tolist()
+        self.assertEqual(scores, self._streamed)
+
+    def test_resume_from_saved_state(self):
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        scores = [motion_filter.run_raw(f) for f in self._frames[:25]]
+        state = motion_filter.state
+
+        resumed_filter = MotionFilter(MotionFilterSettings(), 20)
+        resumed_filter.state = state
+        scores += resumed_filter.run_raw_batch(self._frames[25:]).tolist()
+        self.assertEqual(scores, self._streamed)
+
+
+class RegionOfInterestTestCase(TestCase):
+    def setUp(self):
+        # With the extra column the camera adds
+        self._frame = np.zeros(
+            (30, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+        )
+        self._frame['x'][:, :20] = 20  # Motion only in the left half
+
+    def _first_sums(self, settings):
+        motion_filter = MotionFilter(settings, 20)
+        return motion_filter._thresholded_sums(self._frame).tolist()
+
+    def test_no_mask_has_no_weights(self):
+        self.assertIsNone(roi_weights((30, 41)))
+
+    def test_exclusion_not_skewed_by_extra_column(self):
+        weights = roi_weights((30, 41), exclusions=[[0.0, 0.0, 0.5, 1.0]])
+        self.assertTrue((weights[:, :20] == 0).all())
+        self.assertTrue((weights[:, 20:40] == ROI_WEIGHT_SCALE).all())
+
+    def test_exclusion_to_right_edge(self):
+        weights = roi_weights((30, 41), exclusions=[[0.9, 0.0, 1.0, 1.0]])
+        self.assertTrue((weights[:, :36] == ROI_WEIGHT_SCALE).all())
+        # The last column of the frame, and the camera's extra column
+        self.assertTrue((weights[:, 36:] == 0).all())
+
+    def test_exclusion_ignores_motion(self):
+        settings = MotionFilterSettings(roi_exclusions=[[0.0, 0.0, 0.5, 1.0]])
+        self.assertEqual(self._first_sums(settings), [0, 0])
+
+    def test_exclusion_elsewhere_keeps_motion(self):
+        settings = MotionFilterSettings(roi_exclusions=[[0.5, 0.0, 1.0, 1.0]])
+        self.assertEqual(self._first_sums(settings), [20 * 30 * 20, 0])
+
+    def test_mask_image_weights_motion(self):
+        mask = np.full((480, 640), 255, dtype=np.uint8)
+        mask[:, :160] = 0
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, 'mask.png')
+            cv2.imwrite(filename, mask)
+            settings = MotionFilterSettings(roi_mask_file=filename)
+            self.assertEqual(self._first_sums(settings), [10 * 30 * 20, 0])
+
+    def test_unreadable_mask_ignored(self):
+        settings = MotionFilterSettings(roi_mask_file='/nonexistent/mask.png')
+        with self.assertLogs(logger, level='ERROR'):
+            sums = self._first_sums(settings)
+        self.assertEqual(sums, self._first_sums(MotionFilterSettings()))
+
+
+class BackgroundMotionTestCase(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self._frames = np.zeros(
+            (300, 30, 40), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+        )
+        # A swaying branch in the top left, moving back and forth every frame
+        sway = np.where(np.arange(300) % 4 < 2, 30, -30)
+        self._frames['x'][:, :10, :10] = sway[:, np.newaxis, np.newaxis]
+        self._frames['y'][:, :10, :10] = rng.integers(-30, 31, (300, 10, 10))
+        self._settings = MotionFilterSettings(
+            sotv_threshold=100, background_model=True, background_time_constant_s=2
+        )
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(MotionFilter(MotionFilterSettings(), 20).background)
+
+    def test_stationary_noise_down_weighted(self):
+        model = BackgroundMotionModel(40)
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        for frame in self._frames:
+            motion_filter._threshold(frame)
+            model.update(
+                motion_filter._vectors,
+                motion_filter._mask,
+                motion_filter._magnitudes_sq,
+            )
+        weights = model.weights()
+        self.assertTrue((weights[:10, :10] < 0.3 * 64).all())
+        self.assertTrue((weights[10:, 10:] == 64).all())
+
+    def test_background_motion_suppressed(self):
+        motion_filter = MotionFilter(self._settings, 20)
+        scores = motion_filter.run_raw_batch(self._frames)
+        self.assertGreater(motion_filter.frames_suppressed, 0)
+        self.assertFalse((scores[-50:] >= 100).any())
+
+    def test_new_motion_still_detected(self):
+        motion_filter = MotionFilter(self._settings, 20)
+        motion_filter.run_raw_batch(self._frames)
+
+        animal = self._frames[:40].copy()
+        animal['x'][:, 15:25, 20:30] = 20
+        self.assertTrue(any(motion_filter.run(frame) for frame in animal))
+
+
+class MotionRegionsTestCase(TestCase):
+    def setUp(self):
+        # A 640x480 frame, with the extra column of motion vectors
+        self._frame = np.zeros(
+            (30, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+        )
+        self._frame['x'][2:6, 4:12] = 20  # Large region
+        self._frame['y'][20:23, 30:32] = -20  # Small region
+        self._frame['x'][25, 5] = 20  # Single block, ignored
+
+    def test_regions_found(self):
+        motion_filter = MotionFilter(MotionFilterSettings(region_min_blocks=2), 20)
+        motion_filter.run_raw(self._frame)
+        self.assertEqual(
+            motion_filter.regions(),
+            [(4 / 40, 2 / 30, 12 / 40, 6 / 30), (30 / 40, 20 / 30, 32 / 40, 23 / 30)],
+        )
+
+    def test_diagonal_blocks_connected(self):
+        frame = np.zeros((30, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+        frame['x'][[0, 1, 2], [0, 1, 2]] = 20
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        motion_filter.run_raw(frame)
+        self.assertEqual(motion_filter.regions(), [(0, 0, 3 / 40, 3 / 30)])
+
+    def test_excluded_region_not_reported(self):
+        settings = MotionFilterSettings(roi_exclusions=[[0.0, 0.0, 0.5, 0.5]])
+        motion_filter = MotionFilter(settings, 20)
+        motion_filter.run_raw(self._frame)
+        self.assertEqual(
+            motion_filter.regions(), [(30 / 40, 20 / 30, 32 / 40, 23 / 30)]
+        )
+
+    def test_extra_column_left_out(self):
+        frame = np.zeros((30, 41), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+        frame['x'][10:14, 36:41] = 20
+        frame['x'][20:24, 40] = 20  # Only in the extra column
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        motion_filter.run_raw(frame)
+        self.assertEqual(motion_filter.regions(), [(36 / 40, 10 / 30, 1, 14 / 30)])
+
+    def test_no_regions_without_motion(self):
+        motion_filter = MotionFilter(MotionFilterSettings(), 20)
+        self.assertEqual(motion_filter.regions(), [])
+        motion_filter.run_raw(np.zeros_like(self._frame))
+        self.assertEqual(motion_filter.regions(), [])
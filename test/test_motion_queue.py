@@ -13,12 +13,24 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
-from unittest import TestCase
+from os.path import isfile
+from unittest import TestCase, skipUnless
 from multiprocessing import Queue, Value
-from time import time
-
-from DynAIkonTrap.filtering.motion_queue import Label, MotionSequence, MotionQueue
+from os import _exit, getpid, kill
+from signal import SIGKILL
+from time import sleep, time
+import numpy as np
+
+from DynAIkonTrap.filtering.motion_queue import (
+    Label,
+    MotionSequence,
+    MotionQueue,
+    PreRollBuffer,
+    _memory_mb,
+)
+from DynAIkonTrap.filtering.tracking import MotionTracker
 from DynAIkonTrap.camera import Frame
+from DynAIkonTrap.ring_buffer import SharedRingBuffer
 from DynAIkonTrap.settings import MotionQueueSettings
 
 
@@ -37,6 +49,10 @@ class PutFramesMotionSequenceTestCase(TestCase):
         for i, frame in enumerate(self._sequence._frames):
             self.assertEqual(frame.index, i)
 
+    def test_get_frames_in_order(self):
+        frames = self._sequence.get_frames()
+        self.assertEqual([frame.index for frame in frames], list(range(self._len)))
+
 
 class GetHighestPriorityFromMotionSequenceTestCase(TestCase):
     def setUp(self):
@@ -64,6 +80,28 @@ class GetHighestPriorityFromMotionSequenceTestCase(TestCase):
             i += 1
 
 
+class GetHighestPrioritiesFromMotionSequenceTestCase(TestCase):
+    def setUp(self):
+        self._sequence = MotionSequence(0)
+        for priority in [5, 4, 3, 6, 9, 2, 1]:
+            self._sequence.put(Frame(None, None, None), priority)
+
+    def test_correct_order(self):
+        frames = self._sequence.get_highest_priorities(3)
+        self.assertEqual([f.index for f in frames], [4, 3, 0])
+
+    def test_labelled_frames_excluded(self):
+        self._sequence.label_as_empty(self._sequence._frames[4])
+        frames = self._sequence.get_highest_priorities(10)
+        self.assertEqual([f.index for f in frames], [3, 0, 1, 2, 5, 6])
+
+    def test_matches_single_highest_priority(self):
+        self.assertEqual(
+            self._sequence.get_highest_priorities(1),
+            [self._sequence.get_highest_priority()],
+        )
+
+
 class LabelAsAnimalMotionSequenceTestCase(TestCase):
     def setUp(self):
         self._sequence = MotionSequence(1)
@@ -92,6 +130,41 @@ class LabelAsAnimalMotionSequenceTestCase(TestCase):
         self.assertEqual(self._sequence._frames[6].label, Label.UNKNOWN)
 
 
+class TrackedLabelAsAnimalMotionSequenceTestCase(TestCase):
+    def setUp(self):
+        self._sequence = MotionSequence(
+            1,
+            MotionTracker(min_agreement=0.5, min_confidence=0.2, confidence_decay=0.01),
+        )
+
+        # An animal moving slowly in the top left for the first 7 frames
+        for i in range(10):
+            motion = np.zeros((10, 11), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+            if i < 7:
+                motion['x'][2:5, 2:5] = -2
+            self._sequence.put(Frame(None, motion, i), 1)
+        self._detection = (0.9, (0.2, 0.2, 0.5, 0.5))
+
+    def labels(self):
+        return [frame.label for frame in self._sequence._frames]
+
+    def test_frames_labelled_while_tracked(self):
+        self._sequence.label_as_animal(self._sequence._frames[3], self._detection)
+        self.assertEqual(self.labels(), [Label.ANIMAL] * 7 + [Label.UNKNOWN] * 3)
+
+    def test_tracking_stops_at_labelled_frame(self):
+        self._sequence.label_as_empty(self._sequence._frames[5])
+        self._sequence.label_as_animal(self._sequence._frames[3], self._detection)
+        self.assertEqual(self.labels()[:6], [Label.ANIMAL] * 5 + [Label.EMPTY])
+
+    def test_smoothed_without_detection(self):
+        self._sequence.label_as_animal(self._sequence._frames[3])
+        self.assertEqual(
+            self.labels(),
+            [Label.UNKNOWN] * 2 + [Label.ANIMAL] * 3 + [Label.UNKNOWN] * 5,
+        )
+
+
 class LabelAsEmptyMotionSequenceTestCase(TestCase):
     def setUp(self):
         self._sequence = MotionSequence(1)
@@ -264,6 +337,90 @@ class CloseGapsLeadingEmptyMotionSequenceTestCase(TestCase):
         self.assertEqual(self._sequence._frames[7].label, Label.EMPTY)
 
 
+def motion_frame(i):
+    motion = np.zeros((4, 5), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+    motion['x'] = i
+    return Frame(np.full(100, i, dtype='uint8'), motion, i)
+
+
+class PreRollBufferTestCase(TestCase):
+    def setUp(self):
+        self._pre_roll = PreRollBuffer(3, 10000)
+        for i in range(5):
+            self._pre_roll.put(motion_frame(i), i / 10)
+
+    def test_keeps_most_recent_frames(self):
+        frames = self._pre_roll.pop_all()
+        self.assertEqual([f.timestamp for f, _ in frames], [2, 3, 4])
+        self.assertEqual([score for _, score in frames], [0.2, 0.3, 0.4])
+
+    def test_frames_restored(self):
+        frame, _ = self._pre_roll.pop_all()[-1]
+        self.assertTrue(np.array_equal(frame.image, np.full(100, 4)))
+        self.assertEqual(frame.motion.shape, (4, 5))
+        self.assertTrue(np.all(frame.motion['x'] == 4))
+
+    def test_motion_regions_kept(self):
+        frame = motion_frame(5)
+        frame.motion_regions = [(0.0, 0.25, 0.5, 1.0)]
+        self._pre_roll.put(frame, 0.5)
+        restored, _ = self._pre_roll.pop_all()[-1]
+        self.assertEqual(restored.motion_regions, [(0.0, 0.25, 0.5, 1.0)])
+
+    def test_motion_compressed(self):
+        self.assertLess(self._pre_roll.nbytes, 3 * (100 + 4 * 5 * 4))
+
+    def test_emptied_by_pop_all(self):
+        self._pre_roll.pop_all()
+        self.assertEqual(len(self._pre_roll), 0)
+        self.assertEqual(self._pre_roll.nbytes, 0)
+
+
+class PreRollBufferByteBudgetTestCase(TestCase):
+    def test_evicts_to_stay_within_budget(self):
+        pre_roll = PreRollBuffer(100, 250)
+        for i in range(5):
+            pre_roll.put(motion_frame(i), 0)
+        self.assertLessEqual(pre_roll.nbytes, 250)
+        self.assertEqual(pre_roll.pop_all()[-1][0].timestamp, 4)
+
+    def test_disabled_with_no_frames(self):
+        pre_roll = PreRollBuffer(0, 250)
+        pre_roll.put(motion_frame(0), 0)
+        self.assertEqual(len(pre_roll), 0)
+
+
+class PreRollMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def load(self):
+                pass
+
+            def run(self, *args, **kwargs):
+                return False
+
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(pre_roll_s=0.1),
+            animal_detector=AnimalFilterMock(),
+            framerate=20,
+        )
+        for i in range(3):
+            self._mq.hold(motion_frame(i), 0)
+        self._mq.put(motion_frame(3), 1)
+
+    def test_pre_roll_starts_sequence(self):
+        sequence = [f.frame.timestamp for f in self._mq._current_sequence._frames]
+        self.assertEqual(sequence, [1, 2, 3])
+
+    def test_pre_roll_not_repeated_within_sequence(self):
+        self._mq.hold(motion_frame(4), 0)
+        self._mq.put(motion_frame(5), 1)
+        self.assertEqual(len(self._mq._current_sequence), 4)
+
+    def tearDown(self):
+        self._mq.close()
+
+
 class KeepPuttingMotionQueueTestCase(TestCase):
     """`end_motion_sequence()` is never explicitely called"""
 
@@ -272,6 +429,9 @@ class KeepPuttingMotionQueueTestCase(TestCase):
             def __init__(self):
                 self.num_calls = Value('i', 0)
 
+            def load(self):
+                pass
+
             def run(self, *args, **kwargs):
                 with self.num_calls.get_lock():
                     self.num_calls.value += 1
@@ -316,3 +476,373 @@ class KeepPuttingMotionQueueTestCase(TestCase):
                 self.fail('Timed out')
 
         self.assertEqual(self._animal_filter.num_calls.value, 4)
+
+
+class BatchedMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def __init__(self):
+                self.batch_sizes = Queue()
+
+            def load(self):
+                pass
+
+            def run(self, *args, **kwargs):
+                self.batch_sizes.put(1)
+                return False
+
+            def run_batch(self, images, **kwargs):
+                self.batch_sizes.put(len(images))
+                return [False] * len(images)
+
+        self._animal_filter = AnimalFilterMock()
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(pre_roll_s=0, inference_batch_size=4),
+            animal_detector=self._animal_filter,
+            framerate=20,
+        )
+        for i in range(10):
+            self._mq.put(motion_frame(i), i + 1)
+        self._mq.end_motion_sequence()
+
+    def tearDown(self):
+        self._mq.close()
+
+    def test_frames_analysed_in_batches(self):
+        batch_sizes = [self._animal_filter.batch_sizes.get(timeout=5) for _ in range(3)]
+        self.assertEqual(batch_sizes, [4, 4, 2])
+
+
+class WorkerPoolMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def __init__(self):
+                self.workers = Queue()
+                self.loaded = Queue()
+
+            def load(self):
+                self.loaded.put(getpid())
+
+            def set_threads(self, threads):
+                pass
+
+            def run(self, *args, **kwargs):
+                self.workers.put(getpid())
+                sleep(0.05)
+                return True
+
+        self._animal_filter = AnimalFilterMock()
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(
+                pre_roll_s=0, smoothing_factor=0, inference_workers=2
+            ),
+            animal_detector=self._animal_filter,
+            framerate=20,
+        )
+        for sequence in range(4):
+            for i in range(3):
+                self._mq.put(motion_frame(10 * sequence + i), 1)
+            self._mq.end_motion_sequence()
+
+    def tearDown(self):
+        self._mq.close()
+
+    def test_sequences_shared_between_workers(self):
+        workers = {self._animal_filter.workers.get(timeout=5) for _ in range(12)}
+        self.assertEqual(workers, {p.pid for p in self._mq._processes})
+
+    def test_sequences_output_whole(self):
+        sequences = []
+        for _ in range(4):
+            sequence = []
+            frame = self._mq.get()
+            while frame is not None:
+                sequence.append(frame.timestamp)
+                frame = self._mq.get()
+            sequences.append(sequence)
+        self.assertCountEqual(
+            [sorted(s) for s in sequences],
+            [[10 * s + i for i in range(3)] for s in range(4)],
+        )
+
+    def test_detector_loaded_by_each_worker(self):
+        loaded = {self._animal_filter.loaded.get(timeout=5) for _ in range(2)}
+        self.assertEqual(loaded, {process.pid for process in self._mq._processes})
+
+    def test_backlog_shared_between_workers(self):
+        single = MotionQueue(MotionQueueSettings(), self._animal_filter, 20)
+        self._mq.close()  # Stop the workers updating the shared values
+        for mq in (single, self._mq):
+            mq._remaining_frames.value = 10
+            mq._mean_time.value = 0.5
+        self.assertAlmostEqual(self._mq.backlog_s() * 2, single.backlog_s())
+        single.close()
+
+
+class KilledWorkerMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def __init__(self):
+                self.loaded = Queue()
+
+            def load(self):
+                self.loaded.put(getpid())
+
+            def set_threads(self, threads):
+                pass
+
+            def run(self, *args, **kwargs):
+                return True
+
+        self._animal_filter = AnimalFilterMock()
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(
+                pre_roll_s=0, smoothing_factor=0, inference_workers=2
+            ),
+            animal_detector=self._animal_filter,
+            framerate=20,
+        )
+        [self._animal_filter.loaded.get(timeout=5) for _ in range(2)]
+        sleep(0.1)  # Both workers waiting for a sequence
+        kill(self._mq._processes[0].pid, SIGKILL)
+        self._mq._processes[0].join()
+
+    def tearDown(self):
+        self._mq.close()
+
+    def test_other_worker_analyses_sequence(self):
+        for i in range(3):
+            self._mq.put(motion_frame(i), 1)
+        self._mq.end_motion_sequence()
+        timestamps = [self._mq._output_queue.get(timeout=5).timestamp for _ in range(3)]
+        self.assertEqual(timestamps, [0, 1, 2])
+
+
+class IdleMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def __init__(self):
+                self.crash = Value('b', False)
+
+            def load(self):
+                pass
+
+            def run(self, *args, **kwargs):
+                if self.crash.value:
+                    _exit(1)
+                return False
+
+        self._animal_filter = AnimalFilterMock()
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(pre_roll_s=0),
+            animal_detector=self._animal_filter,
+            framerate=20,
+        )
+
+    def tearDown(self):
+        self._mq.close()
+
+    def wait_until_idle(self):
+        t_stop = time() + 5
+        while not self._mq.is_idle():
+            if time() > t_stop:
+                self.fail('Timed out')
+            sleep(0.01)
+
+    def test_idle_initially(self):
+        self.assertTrue(self._mq.is_idle())
+
+    def test_not_idle_with_sequence_open(self):
+        self._mq.put(motion_frame(0), 1)
+        sleep(0.1)
+        self.assertFalse(self._mq.is_idle())
+
+    def test_idle_once_sequence_analysed(self):
+        self._mq.put(motion_frame(0), 1)
+        self._mq.end_motion_sequence()
+        self.wait_until_idle()
+
+    def test_idle_after_worker_restarted(self):
+        self._animal_filter.crash.value = True
+        self._mq.put(motion_frame(0), 1)
+        self._mq.end_motion_sequence()
+        self._mq.process.join(5)
+        self.assertFalse(self._mq.is_idle())
+        self._mq.restart()
+        self.assertTrue(self._mq.is_idle())
+
+
+class CrashedWorkerSlotsMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            def load(self):
+                pass
+
+            def run(self, *args, **kwargs):
+                _exit(1)
+
+        self._buffer = SharedRingBuffer(slots=4, slot_size=128)
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(pre_roll_s=0),
+            animal_detector=AnimalFilterMock(),
+            framerate=20,
+        )
+
+    def tearDown(self):
+        self._mq.close()
+        self._buffer.close()
+
+    def test_slots_reclaimed_on_restart(self):
+        for i in range(3):
+            frame = motion_frame(i)
+            frame.image = self._buffer.put(frame.image)
+            self._mq.put(frame, 1)
+        self._mq.end_motion_sequence()
+        self._mq.process.join(5)
+        self.assertEqual(self._buffer.in_use(), 3)
+        self._mq.restart()
+        self.assertEqual(self._buffer.in_use(), 0)
+
+
+class TrackingMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class AnimalFilterMock:
+            threshold = 0.5
+
+            def __init__(self):
+                self.calls = Value('i', 0)
+
+            def load(self):
+                pass
+
+            def detect_batch(self, images, *args, **kwargs):
+                with self.calls.get_lock():
+                    self.calls.value += 1
+                return [(0.9, (0.0, 0.25, 1.0, 0.75))] * len(images)
+
+        self._animal_filter = AnimalFilterMock()
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(
+                pre_roll_s=0, smoothing_factor=0, tracking=True
+            ),
+            animal_detector=self._animal_filter,
+            framerate=20,
+        )
+
+    def tearDown(self):
+        self._mq.close()
+
+    def test_tracked_frames_not_analysed(self):
+        for i in range(10):
+            frame = motion_frame(i)
+            frame.motion['x'] = 0
+            frame.motion['x'][1:3, 1:3] = -2
+            self._mq.put(frame, 1)
+        self._mq.end_motion_sequence()
+
+        timestamps = []
+        frame = self._mq.get()
+        while frame is not None:
+            timestamps.append(frame.timestamp)
+            frame = self._mq.get()
+        self.assertEqual(timestamps, list(range(10)))
+        self.assertEqual(self._animal_filter.calls.value, 1)
+
+
+class TrackingInferenceCountMotionQueueTestCase(TestCase):
+    class AnimalFilterMock:
+        threshold = 0.2
+
+        def __init__(self):
+            self.analysed = Value('i', 0)
+
+        def load(self):
+            pass
+
+        def detect_batch(self, images, *args, **kwargs):
+            with self.analysed.get_lock():
+                self.analysed.value += len(images)
+            # Only just above the threshold, around the moving blocks
+            return [(0.25, (0.2, 0.2, 0.5, 0.5))] * len(images)
+
+        def run(self, image, *args, **kwargs):
+            return self.detect_batch([image])[0][0] >= self.threshold
+
+    def analyse(self, tracking):
+        animal_filter = self.AnimalFilterMock()
+        mq = MotionQueue(
+            settings=MotionQueueSettings(pre_roll_s=0, tracking=tracking),
+            animal_detector=animal_filter,
+            framerate=20,
+        )
+        for i in range(40):
+            motion = np.zeros((10, 11), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+            # An animal moving to and fro in the top left
+            motion['x'][2:5, 2:5] = 4 if i % 2 else -4
+            mq.put(Frame(np.full(100, i, dtype='uint8'), motion, i), 1)
+        mq.end_motion_sequence()
+
+        output = 0
+        while mq.get() is not None:
+            output += 1
+        mq.close()
+        return output, animal_filter.analysed.value
+
+    def test_fewer_inferences_with_tracking(self):
+        smoothed_output, smoothed_analysed = self.analyse(tracking=False)
+        tracked_output, tracked_analysed = self.analyse(tracking=True)
+        self.assertEqual(smoothed_output, 40)
+        self.assertEqual(tracked_output, 40)
+        self.assertLess(tracked_analysed, smoothed_analysed)
+
+
+class CacheStatsMotionQueueTestCase(TestCase):
+    def setUp(self):
+        class CacheMock:
+            lookups = 4
+            hits = 3
+            time_saved_s = 1.5
+            hit_rate = 0.75
+
+        class AnimalFilterMock:
+            cache = CacheMock()
+
+            def load(self):
+                pass
+
+            def set_threads(self, threads):
+                pass
+
+            def run(self, *args, **kwargs):
+                return True
+
+        self._mq = MotionQueue(
+            settings=MotionQueueSettings(
+                pre_roll_s=0, smoothing_factor=0, inference_workers=2
+            ),
+            animal_detector=AnimalFilterMock(),
+            framerate=20,
+        )
+
+    def tearDown(self):
+        self._mq.close()
+
+    def test_no_stats_before_first_sequence(self):
+        self.assertEqual(self._mq.cache_stats(), (0.0, 0.0))
+
+    def test_stats_published_after_sequence(self):
+        self._mq.put(motion_frame(0), 1)
+        self._mq.end_motion_sequence()
+        self._mq.get()
+        t_stop = time() + 5
+        while self._mq.cache_stats()[1] == 0 and time() < t_stop:
+            sleep(0.01)
+        self.assertEqual(self._mq.cache_stats(), (0.75, 1.5))
+
+
+@skipUnless(isfile('/proc/self/smaps_rollup'), 'Memory details not available')
+class MemoryTestCase(TestCase):
+    def test_private_memory_within_resident(self):
+        resident, private = _memory_mb()
+        self.assertGreater(private, 0)
+        self.assertLessEqual(private, resident)
@@ -0,0 +1,162 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from os import remove
+from pickle import dump
+from tempfile import mkstemp
+from time import sleep, time
+import numpy as np
+
+from DynAIkonTrap.camera import Frame
+from DynAIkonTrap.replay import (
+    RecordingWriter,
+    ReplayCamera,
+    ReplayMode,
+    read_recording,
+)
+from DynAIkonTrap.settings import CameraSettings, DropPolicy
+
+MOTION_DTYPE = [('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+
+
+def make_frame(i):
+    return Frame(
+        np.full(10, i, dtype='uint8'), np.zeros((2, 3), dtype=MOTION_DTYPE), 100 + i
+    )
+
+
+def read_all(camera, n):
+    frames = []
+    t_start = time()
+    while len(frames) < n and time() - t_start < 10:
+        if not camera.empty():
+            frames.append(camera.get())
+    return frames
+
+
+class RecordingTestCase(TestCase):
+    def setUp(self):
+        _, self._filename = mkstemp()
+        writer = RecordingWriter(self._filename, 20, (640, 480))
+        for i in range(5):
+            writer.write(make_frame(i))
+        writer.close()
+
+    def test_header_read(self):
+        header, _ = read_recording(self._filename)
+        self.assertEqual(header['framerate'], 20)
+        self.assertEqual(tuple(header['resolution']), (640, 480))
+
+    def test_frames_read_back(self):
+        _, frames = read_recording(self._filename)
+        frames = list(frames)
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames[3]['image'][0], 3)
+        self.assertEqual(frames[3]['timestamp'], 103)
+
+    def tearDown(self):
+        remove(self._filename)
+
+
+class LegacyRecordingTestCase(TestCase):
+    def test_legacy_recording_read(self):
+        _, filename = mkstemp()
+        with open(filename, 'wb') as f:
+            dump(
+                {
+                    'frames': [{'image': b'a', 'motion': None}] * 3,
+                    'framerate': 10,
+                    'resolution': (640, 480),
+                },
+                f,
+            )
+
+        header, frames = read_recording(filename)
+        self.assertEqual(header['framerate'], 10)
+        self.assertEqual(len(list(frames)), 3)
+        remove(filename)
+
+
+class ReplayFastTestCase(TestCase):
+    def setUp(self):
+        _, self._filename = mkstemp()
+        writer = RecordingWriter(self._filename, 1, (640, 480))
+        for i in range(20):
+            writer.write(make_frame(i))
+        writer.close()
+
+        # A queue much smaller than the recording; no frames may be dropped
+        self._camera = ReplayCamera(
+            self._filename,
+            ReplayMode.FAST,
+            CameraSettings(max_queued_frames=2, drop_policy=DropPolicy.DROP_OLDEST),
+        )
+
+    def test_all_frames_replayed_unthrottled(self):
+        t_start = time()
+        frames = read_all(self._camera, 20)
+        self.assertLess(time() - t_start, 5)  # Recorded at 1 FPS
+        self.assertEqual([f.timestamp for f in frames], list(range(20)))
+        self.assertEqual(sum(self._camera.dropped_frames().values()), 0)
+
+    def test_finished(self):
+        read_all(self._camera, 20)
+        sleep(0.1)
+        self.assertTrue(self._camera.finished())
+        self.assertEqual(self._camera.frames_read, 20)
+
+    def tearDown(self):
+        self._camera.close()
+        remove(self._filename)
+
+
+class ReplayRealtimeTestCase(TestCase):
+    def setUp(self):
+        _, self._filename = mkstemp()
+        writer = RecordingWriter(self._filename, 20, (640, 480))
+        for i in range(10):
+            writer.write(make_frame(i))
+        writer.close()
+
+    def test_paced_at_framerate(self):
+        t_start = time()
+        camera = ReplayCamera(self._filename, ReplayMode.REALTIME)
+        frames = read_all(camera, 10)
+        self.assertEqual(len(frames), 10)
+        self.assertGreaterEqual(time() - t_start, 9 / 20)
+        camera.close()
+
+    def test_frames_dropped_when_not_consumed(self):
+        camera = ReplayCamera(
+            self._filename,
+            ReplayMode.REALTIME,
+            CameraSettings(max_queued_frames=4, drop_policy=DropPolicy.DROP_NEWEST),
+        )
+        while not camera.finished():
+            sleep(0.05)
+        self.assertEqual(camera.dropped_frames()[DropPolicy.DROP_NEWEST], 6)
+        camera.close()
+
+    def test_recorded_timestamps(self):
+        camera = ReplayCamera(
+            self._filename, ReplayMode.REALTIME, recorded_timestamps=True
+        )
+        frames = read_all(camera, 10)
+        self.assertEqual([f.timestamp for f in frames], list(range(100, 110)))
+        camera.close()
+
+    def tearDown(self):
+        remove(self._filename)
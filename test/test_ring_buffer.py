@@ -0,0 +1,152 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from multiprocessing import Process, Queue
+from pickle import dumps, loads
+import numpy as np
+
+from DynAIkonTrap.ring_buffer import (
+    HeldSlots,
+    SharedArray,
+    SharedRingBuffer,
+    acquire,
+    release,
+)
+
+
+class PutAndViewTestCase(TestCase):
+    def setUp(self):
+        self._buffer = SharedRingBuffer(slots=2, slot_size=1024)
+        self._data = (np.arange(1000) % 256).astype('uint8')
+        self._shared = self._buffer.put(self._data)
+
+    def test_data_is_stored(self):
+        self.assertTrue(isinstance(self._shared, SharedArray))
+        self.assertTrue(np.array_equal(self._shared, self._data))
+
+    def test_shared_array_is_read_only(self):
+        with self.assertRaises(ValueError):
+            self._shared[0] = 1
+
+    def test_pickle_transfers_handle_only(self):
+        self.assertLess(len(dumps(self._shared)), self._data.nbytes)
+        self.assertTrue(np.array_equal(loads(dumps(self._shared)), self._data))
+
+    def test_derived_arrays_pickled_by_value(self):
+        derived = self._shared[10:20]
+        self.assertTrue(np.array_equal(loads(dumps(derived)), self._data[10:20]))
+
+    def tearDown(self):
+        release(self._shared)
+        self._buffer.close()
+
+
+class StructuredArrayTestCase(TestCase):
+    def test_motion_vectors_round_trip(self):
+        buffer = SharedRingBuffer(slots=1, slot_size=4 * 6)
+        motion = np.zeros((2, 3), dtype=[('x', 'i1'), ('y', 'i1'), ('sad', 'u2')])
+        motion['x'] = -5
+        shared = loads(dumps(buffer.put(motion)))
+        self.assertTrue(np.array_equal(shared['x'], motion['x']))
+        release(shared)
+        buffer.close()
+
+
+class FullBufferTestCase(TestCase):
+    def setUp(self):
+        self._buffer = SharedRingBuffer(slots=2, slot_size=16)
+        self._first = self._buffer.put(np.zeros(16, dtype='uint8'))
+        self._second = self._buffer.put(np.zeros(16, dtype='uint8'))
+
+    def test_full_buffer_returns_none(self):
+        self.assertIsNone(self._buffer.put(np.zeros(16, dtype='uint8')))
+
+    def test_oversized_array_returns_none(self):
+        release(self._first)
+        self.assertIsNone(self._buffer.put(np.zeros(17, dtype='uint8')))
+
+    def test_released_slot_is_reused(self):
+        release(self._first)
+        self.assertIsNotNone(self._buffer.put(np.zeros(16, dtype='uint8')))
+
+    def test_slot_held_until_all_references_released(self):
+        acquire(self._first)
+        release(self._first)
+        self.assertIsNone(self._buffer.put(np.zeros(16, dtype='uint8')))
+        release(self._first)
+        self.assertEqual(self._buffer.in_use(), 1)
+
+    def tearDown(self):
+        self._buffer.close()
+
+
+def _echo_sum(in_queue, out_queue):
+    shared = in_queue.get()
+    out_queue.put(int(shared.sum()))
+    release(shared)
+
+
+class CrossProcessTestCase(TestCase):
+    def test_other_process_reads_and_releases(self):
+        buffer = SharedRingBuffer(slots=1, slot_size=1024)
+        in_queue, out_queue = Queue(), Queue()
+        process = Process(target=_echo_sum, args=(in_queue, out_queue), daemon=True)
+        process.start()
+
+        in_queue.put(buffer.put(np.full(1024, 2, dtype='uint8')))
+        self.assertEqual(out_queue.get(timeout=10), 2048)
+        process.join(10)
+        self.assertEqual(buffer.in_use(), 0)
+        buffer.close()
+
+
+def _hold_and_crash(held, in_queue):
+    shared = in_queue.get()
+    held.record(shared, np.zeros(4))
+    exit(1)
+
+
+class HeldSlotsTestCase(TestCase):
+    def setUp(self):
+        self._buffer = SharedRingBuffer(slots=2, slot_size=16)
+        self._held = HeldSlots(4)
+
+    def test_crashed_process_slots_released(self):
+        in_queue = Queue()
+        process = Process(target=_hold_and_crash, args=(self._held, in_queue))
+        process.start()
+        in_queue.put(self._buffer.put(np.zeros(16, dtype='uint8')))
+        process.join(10)
+        self.assertEqual(self._buffer.in_use(), 1)
+        self._held.release_all()
+        self.assertEqual(self._buffer.in_use(), 0)
+
+    def test_each_reference_released(self):
+        shared = self._buffer.put(np.zeros(16, dtype='uint8'))
+        acquire(shared)
+        self._held.record(shared, shared)
+        self._held.release_all()
+        self.assertEqual(self._buffer.in_use(), 0)
+
+    def test_nothing_released_once_cleared(self):
+        shared = self._buffer.put(np.zeros(16, dtype='uint8'))
+        self._held.record(shared)
+        self._held.clear()
+        self._held.release_all()
+        self.assertEqual(self._buffer.in_use(), 1)
+
+    def tearDown(self):
+        self._buffer.close()
@@ -0,0 +1,236 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+from multiprocessing import Process
+from os import getpid, kill
+from signal import SIGTERM
+from threading import Timer
+from time import sleep
+
+from DynAIkonTrap.supervisor import Stage, Supervisor, ignoring_signals
+
+
+def run_forever():
+    while True:
+        sleep(1)
+
+
+def crash():
+    exit(3)
+
+
+class MockCamera:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MockComponent:
+    def __init__(self, target):
+        self._target = target
+        self.starts = 0
+        self.closed = False
+        self.restart()
+
+    def restart(self):
+        self.starts += 1
+        self.process = Process(target=self._target, daemon=True)
+        self.process.start()
+
+    def close(self):
+        self.closed = True
+        self.process.terminate()
+        self.process.join()
+
+
+class SupervisorShutdownTestCase(TestCase):
+    def setUp(self):
+        self._camera = MockCamera()
+        self._component = MockComponent(run_forever)
+        self._idle_calls = 0
+
+        def is_idle():
+            self._idle_calls += 1
+            return self._idle_calls > 2
+
+        supervisor = Supervisor(
+            self._camera, [Stage('mock', self._component)], is_idle=is_idle
+        )
+        Timer(0.2, kill, (getpid(), SIGTERM)).start()
+        self._exit_code = supervisor.run()
+
+    def test_clean_exit_on_signal(self):
+        self.assertEqual(self._exit_code, 0)
+
+    def test_camera_and_stages_closed(self):
+        self.assertTrue(self._camera.closed)
+        self.assertTrue(self._component.closed)
+
+    def test_pipeline_flushed(self):
+        self.assertGreater(self._idle_calls, 2)
+
+    def test_running_stage_not_restarted(self):
+        self.assertEqual(self._component.starts, 1)
+
+
+class SupervisorGovernorTestCase(TestCase):
+    def setUp(self):
+        self._closed = []
+
+        class Closes:
+            def __init__(self, name, closed):
+                self.close = lambda: closed.append(name)
+
+        self._component = MockComponent(run_forever)
+        supervisor = Supervisor(
+            Closes('camera', self._closed),
+            [Stage('mock', self._component)],
+            governor=Closes('governor', self._closed),
+        )
+        Timer(0.2, kill, (getpid(), SIGTERM)).start()
+        supervisor.run()
+
+    def test_governor_closed_before_camera(self):
+        self.assertEqual(self._closed, ['governor', 'camera'])
+
+
+class SupervisorRestartTestCase(TestCase):
+    def setUp(self):
+        self._camera = MockCamera()
+        self._component = MockComponent(crash)
+        supervisor = Supervisor(
+            self._camera, [Stage('mock', self._component)], max_restarts=2
+        )
+        self._exit_code = supervisor.run()
+
+    def test_crashed_stage_restarted(self):
+        self.assertEqual(self._component.starts, 3)
+
+    def test_gives_up_after_max_restarts(self):
+        self.assertEqual(self._exit_code, 1)
+        self.assertTrue(self._camera.closed)
+
+
+class MockPoolComponent:
+    """Runs one process that keeps going and one that crashes"""
+
+    def __init__(self):
+        self.restarts = 0
+        self.closed = False
+        self.processes = [
+            Process(target=run_forever, daemon=True),
+            Process(target=crash, daemon=True),
+        ]
+        [p.start() for p in self.processes]
+
+    @property
+    def process(self):
+        return self.processes[0]
+
+    def restart(self):
+        self.restarts += 1
+        for i, process in enumerate(self.processes):
+            if not process.is_alive():
+                self.processes[i] = Process(target=crash, daemon=True)
+                self.processes[i].start()
+
+    def close(self):
+        self.closed = True
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+
+class SupervisorPoolTestCase(TestCase):
+    def setUp(self):
+        self._camera = MockCamera()
+        self._component = MockPoolComponent()
+        self._first_process = self._component.processes[0]
+        supervisor = Supervisor(
+            self._camera, [Stage('pool', self._component)], max_restarts=2
+        )
+        self._exit_code = supervisor.run()
+
+    def test_crash_of_any_process_detected(self):
+        self.assertEqual(self._component.restarts, 2)
+        self.assertEqual(self._exit_code, 1)
+
+    def test_running_process_kept(self):
+        self.assertIs(self._component.processes[0], self._first_process)
+
+
+class MockCrashedPoolComponent:
+    """Runs two processes that have both crashed by the time they are supervised, replaced by processes that keep going"""
+
+    def __init__(self):
+        self.restarts = 0
+        self.processes = [Process(target=crash, daemon=True) for _ in range(2)]
+        [p.start() for p in self.processes]
+        [p.join() for p in self.processes]
+
+    @property
+    def process(self):
+        return self.processes[0]
+
+    def restart(self):
+        self.restarts += 1
+        for i, process in enumerate(self.processes):
+            if not process.is_alive():
+                self.processes[i] = Process(target=run_forever, daemon=True)
+                self.processes[i].start()
+
+    def close(self):
+        for process in self.processes:
+            process.kill()
+            process.join()
+
+
+class SupervisorSimultaneousCrashTestCase(TestCase):
+    def setUp(self):
+        self._component = MockCrashedPoolComponent()
+        self._supervisor = Supervisor(
+            MockCamera(), [Stage('pool', self._component)], max_restarts=2
+        )
+        Timer(0.5, kill, (getpid(), SIGTERM)).start()
+        self._exit_code = self._supervisor.run()
+
+    def test_restarted_once(self):
+        self.assertEqual(self._component.restarts, 1)
+        self.assertEqual(self._supervisor.restarts['pool'], 1)
+        self.assertEqual(self._exit_code, 0)
+
+
+class IgnoringSignalsTestCase(TestCase):
+    def setUp(self):
+        self._supervisor = Supervisor(MockCamera(), [])
+
+    def test_process_ignores_signal(self):
+        with ignoring_signals():
+            process = Process(target=run_forever, daemon=True)
+            process.start()
+        kill(process.pid, SIGTERM)
+        process.join(0.5)
+        self.assertTrue(process.is_alive())
+        process.kill()
+        process.join()
+        self._supervisor.shutdown()
+
+    def test_signal_held_back(self):
+        with ignoring_signals():
+            kill(getpid(), SIGTERM)
+        self.assertEqual(self._supervisor.run(), 0)
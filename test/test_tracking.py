@@ -0,0 +1,101 @@
+# DynAIkonTrap is an AI-infused camera trapping software package.
+# Copyright (C) 2020 Miklas Riechmann
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from unittest import TestCase
+import numpy as np
+
+from DynAIkonTrap.filtering.tracking import MotionTracker
+
+MOTION_DTYPE = [('x', 'i1'), ('y', 'i1'), ('sad', 'u2')]
+
+
+def moving_block(rows, cols, box, vector):
+    """Motion vectors with only the blocks within the box moving by the vector, plus the extra column added by the camera"""
+    motion = np.zeros((rows, cols + 1), dtype=MOTION_DTYPE)
+    c0, r0, c1, r1 = box
+    motion['x'][r0:r1, c0:c1] = vector[0]
+    motion['y'][r0:r1, c0:c1] = vector[1]
+    return motion
+
+
+class StepTestCase(TestCase):
+    def setUp(self):
+        self._tracker = MotionTracker(
+            min_agreement=0.5, min_confidence=0.2, confidence_decay=0.01
+        )
+        # Blocks 2 to 4 of a 10x10 grid moving 16 pixels right (vectors point back)
+        self._motion = moving_block(10, 10, (2, 2, 5, 5), (-16, 0))
+
+    def test_box_moves_with_content(self):
+        box, agreement = self._tracker.step((0.2, 0.2, 0.5, 0.5), self._motion)
+        np.testing.assert_allclose(box, (0.3, 0.2, 0.6, 0.5))
+        self.assertEqual(agreement, 1)
+
+    def test_box_moves_back_going_backwards(self):
+        box, _ = self._tracker.step((0.3, 0.2, 0.6, 0.5), self._motion, backwards=True)
+        np.testing.assert_allclose(box, (0.2, 0.2, 0.5, 0.5))
+
+    def test_motion_elsewhere_reduces_agreement(self):
+        self._motion['x'][7:10, 7:10] = 8
+        _, agreement = self._tracker.step((0.2, 0.2, 0.5, 0.5), self._motion)
+        self.assertAlmostEqual(agreement, 0.5)
+
+    def test_no_motion_in_box(self):
+        box, agreement = self._tracker.step((0.6, 0.6, 0.9, 0.9), self._motion)
+        self.assertEqual(box, (0.6, 0.6, 0.9, 0.9))
+        self.assertEqual(agreement, 0)
+
+
+class TrackTestCase(TestCase):
+    def setUp(self):
+        self._tracker = MotionTracker(
+            min_agreement=0.5, min_confidence=0.2, confidence_decay=0.01
+        )
+
+    def test_followed_while_motion_agrees(self):
+        motions = [
+            moving_block(10, 10, (2 + i, 2, 5 + i, 5), (-16, 0)) for i in range(3)
+        ]
+        motions.append(np.zeros((10, 11), dtype=MOTION_DTYPE))
+        self.assertEqual(self._tracker.track((0.2, 0.2, 0.5, 0.5), 0.9, motions), 3)
+
+    def test_partial_agreement_not_compounded(self):
+        motions = []
+        for vector in [(-2, 0), (2, 0)] * 5:
+            motion = moving_block(10, 10, (2, 2, 5, 5), vector)
+            motion['x'][7:10, 7:10] = 8
+            motions.append(motion)
+        # Half of the motion is within the box in every frame
+        self.assertEqual(self._tracker.track((0.2, 0.2, 0.5, 0.5), 0.9, motions), 10)
+
+    def test_stops_at_low_agreement(self):
+        motion = moving_block(10, 10, (2, 2, 5, 5), (-2, 0))
+        elsewhere = motion.copy()
+        elsewhere['x'][6:10, 6:10] = 8
+        motions = [motion, motion, elsewhere, motion]
+        self.assertEqual(self._tracker.track((0.2, 0.2, 0.5, 0.5), 0.9, motions), 2)
+
+    def test_confidence_decays_per_frame(self):
+        motion = moving_block(10, 10, (2, 2, 5, 5), (-2, 0))
+        # Still at least 0.2 after five frames, but not after six
+        self.assertEqual(
+            self._tracker.track((0.2, 0.2, 0.5, 0.5), 0.255, [motion] * 10), 5
+        )
+
+    def test_stops_at_missing_vectors(self):
+        motion = moving_block(10, 10, (2, 2, 5, 5), (-2, 0))
+        self.assertEqual(
+            self._tracker.track((0.2, 0.2, 0.5, 0.5), 0.9, [motion, None, motion]), 1
+        )
@@ -13,6 +13,7 @@
 
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from enum import Enum
 from json import dump
 from types import MappingProxyType
 
@@ -172,6 +173,9 @@ def serialise(obj):
     elif isinstance(obj, FilterSettings):
         return {k: serialise(v) for k, v in obj.__dict__.items()}
 
+    elif isinstance(obj, Enum):
+        return obj.value
+
     elif isinstance(obj, MappingProxyType):
         return {k: v for k, v in obj.items() if not k.startswith('__')}
 